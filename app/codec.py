@@ -0,0 +1,226 @@
+"""
+Codec JSON rápido para /predict (opcional, CODEC_RAPIDO=true)
+
+Para payloads pequeños como los de /predict, la mayor parte del CPU por
+request se va en el manejo JSON por defecto de FastAPI y en validar
+PredictRequestFull con pydantic. Con CODEC_RAPIDO=true:
+
+- El body se decodifica con orjson y se valida con una función generada a
+  partir de model_fields (mismas restricciones de Field: gt/ge/lt/le, tipos,
+  EmailStr normalizado con el mismo validador de pydantic, datetime ISO 8601)
+- La respuesta se serializa con orjson (RespuestaJSONRapida), sin volver a
+  validar el response_model
+
+Cualquier caso que el validador compilado no reconozca (tipos inesperados,
+valores fuera de rango, JSON inválido, formatos de fecha alternativos...)
+se delega al handler normal de FastAPI, así los errores 422 y la coerción
+de tipos son exactamente los de pydantic.
+
+La equivalencia se verifica con scripts/verificar_codec.py.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import re
+import typing
+from datetime import datetime
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, EmailStr
+from pydantic.networks import validate_email
+from pydantic_core import PydanticCustomError
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+CODEC_RAPIDO = os.getenv("CODEC_RAPIDO", "false").lower() == "true"
+
+# ISO 8601 estricto: YYYY-MM-DDTHH:MM:SS[.ffffff][Z|±HH:MM]
+_RE_FECHA = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d{1,6})?(Z|[+-]\d{2}:\d{2})?")
+
+_OPERADORES = (("gt", ">"), ("ge", ">="), ("lt", "<"), ("le", "<="))
+_RESTRICCIONES_SOPORTADAS = {"Gt", "Ge", "Lt", "Le", "Interval"}
+
+
+@functools.lru_cache(maxsize=4096)
+def _email(valor: str):
+    """Email normalizado como lo deja EmailStr (None si no es válido)"""
+    try:
+        return validate_email(valor)[1]
+    except PydanticCustomError:
+        return None
+
+
+def _tipo_base(anotacion):
+    """(tipo, opcional) de una anotación soportada, o (None, False)"""
+    opcional = False
+    if typing.get_origin(anotacion) is typing.Union:
+        argumentos = [a for a in typing.get_args(anotacion) if a is not type(None)]
+        if len(argumentos) != 1 or len(typing.get_args(anotacion)) != 2:
+            return None, False
+        anotacion, opcional = argumentos[0], True
+    if anotacion in (str, int, float, datetime, EmailStr):
+        return anotacion, opcional
+    return None, False
+
+
+def compilar_validador(modelo: type):
+    """
+    Genera una función validar(dict) -> dict | None para un modelo pydantic
+
+    Devuelve None si el modelo usa algo que el validador no sabe replicar
+    (la ruta usa entonces siempre el camino normal de FastAPI).
+    """
+    if modelo.model_config.get("extra") not in (None, "ignore") or modelo.model_config.get("strict"):
+        return None
+
+    lineas = ["def validar(d):", "    r = {}"]
+    defaults = {}
+
+    for nombre, campo in modelo.model_fields.items():
+        clave = campo.alias or nombre
+        tipo, opcional = _tipo_base(campo.annotation)
+        if tipo is None:
+            return None
+
+        chequeos = []
+        if tipo is str:
+            chequeos.append("if type(v) is not str: return None")
+        elif tipo is int:
+            chequeos.append("if type(v) is not int: return None")
+        elif tipo is float:
+            chequeos.append("if type(v) is int: v = float(v)")
+            chequeos.append("elif type(v) is not float: return None")
+        elif tipo is EmailStr:
+            chequeos.append("if type(v) is not str: return None")
+            chequeos.append("v = _email(v)")
+            chequeos.append("if v is None: return None")
+        elif tipo is datetime:
+            chequeos.append("if type(v) is not str or _RE_FECHA.fullmatch(v) is None: return None")
+            chequeos.append("v = _fecha(v)")
+
+        for restriccion in campo.metadata:
+            if type(restriccion).__name__ not in _RESTRICCIONES_SOPORTADAS:
+                return None
+            for atributo, operador in _OPERADORES:
+                limite = getattr(restriccion, atributo, None)
+                if limite is not None:
+                    chequeos.append(f"if not v {operador} {limite!r}: return None")
+
+        if opcional:
+            chequeos = ["if v is not None:"] + [f"    {c}" for c in chequeos]
+
+        if campo.is_required():
+            lineas.append(f"    v = d[{clave!r}]")
+            lineas.extend(f"    {c}" for c in chequeos)
+        else:
+            # El default no se valida (igual que pydantic)
+            defaults[nombre] = campo.default
+            lineas.append(f"    if {clave!r} in d:")
+            lineas.append(f"        v = d[{clave!r}]")
+            lineas.extend(f"        {c}" for c in chequeos)
+            lineas.append("    else:")
+            lineas.append(f"        v = _DEFAULTS[{nombre!r}]")
+        lineas.append(f"    r[{nombre!r}] = v")
+
+    lineas.append("    return r")
+    fuente = "\n".join(lineas)
+
+    espacio = {
+        "_DEFAULTS": defaults,
+        "_email": _email,
+        "_fecha": datetime.fromisoformat,
+        "_RE_FECHA": _RE_FECHA,
+    }
+    exec(compile(fuente, f"<validador {modelo.__name__}>", "exec"), espacio)
+    validar = espacio["validar"]
+    validar.fuente = fuente
+    return validar
+
+
+class RespuestaJSONRapida(JSONResponse):
+    """JSONResponse serializada con orjson (mismo JSON compacto y UTF-8)"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+def _es_json(request) -> bool:
+    tipo = request.headers.get("content-type", "")
+    return tipo.split(";", 1)[0].strip() == "application/json"
+
+
+class RutaCodecRapido(APIRoute):
+    """
+    APIRoute con el codec rápido para endpoints con un único body pydantic
+
+    Si CODEC_RAPIDO está desactivado, orjson no está instalado o el endpoint
+    tiene otros parámetros (query, path, dependencias...), se comporta
+    exactamente como APIRoute.
+    """
+
+    def get_route_handler(self):
+        handler_normal = super().get_route_handler()
+
+        dependant = self.dependant
+        if (
+            not CODEC_RAPIDO
+            or orjson is None
+            or len(dependant.body_params) != 1
+            or dependant.path_params or dependant.query_params or dependant.header_params
+            or dependant.cookie_params or dependant.dependencies
+        ):
+            if CODEC_RAPIDO and orjson is None:
+                logger.warning("⚠️  CODEC_RAPIDO activo pero orjson no está instalado - usando codec normal")
+            return handler_normal
+
+        parametro_body = dependant.body_params[0]
+        modelo = parametro_body.type_
+        if not (isinstance(modelo, type) and issubclass(modelo, BaseModel)):
+            return handler_normal
+        validar = compilar_validador(modelo)
+        if validar is None:
+            return handler_normal
+
+        nombre_body = parametro_body.name
+        nombre_request = dependant.request_param_name
+        endpoint = self.endpoint
+        es_async = asyncio.iscoroutinefunction(endpoint)
+        status_code = self.status_code or 200
+
+        async def handler(request):
+            if not _es_json(request):
+                return await handler_normal(request)
+            try:
+                datos = orjson.loads(await request.body())
+                valores = validar(datos) if type(datos) is dict else None
+            except Exception:
+                valores = None
+            if valores is None:
+                # Caso no reconocido: FastAPI/pydantic decide (errores 422 idénticos)
+                return await handler_normal(request)
+
+            argumentos = {nombre_body: modelo.model_construct(**valores)}
+            if nombre_request:
+                argumentos[nombre_request] = request
+
+            if es_async:
+                contenido = await endpoint(**argumentos)
+            else:
+                contenido = await run_in_threadpool(endpoint, **argumentos)
+
+            if isinstance(contenido, Response):
+                return contenido
+            if isinstance(contenido, BaseModel):
+                contenido = contenido.model_dump(mode="json")
+            return RespuestaJSONRapida(contenido, status_code=status_code)
+
+        return handler
@@ -3,7 +3,6 @@ Conexión a MongoDB Atlas
 Base de datos compartida con Spring Boot
 """
 
-from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
 import logging
@@ -27,6 +26,9 @@ def connect_db():
         if not uri:
             raise ValueError("❌ MONGODB_URI no configurado en .env")
         
+        # pymongo se importa al conectar (fase crítica del arranque, en paralelo con la carga del modelo)
+        from pymongo import MongoClient
+        
         client = MongoClient(uri, serverSelectionTimeoutMS=5000)
         
         # Verificar conexión
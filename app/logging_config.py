@@ -0,0 +1,133 @@
+"""
+Configuración de logging del microservicio
+
+- Los loggers solo encolan el LogRecord (QueueHandler): el formateo y la
+  escritura a stdout ocurren en un hilo de fondo (QueueListener), así un
+  colector de logs lento no bloquea los requests
+- El mensaje se formatea en el hilo escritor, no en la ruta caliente
+- Los mensajes DEBUG de la ruta caliente se muestrean por plantilla
+  (1 de cada LOG_MUESTREO_DEBUG)
+- LOG_FORMAT=json produce una línea JSON por registro (con request_id)
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+from app.services.trazas import request_id_actual
+
+FORMATO_TEXTO = '%(asctime)s | %(levelname)-8s | %(message)s'
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+
+_listener = None
+
+
+class ColaSinFormatoHandler(logging.handlers.QueueHandler):
+    """QueueHandler que encola el registro tal cual (el formateo queda para el hilo escritor)"""
+
+    def prepare(self, record):
+        return record
+
+
+class MuestreoFilter(logging.Filter):
+    """Deja pasar 1 de cada N registros DEBUG por (logger, plantilla del mensaje)"""
+
+    def __init__(self, cada_n: int):
+        super().__init__()
+        self.cada_n = max(1, cada_n)
+        self._contadores = {}
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.cada_n == 1:
+            return True
+        clave = (record.name, record.msg)
+        n = self._contadores.get(clave, 0)
+        self._contadores[clave] = n + 1
+        return n % self.cada_n == 0
+
+
+class RequestIdFilter(logging.Filter):
+    """Adjunta el request id del request en curso (se lee en el hilo que registra)"""
+
+    def filter(self, record):
+        record.request_id = request_id_actual()
+        return True
+
+
+class FormateadorJSON(logging.Formatter):
+    """Una línea JSON por registro"""
+
+    def format(self, record):
+        datos = {
+            "ts": self.formatTime(record, FORMATO_FECHA),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage()
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            datos["request_id"] = request_id
+        if record.exc_info:
+            datos["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False)
+
+
+def configurar_logging(nivel: str = None, formato: str = None, muestreo_debug: int = None, stream=None):
+    """
+    Instala el pipeline de logging basado en cola en el logger raíz
+
+    Args:
+        nivel: Nivel mínimo (por defecto LOG_LEVEL o INFO)
+        formato: "texto" o "json" (por defecto LOG_FORMAT o texto)
+        muestreo_debug: 1 de cada N registros DEBUG por plantilla (por defecto LOG_MUESTREO_DEBUG o 10)
+        stream: Destino final (por defecto sys.stdout)
+    """
+    global _listener
+
+    nivel = (nivel or os.getenv("LOG_LEVEL", "INFO")).upper()
+    formato = (formato or os.getenv("LOG_FORMAT", "texto")).lower()
+    muestreo_debug = muestreo_debug or int(os.getenv("LOG_MUESTREO_DEBUG", 10))
+
+    detener_logging()
+
+    salida = logging.StreamHandler(stream or sys.stdout)
+    if formato == "json":
+        salida.setFormatter(FormateadorJSON())
+    else:
+        salida.setFormatter(logging.Formatter(FORMATO_TEXTO, datefmt=FORMATO_FECHA))
+
+    cola = queue.SimpleQueue()
+    handler = ColaSinFormatoHandler(cola)
+    handler.addFilter(MuestreoFilter(muestreo_debug))
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(handler)
+    root.setLevel(nivel)
+
+    # Los logs de uvicorn también pasan por la cola
+    for nombre in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uv_logger = logging.getLogger(nombre)
+        uv_logger.handlers.clear()
+        uv_logger.propagate = True
+
+    _listener = logging.handlers.QueueListener(cola, salida, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def detener_logging():
+    """Vacía la cola y detiene el hilo escritor"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(detener_logging)
@@ -0,0 +1,72 @@
+"""
+Router del feature store de clientes (agregados por cliente_id)
+"""
+
+from fastapi import APIRouter, HTTPException
+from typing import List
+from app.schemas import EventoCliente, AgregadosCliente
+from app.services.feature_store import get_feature_store
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.post("/clientes/eventos")
+def registrar_eventos(eventos: List[EventoCliente]):
+    """
+    Aplica eventos de compra/cancelación a los agregados de cada cliente
+
+    Los eventos con un evento_id ya aplicado se ignoran (reenvíos).
+    """
+    store = get_feature_store()
+    aplicados = duplicados = 0
+    try:
+        for evento in eventos:
+            if store.registrar_evento(evento.cliente_id, evento.tipo, evento.monto, evento.evento_id):
+                aplicados += 1
+            else:
+                duplicados += 1
+    except Exception as e:
+        logger.error(f"❌ Error registrando eventos de clientes: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {
+        "success": True,
+        "aplicados": aplicados,
+        "duplicados": duplicados
+    }
+
+
+@router.put("/clientes/{cliente_id}/agregados")
+def establecer_agregados(cliente_id: str, agregados: AgregadosCliente):
+    """Fija los agregados absolutos de un cliente (carga inicial o reconciliación)"""
+    try:
+        features = get_feature_store().establecer(
+            cliente_id, agregados.compras, agregados.cancelaciones, agregados.suma_montos
+        )
+    except Exception as e:
+        logger.error(f"❌ Error guardando agregados de {cliente_id}: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {
+        "success": True,
+        "cliente_id": cliente_id,
+        **features
+    }
+
+
+@router.get("/clientes/{cliente_id}/features")
+def obtener_features(cliente_id: str):
+    """Features de cliente que usaría /predict/cliente para este cliente_id"""
+    try:
+        features = get_feature_store().obtener(cliente_id)
+    except Exception as e:
+        logger.error(f"❌ Error leyendo el feature store: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {
+        "success": True,
+        "cliente_id": cliente_id,
+        **features
+    }
@@ -0,0 +1,39 @@
+"""
+Router con las métricas del servicio en formato Prometheus
+"""
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+from app.services.metricas import exponer, CONTENT_TYPE
+from app.services.predictor import get_predictor
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+def metricas():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(content=exponer(), media_type=CONTENT_TYPE)
+
+
+def _monitor_drift():
+    monitor = get_predictor().drift
+    if monitor is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Sin perfil de referencia (app/ml/perfil_referencia.json): ejecutar scripts/train.py"
+        )
+    return monitor
+
+
+@router.get("/drift")
+def drift():
+    """PSI de cada feature y de probabilidad_cancelacion contra el perfil de entrenamiento"""
+    return {"success": True, **_monitor_drift().reporte()}
+
+
+@router.post("/drift/reiniciar")
+def reiniciar_drift():
+    """Descarta lo observado y empieza una ventana nueva"""
+    _monitor_drift().reiniciar()
+    return {"success": True}
@@ -2,68 +2,261 @@
 Router para gestión de predicciones con MongoDB
 """
 
-from fastapi import APIRouter, HTTPException
-from app.schemas import PredictRequestFull, PredictResponse
-from app.services.predictor import get_predictor
-from app.services.prediccion_service import PrediccionService
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from app.codec import RutaCodecRapido
+from app.schemas import PredictRequestFull, PredictRequestCliente, PredictResponse
+from app.services.feature_store import CAMPOS_CLIENTE, get_feature_store
+from app.services.lote_service import LoteService, ErrorFormatoLote, crear_decodificador
+from app.services.predictor import FEATURE_NAMES, get_predictor
+from app.services.prediccion_service import PrediccionService, UMBRAL_RIESGO
+from app.services.metricas import ETAPAS, PREDICCIONES
+from app.services.single_flight import SingleFlight
+from app.services.trazas import registrar_span
+import json
 import logging
+import time
 
-router = APIRouter()
+router = APIRouter(route_class=RutaCodecRapido)
 logger = logging.getLogger(__name__)
 
+# Reintentos simultáneos de la misma venta: una sola inferencia y una sola escritura
+vuelos_prediccion = SingleFlight()
+
 
 @router.post("/predict", response_model=PredictResponse)
-def predecir(request: PredictRequestFull):
+async def predecir(request: PredictRequestFull, http_request: Request):
     """
     Realiza una predicción de cancelación
     
     Recibe PredictRequestFull (con email, nombre, etc.) desde Spring Boot
     Guarda en MongoDB si riesgo >= 70%
     """
+    # Lectura del body + validación de PredictRequestFull (desde MetricasMiddleware)
+    t_inicio = getattr(http_request.state, "t_inicio", None)
+    if t_inicio is not None:
+        t_validado = time.perf_counter()
+        ETAPAS.observar("validacion", t_validado - t_inicio)
+        registrar_span("validacion", t_inicio, t_validado)
+    
+    # El modelo y MongoDB son bloqueantes: se ejecutan en el threadpool
+    return await run_in_threadpool(_procesar_prediccion, request)
+
+
+def _procesar_prediccion(request: PredictRequestFull) -> dict:
+    """
+    Predicción + guardado en MongoDB de un request ya validado
+
+    Devuelve el contenido de PredictResponse como dict: FastAPI lo valida con
+    response_model y el codec rápido lo serializa directamente. Los requests
+    idénticos en vuelo (misma venta, cliente y features) esperan el resultado
+    del primero.
+    """
+    t0 = time.perf_counter()
+    clave = (request.venta_id, request.cliente_id) + tuple(getattr(request, n) for n in FEATURE_NAMES)
+    respuesta, compartida = vuelos_prediccion.ejecutar(clave, _predecir_y_guardar, request)
+    if compartida:
+        registrar_span("single_flight.espera", t0)
+    return respuesta
+
+
+def _predecir_y_guardar(request: PredictRequestFull) -> dict:
+    """Inferencia, métricas y guardado en MongoDB (una vez por clave en vuelo)"""
+    t0 = time.perf_counter()
     try:
-        logger.info(f"📊 Predicción solicitada para venta: {request.venta_id}")
+        logger.debug("📊 Predicción solicitada para venta: %s", request.venta_id)
         
         # Obtener predictor
         predictor = get_predictor()
         
-        # Preparar features para el modelo
-        features = {
-            "monto_total": request.monto_total,
-            "es_temporada_alta": request.es_temporada_alta,
-            "dia_semana_reserva": request.dia_semana_reserva,
-            "metodo_pago_tarjeta": request.metodo_pago_tarjeta,
-            "tiene_paquete": request.tiene_paquete,
-            "duracion_dias": request.duracion_dias,
-            "destino_categoria": request.destino_categoria,
-            "total_compras_previas": request.total_compras_previas,
-            "total_cancelaciones_previas": request.total_cancelaciones_previas,
-            "tasa_cancelacion_historica": request.tasa_cancelacion_historica,
-            "monto_promedio_compras": request.monto_promedio_compras
-        }
-        
         # Realizar predicción
-        resultado = predictor.predecir(features)
+        resultado = predictor.predecir(_features(request))
+        PREDICCIONES.inc(resultado["recomendacion"])
         
-        logger.info(f"✅ Predicción exitosa: {resultado['probabilidad_cancelacion']*100:.2f}% - {resultado['recomendacion']}")
+        logger.debug("✅ Predicción exitosa: %s - %.2f%% - %s", request.venta_id,
+                     resultado["probabilidad_cancelacion"] * 100, resultado["recomendacion"])
         
         # Siempre intentar guardar en MongoDB si riesgo >= 70%
-        logger.info(f"📝 Request tipo: PredictRequestFull detectado - Evaluando para MongoDB...")
         doc_guardado = PrediccionService.guardar_prediccion(request.dict(), resultado)
-        if doc_guardado:
-            logger.info(f"💾 GUARDADO EN MONGODB: {request.venta_id} - {resultado['probabilidad_cancelacion']*100:.2f}%")
-        else:
-            logger.info(f"⚠️  NO se guardó en MongoDB: {request.venta_id} (probabilidad < 70% o ya existe)")
+        logger.debug("💾 %s guardado en MongoDB: %s", request.venta_id, bool(doc_guardado))
         
-        # Retornar respuesta
-        return PredictResponse(
-            success=True,
-            venta_id=request.venta_id,
-            cliente_id=request.cliente_id,
-            probabilidad_cancelacion=resultado["probabilidad_cancelacion"],
-            recomendacion=resultado["recomendacion"],
-            factores_riesgo=resultado.get("factores_riesgo", [])
-        )
+        registrar_span("router.predict", t0)
+        
+        return _respuesta(request, resultado)
         
     except Exception as e:
-        logger.error(f"❌ Error en predicción: {e}")
+        logger.exception("❌ Error en predicción: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _predecir_y_guardar_varios(requests: list) -> list:
+    """
+    _predecir_y_guardar para un micro-lote del canal WebSocket
+
+    Una sola llamada al modelo y un solo bulk_write (upserts sin duplicar
+    venta_id, ver PrediccionService.guardar_lote) para las alertas del lote.
+    """
+    resultados = get_predictor().predecir_varios([_features(r) for r in requests])
+    
+    documentos = []
+    for request, resultado in zip(requests, resultados):
+        PREDICCIONES.inc(resultado["recomendacion"])
+        if resultado["probabilidad_cancelacion"] >= UMBRAL_RIESGO:
+            documentos.append(PrediccionService.construir_documento(request.dict(), resultado))
+    try:
+        PrediccionService.guardar_lote(documentos)
+    except Exception as e:
+        # Mismo criterio que guardar_prediccion: la predicción se responde igual
+        logger.exception("❌ Error guardando %d alertas del lote: %s", len(documentos), e)
+    
+    return [_respuesta(request, resultado) for request, resultado in zip(requests, resultados)]
+
+
+def _features(request: PredictRequestFull) -> dict:
+    """Las 11 features del modelo a partir del request"""
+    return {
+        "monto_total": request.monto_total,
+        "es_temporada_alta": request.es_temporada_alta,
+        "dia_semana_reserva": request.dia_semana_reserva,
+        "metodo_pago_tarjeta": request.metodo_pago_tarjeta,
+        "tiene_paquete": request.tiene_paquete,
+        "duracion_dias": request.duracion_dias,
+        "destino_categoria": request.destino_categoria,
+        "total_compras_previas": request.total_compras_previas,
+        "total_cancelaciones_previas": request.total_cancelaciones_previas,
+        "tasa_cancelacion_historica": request.tasa_cancelacion_historica,
+        "monto_promedio_compras": request.monto_promedio_compras
+    }
+
+
+def _respuesta(request: PredictRequestFull, resultado: dict) -> dict:
+    """Contenido de PredictResponse (mismos campos y orden)"""
+    return {
+        "success": True,
+        "venta_id": request.venta_id,
+        "cliente_id": request.cliente_id,
+        "probabilidad_cancelacion": float(resultado["probabilidad_cancelacion"]),
+        "recomendacion": resultado["recomendacion"],
+        "factores_riesgo": resultado.get("factores_riesgo", []),
+        "probabilidad_estimada": resultado.get("probabilidad_estimada", False)
+    }
+
+
+@router.post("/predict/cliente", response_model=PredictResponse)
+async def predecir_cliente(request: PredictRequestCliente, http_request: Request):
+    """
+    Predicción con las features de cliente opcionales
+
+    Igual que /predict, pero total_compras_previas, total_cancelaciones_previas,
+    tasa_cancelacion_historica y monto_promedio_compras pueden omitirse: se
+    completan con los agregados del cliente en el feature store.
+    """
+    t_inicio = getattr(http_request.state, "t_inicio", None)
+    if t_inicio is not None:
+        t_validado = time.perf_counter()
+        ETAPAS.observar("validacion", t_validado - t_inicio)
+        registrar_span("validacion", t_inicio, t_validado)
+    
+    return await run_in_threadpool(_procesar_prediccion_cliente, request)
+
+
+def _procesar_prediccion_cliente(request: PredictRequestCliente) -> dict:
+    """Completa las features de cliente faltantes desde el feature store y predice"""
+    datos = request.model_dump()
+    faltantes = [campo for campo in CAMPOS_CLIENTE if datos[campo] is None]
+    if faltantes:
+        t0 = time.perf_counter()
+        try:
+            agregados = get_feature_store().obtener(request.cliente_id)
+        except Exception as e:
+            logger.exception("❌ Error leyendo el feature store: %s", e)
+            raise HTTPException(status_code=503, detail="Feature store no disponible")
+        for campo in faltantes:
+            datos[campo] = agregados[campo]
+        t1 = time.perf_counter()
+        ETAPAS.observar("feature_store", t1 - t0)
+        registrar_span("feature_store", t0, t1)
+    
+    return _procesar_prediccion(PredictRequestFull.model_construct(**datos))
+
+
+class RespuestaNDJSON(StreamingResponse):
+    """
+    StreamingResponse que no escucha la desconexión del cliente
+
+    El generador lee el body del request mientras responde; la respuesta
+    estándar consumiría esos mensajes de receive() buscando http.disconnect.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+@router.post("/predict/lote", response_class=RespuestaNDJSON)
+async def predecir_lote(http_request: Request):
+    """
+    Puntuación masiva desde un archivo columnar (body crudo, sin multipart)
+
+    - Content-Type text/csv: cabecera de data/dataset_sintetico.csv (+ venta_id opcional)
+    - Content-Type application/x-npy: arreglo (n, 11) en el orden de las features
+
+    Responde NDJSON ({"venta_id", "probabilidad", "recomendacion"} por fila) a
+    medida que lee el archivo; el cliente debe leer la respuesta mientras
+    envía (p. ej. curl -T archivo.csv -H "Content-Type: text/csv" URL).
+    """
+    decodificador = crear_decodificador(http_request.headers.get("content-type"))
+    if decodificador is None:
+        raise HTTPException(status_code=415, detail="Content-Type soportado: text/csv o application/x-npy")
+    
+    # Leer hasta la cabecera antes de responder: un formato inválido es un 400
+    flujo = http_request.stream()
+    pendientes = []
+    try:
+        async for datos in flujo:
+            pendientes += await run_in_threadpool(decodificador.alimentar, datos)
+            if decodificador.cabecera_leida:
+                break
+        else:
+            pendientes += await run_in_threadpool(decodificador.finalizar)
+            flujo = None
+    except ErrorFormatoLote as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    predictor = get_predictor()
+    logger.info("📦 Puntuación masiva iniciada (%s)", type(decodificador).__name__)
+    
+    async def generar():
+        nonlocal flujo
+        bloques = pendientes
+        total = 0
+        try:
+            while True:
+                for ids, X in bloques:
+                    lineas, conteo = await run_in_threadpool(LoteService.puntuar, predictor, ids, X)
+                    for recomendacion, n in conteo.items():
+                        if n:
+                            PREDICCIONES.inc(recomendacion, n)
+                    total += len(ids)
+                    yield lineas
+                if flujo is None:
+                    break
+                try:
+                    datos = await flujo.__anext__()
+                    bloques = await run_in_threadpool(decodificador.alimentar, datos)
+                except StopAsyncIteration:
+                    bloques = await run_in_threadpool(decodificador.finalizar)
+                    flujo = None
+        except ErrorFormatoLote as e:
+            yield ('{"error":%s}\n' % json.dumps(str(e))).encode("utf-8")
+        except ClientDisconnect:
+            logger.warning("⚠️  Puntuación masiva interrumpida: el cliente se desconectó (%d filas)", total)
+            return
+        logger.info("✅ Puntuación masiva completada: %d filas", total)
+    
+    return RespuestaNDJSON(generar())
@@ -2,8 +2,10 @@
 Router para gestión de recordatorios
 """
 
-from fastapi import APIRouter
-from app.services.prediccion_service import PrediccionService
+from fastapi import APIRouter, Query
+from app.services.prediccion_service import PrediccionService, ALERTAS_PAGINA, ALERTAS_PAGINA_MAX
+from app.services.archivo_service import ArchivoService
+from app.services.recordatorio_service import RecordatorioService
 from app.services.email_service import EmailService
 import logging
 
@@ -18,20 +20,15 @@ async def enviar_recordatorios_manual():
     try:
         logger.info("📨 Enviando recordatorios manualmente...")
         
-        alertas = PrediccionService.obtener_alertas_pendientes()
-        enviados = 0
+        resultado = await RecordatorioService.ejecutar(
+            "recordatorios_manual", email_service
+        )
         
-        for alerta in alertas:
-            if await email_service.enviar_recordatorio(alerta):
-                PrediccionService.marcar_enviado(alerta["venta_id"])
-                enviados += 1
-        
-        logger.info(f"✅ Recordatorios enviados: {enviados}/{len(alertas)}")
+        logger.info(f"✅ Recordatorios enviados: {resultado['enviados']}/{resultado['total']}")
         
         return {
             "success": True,
-            "enviados": enviados,
-            "total": len(alertas)
+            **resultado
         }
         
     except Exception as e:
@@ -61,11 +58,40 @@ def obtener_estadisticas():
         }
 
 
+@router.post("/recordatorios/archivar")
+def archivar_alertas():
+    """Mueve ahora las alertas cerradas al archivo (mismo job que el cron diario)"""
+    try:
+        resultado = ArchivoService.archivar()
+        if resultado["en_curso"]:
+            return {
+                "success": False,
+                "error": "Ya hay un archivado en curso (cron u otra réplica)",
+                **resultado
+            }
+        
+        return {
+            "success": True,
+            **resultado
+        }
+        
+    except Exception as e:
+        logger.error(f"❌ Error archivando alertas: {e}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
 @router.get("/recordatorios/alertas")
-def listar_alertas():
-    """Lista todas las alertas pendientes"""
+def listar_alertas(limite: int = Query(ALERTAS_PAGINA, ge=1, le=ALERTAS_PAGINA_MAX),
+                   cursor: str = None):
+    """
+    Lista las alertas pendientes por páginas (mayor probabilidad primero)
+    Para la página siguiente se pasa como cursor el 'siguiente' de la respuesta
+    """
     try:
-        alertas = PrediccionService.obtener_alertas_pendientes()
+        alertas, siguiente = PrediccionService.obtener_alertas_pendientes(limite, cursor)
         
         alertas_simplificadas = [
             {
@@ -86,7 +112,8 @@ def listar_alertas():
         return {
             "success": True,
             "total": len(alertas_simplificadas),
-            "alertas": alertas_simplificadas
+            "alertas": alertas_simplificadas,
+            "siguiente": siguiente
         }
         
     except Exception as e:
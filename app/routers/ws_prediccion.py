@@ -0,0 +1,132 @@
+"""
+Canal WebSocket de predicciones (/ws/predict) para clientes de alta tasa
+
+Protocolo (un mensaje JSON por frame, texto o binario):
+- Al conectar, el servidor envía {"tipo": "ventana", "max_en_vuelo": N}
+- Cliente -> servidor: {"id": <id del cliente>, "datos": {...PredictRequestFull...}}
+- Servidor -> cliente: {"id": ..., "resultado": {...PredictResponse...}}
+  o {"id": ..., "error": {"status": 400 | 422 | 500, "detalle": ...}}
+
+Las respuestas salen en el orden en que terminan, no en el de llegada: el
+cliente las asocia por id (y debe esperar todas antes de cerrar).
+
+Control de flujo: cada conexión tiene como máximo WS_MAX_EN_VUELO mensajes
+recibidos sin responder. Con la ventana llena el servidor deja de leer el
+socket y la contrapresión llega al cliente por TCP.
+
+Micro-lotes: WS_LOTES_CONCURRENTES tareas por conexión toman de la cola todo
+lo acumulado (hasta WS_LOTE_MAX mensajes) y lo puntúan con una sola llamada
+al modelo y un solo bulk_write en MongoDB. Con poco tráfico cada lote es de
+un mensaje: no se espera a juntar más.
+"""
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from app.routers.prediccion import _predecir_y_guardar_varios
+from app.schemas import PredictRequestFull
+from app.services.metricas import WS_CONEXIONES, WS_TAMANO_LOTE
+import asyncio
+import json
+import logging
+import os
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+WS_MAX_EN_VUELO = int(os.getenv("WS_MAX_EN_VUELO", 256))
+WS_LOTE_MAX = int(os.getenv("WS_LOTE_MAX", 64))
+WS_LOTES_CONCURRENTES = int(os.getenv("WS_LOTES_CONCURRENTES", 2))
+
+
+def _error(id_mensaje, status: int, detalle) -> str:
+    return json.dumps({"id": id_mensaje, "error": {"status": status, "detalle": detalle}})
+
+
+class CanalPrediccion:
+    """Lectura, micro-lotes y envío de respuestas de una conexión"""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.cola = asyncio.Queue()
+        self.ventana = asyncio.Semaphore(WS_MAX_EN_VUELO)
+        self._envio = asyncio.Lock()
+
+    async def enviar(self, mensajes: list):
+        """Envía los mensajes seguidos (las tareas de puntuación comparten el socket)"""
+        async with self._envio:
+            for mensaje in mensajes:
+                await self.websocket.send_text(mensaje)
+
+    @staticmethod
+    def _decodificar(texto):
+        """(id, request, None) o (id, None, mensaje de error)"""
+        try:
+            mensaje = json.loads(texto)
+            id_mensaje = mensaje["id"]
+            datos = mensaje["datos"]
+        except (ValueError, TypeError, KeyError):
+            return None, None, _error(None, 400, 'Mensaje inválido: se espera {"id": ..., "datos": {...}}')
+        try:
+            return id_mensaje, PredictRequestFull.model_validate(datos), None
+        except ValidationError as e:
+            return id_mensaje, None, _error(id_mensaje, 422, json.loads(e.json(include_url=False)))
+
+    async def leer(self):
+        """Recibe mensajes hasta que el cliente cierra; los válidos van a la cola"""
+        while True:
+            # Con la ventana llena no se lee más del socket (contrapresión TCP)
+            await self.ventana.acquire()
+            mensaje = await self.websocket.receive()
+            if mensaje["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(mensaje.get("code", 1000))
+
+            id_mensaje, request, error = self._decodificar(mensaje.get("text") or mensaje.get("bytes"))
+            if error is not None:
+                await self.enviar([error])
+                self.ventana.release()
+                continue
+            self.cola.put_nowait((id_mensaje, request))
+
+    async def puntuar(self):
+        """Toma lo acumulado en la cola, lo puntúa junto y responde"""
+        while True:
+            lote = [await self.cola.get()]
+            while len(lote) < WS_LOTE_MAX and not self.cola.empty():
+                lote.append(self.cola.get_nowait())
+            WS_TAMANO_LOTE.observar(None, len(lote))
+
+            try:
+                respuestas = await run_in_threadpool(_predecir_y_guardar_varios, [r for _, r in lote])
+                mensajes = [json.dumps({"id": i, "resultado": r}) for (i, _), r in zip(lote, respuestas)]
+            except Exception as e:
+                logger.exception("❌ Error en micro-lote de %d predicciones: %s", len(lote), e)
+                mensajes = [_error(i, 500, str(e)) for i, _ in lote]
+
+            try:
+                await self.enviar(mensajes)
+            finally:
+                for _ in lote:
+                    self.ventana.release()
+
+
+@router.websocket("/ws/predict")
+async def canal_prediccion(websocket: WebSocket):
+    """Predicciones en streaming sobre una conexión persistente (ver el protocolo arriba)"""
+    await websocket.accept()
+    WS_CONEXIONES.inc()
+    canal = CanalPrediccion(websocket)
+    tareas = [asyncio.create_task(canal.puntuar()) for _ in range(WS_LOTES_CONCURRENTES)]
+    logger.info("🔗 Canal /ws/predict abierto (%s)", websocket.client)
+    try:
+        await canal.enviar([json.dumps({"tipo": "ventana", "max_en_vuelo": WS_MAX_EN_VUELO})])
+        await canal.leer()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
+        # Consumir los errores de envío de tareas que fallaron con la conexión cerrada
+        await asyncio.gather(*tareas, return_exceptions=True)
+        WS_CONEXIONES.dec()
+        logger.info("🔌 Canal /ws/predict cerrado (%s)", websocket.client)
@@ -4,7 +4,7 @@ VERSIÓN 4.0: Con MongoDB y datos completos del cliente
 """
 
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
 
@@ -104,6 +104,46 @@ class PredictRequestFull(BaseModel):
         }
 
 
+class PredictRequestCliente(PredictRequestFull):
+    """
+    PredictRequestFull con las 4 features de cliente opcionales
+
+    Las que falten se completan desde el feature store (agregados por cliente_id)
+    """
+    
+    total_compras_previas: Optional[int] = Field(None, ge=0, description="Compras anteriores (del feature store si falta)")
+    total_cancelaciones_previas: Optional[int] = Field(None, ge=0, description="Cancelaciones anteriores (del feature store si falta)")
+    tasa_cancelacion_historica: Optional[float] = Field(None, ge=0, le=1, description="Tasa de cancelación (del feature store si falta)")
+    monto_promedio_compras: Optional[float] = Field(None, ge=0, description="Promedio de gasto (del feature store si falta)")
+
+
+class EventoCliente(BaseModel):
+    """Evento de compra o cancelación de un cliente para el feature store"""
+    
+    cliente_id: str = Field(..., description="ID del cliente")
+    tipo: Literal["compra", "cancelacion"] = Field(..., description="compra o cancelacion")
+    monto: Optional[float] = Field(None, ge=0, description="Monto de la compra")
+    evento_id: Optional[str] = Field(None, description="ID único del evento (evita contarlo dos veces)")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "cliente_id": "cli_001",
+                "tipo": "compra",
+                "monto": 1850.0,
+                "evento_id": "venta_001"
+            }
+        }
+
+
+class AgregadosCliente(BaseModel):
+    """Agregados absolutos de un cliente (carga inicial o reconciliación)"""
+    
+    compras: int = Field(..., ge=0, description="Total de compras")
+    cancelaciones: int = Field(..., ge=0, description="Total de cancelaciones")
+    suma_montos: float = Field(..., ge=0, description="Suma de los montos de las compras")
+
+
 class PredictResponse(BaseModel):
     """Response del endpoint /predict"""
     
@@ -113,6 +153,10 @@ class PredictResponse(BaseModel):
     probabilidad_cancelacion: float = Field(..., ge=0, le=1, description="Probabilidad de cancelación")
     recomendacion: str = Field(..., description="Recomendación: sin_accion, revisar_manual, enviar_recordatorio")
     factores_riesgo: List[str] = Field(default=[], description="Lista de factores de riesgo detectados")
+    probabilidad_estimada: bool = Field(
+        default=False,
+        description="True si la probabilidad es una estimación del modo de decisión anticipada (la recomendación es exacta)"
+    )
     
     class Config:
         json_schema_extra = {
@@ -125,7 +169,8 @@ class PredictResponse(BaseModel):
                 "factores_riesgo": [
                     "Historial de cancelaciones previas",
                     "Reserva con mucha anticipación"
-                ]
+                ],
+                "probabilidad_estimada": False
             }
         }
 
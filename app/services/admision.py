@@ -0,0 +1,248 @@
+"""
+Control de admisión adaptativo para las rutas de predicción
+
+Limita cuántas predicciones se procesan a la vez con un límite AIMD
+(aumento aditivo / recorte multiplicativo) guiado por la latencia
+observada:
+- Si una predicción termina por debajo de la latencia objetivo y el límite
+  está en uso, el límite sube ~1 por cada "ventana" de requests (+1/límite)
+- Si supera el objetivo o responde 5xx, el límite se multiplica por
+  ADMISION_FACTOR_RECORTE (como máximo un recorte por latencia media)
+
+Lo que no entra espera en una cola acotada, en orden de llegada, con un
+deadline por request (ADMISION_DEADLINE_MS o la cabecera X-Request-Timeout-Ms
+si es menor). Se responde 503 con Retry-After de inmediato cuando la cola
+está llena o cuando la espera estimada ya supera el deadline, y también si
+el deadline vence en la cola: el request no llega al threadpool.
+
+En curso, cola, límite y rechazos se exponen en /metrics para el autoscaling.
+Con varios workers (servidor.py) cada uno tiene su limitador y su cola;
+/metrics muestra la suma de los workers vivos (la del pod).
+"""
+
+from app.services.metricas import Contador, Medidor
+from collections import deque
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+ADMISION_ACTIVA = os.getenv("ADMISION_ACTIVA", "true").lower() == "true"
+RUTAS = tuple(r.strip() for r in os.getenv("ADMISION_RUTAS", "/predict,/predict/cliente").split(",") if r.strip())
+LIMITE_INICIAL = int(os.getenv("ADMISION_LIMITE_INICIAL", 16))
+LIMITE_MIN = int(os.getenv("ADMISION_LIMITE_MIN", 2))
+LIMITE_MAX = int(os.getenv("ADMISION_LIMITE_MAX", 40))
+LATENCIA_OBJETIVO = float(os.getenv("ADMISION_LATENCIA_OBJETIVO_MS", 200)) / 1000
+FACTOR_RECORTE = float(os.getenv("ADMISION_FACTOR_RECORTE", 0.9))
+COLA_MAX = int(os.getenv("ADMISION_COLA_MAX", 100))
+DEADLINE = float(os.getenv("ADMISION_DEADLINE_MS", 2000)) / 1000
+
+ADMISION_EN_CURSO = Medidor(
+    "admision_predicciones_en_curso",
+    "Predicciones admitidas en proceso"
+)
+
+ADMISION_COLA = Medidor(
+    "admision_cola_espera",
+    "Predicciones esperando en la cola de admisión"
+)
+
+ADMISION_LIMITE = Medidor(
+    "admision_limite_concurrencia",
+    "Límite actual de predicciones concurrentes (AIMD)"
+)
+
+ADMISION_RECHAZOS = Contador(
+    "admision_rechazos_total",
+    "Predicciones rechazadas con 503 por motivo",
+    etiqueta="motivo",
+    valores=("cola_llena", "deadline", "timeout_cola")
+)
+
+
+class Rechazo(Exception):
+    """El request no puede atenderse a tiempo"""
+
+    def __init__(self, motivo: str, reintentar_en: float):
+        super().__init__(motivo)
+        self.motivo = motivo
+        self.reintentar_en = reintentar_en
+
+
+class LimitadorAdaptativo:
+    """
+    Límite de concurrencia AIMD con cola FIFO acotada
+
+    Todo el estado se modifica desde el event loop (sin locks).
+    """
+
+    def __init__(self, inicial: int = LIMITE_INICIAL, minimo: int = LIMITE_MIN, maximo: int = LIMITE_MAX,
+                 objetivo: float = LATENCIA_OBJETIVO, cola_max: int = COLA_MAX,
+                 factor_recorte: float = FACTOR_RECORTE):
+        self.limite = float(inicial)
+        self.minimo = minimo
+        self.maximo = maximo
+        self.objetivo = objetivo
+        self.cola_max = cola_max
+        self.factor_recorte = factor_recorte
+        self.en_curso = 0
+        self.latencia_media = objetivo
+        self._cola = deque()
+        self._ultimo_recorte = 0.0
+        self._publicado = {"en_curso": 0, "cola": 0, "limite": 0}
+        self._publicar()
+
+    def _publicar(self):
+        """Lleva los medidores de /metrics a los valores actuales"""
+        for clave, medidor, valor in (
+            ("en_curso", ADMISION_EN_CURSO, self.en_curso),
+            ("cola", ADMISION_COLA, len(self._cola)),
+            ("limite", ADMISION_LIMITE, int(self.limite)),
+        ):
+            delta = valor - self._publicado[clave]
+            if delta:
+                medidor.inc(n=delta)
+                self._publicado[clave] = valor
+
+    def espera_estimada(self, posicion: int) -> float:
+        """Segundos hasta que se libere un lugar para la posición dada de la cola"""
+        return (posicion + 1) * self.latencia_media / max(int(self.limite), 1)
+
+    def _reintentar_en(self) -> float:
+        return self.espera_estimada(len(self._cola))
+
+    async def adquirir(self, deadline: float):
+        """
+        Espera un lugar hasta deadline (time.monotonic())
+
+        Raises:
+            Rechazo: si la cola está llena, la espera estimada supera el deadline
+                     o el deadline vence en la cola
+        """
+        if self.en_curso < int(self.limite) and not self._cola:
+            self.en_curso += 1
+            self._publicar()
+            return
+
+        if len(self._cola) >= self.cola_max:
+            raise Rechazo("cola_llena", self._reintentar_en())
+        restante = deadline - time.monotonic()
+        if self.espera_estimada(len(self._cola)) > restante:
+            raise Rechazo("deadline", self._reintentar_en())
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._cola.append(futuro)
+        self._publicar()
+        try:
+            await asyncio.wait_for(futuro, restante)
+        except asyncio.TimeoutError:
+            raise Rechazo("timeout_cola", self._reintentar_en())
+        except asyncio.CancelledError:
+            # Cliente desconectado: devolver el lugar si ya se había concedido
+            if futuro.done() and not futuro.cancelled():
+                self.liberar(None)
+            raise
+        finally:
+            try:
+                self._cola.remove(futuro)
+            except ValueError:
+                pass
+            self._publicar()
+
+    def liberar(self, latencia, error: bool = False):
+        """Devuelve un lugar (latencia=None si el request no llegó a procesarse)"""
+        if latencia is not None:
+            self._ajustar(latencia, error)
+        self.en_curso -= 1
+        # Ceder los lugares libres a los primeros de la cola
+        while self._cola and self.en_curso < int(self.limite):
+            futuro = self._cola.popleft()
+            if futuro.done():
+                continue
+            self.en_curso += 1
+            futuro.set_result(None)
+        self._publicar()
+
+    def _ajustar(self, latencia: float, error: bool):
+        self.latencia_media += 0.1 * (latencia - self.latencia_media)
+        if error or latencia > self.objetivo:
+            ahora = time.monotonic()
+            if ahora - self._ultimo_recorte >= self.latencia_media:
+                self.limite = max(float(self.minimo), self.limite * self.factor_recorte)
+                self._ultimo_recorte = ahora
+        elif self.en_curso >= self.limite / 2:
+            self.limite = min(float(self.maximo), self.limite + 1 / self.limite)
+
+    def estado(self) -> dict:
+        return {
+            "limite": round(self.limite, 2),
+            "en_curso": self.en_curso,
+            "cola": len(self._cola),
+            "latencia_media_ms": round(self.latencia_media * 1000, 2),
+        }
+
+
+def _deadline_request(scope) -> float:
+    """Deadline absoluto: ADMISION_DEADLINE_MS o X-Request-Timeout-Ms si es menor"""
+    plazo = DEADLINE
+    for clave, valor in scope.get("headers", []):
+        if clave == b"x-request-timeout-ms":
+            try:
+                plazo = min(plazo, float(valor) / 1000)
+            except ValueError:
+                pass
+            break
+    return time.monotonic() + plazo
+
+
+class ControlAdmisionMiddleware:
+    """Middleware ASGI que aplica el LimitadorAdaptativo a las RUTAS de predicción"""
+
+    def __init__(self, app, limitador: LimitadorAdaptativo = None, rutas: tuple = RUTAS):
+        self.app = app
+        self.limitador = limitador or LimitadorAdaptativo()
+        self.rutas = frozenset(rutas)
+
+    async def __call__(self, scope, receive, send):
+        if not ADMISION_ACTIVA or scope["type"] != "http" or scope["path"] not in self.rutas:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.limitador.adquirir(_deadline_request(scope))
+        except Rechazo as rechazo:
+            ADMISION_RECHAZOS.inc(rechazo.motivo)
+            logger.debug("⛔ %s rechazado (%s) - %s", scope["path"], rechazo.motivo, self.limitador.estado())
+            await self._rechazar(send, rechazo)
+            return
+
+        estado = {"codigo": 500}
+
+        async def send_con_estado(message):
+            if message["type"] == "http.response.start":
+                estado["codigo"] = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_con_estado)
+        finally:
+            self.limitador.liberar(time.perf_counter() - t0, error=estado["codigo"] >= 500)
+
+    @staticmethod
+    async def _rechazar(send, rechazo: Rechazo):
+        cuerpo = json.dumps({"detail": "Servicio saturado, reintentar más tarde", "motivo": rechazo.motivo}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(cuerpo)).encode()),
+                (b"retry-after", str(max(1, math.ceil(rechazo.reintentar_en))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": cuerpo})
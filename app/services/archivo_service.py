@@ -0,0 +1,198 @@
+"""
+Retención de predicciones_cancelacion
+
+Una alerta deja de ser accionable cuando su recordatorio se envió hace más
+de ARCHIVO_RETENCION_ENVIADOS_DIAS o cuando su fecha_venta quedó atrás hace
+más de ARCHIVO_RETENCION_VENCIDOS_DIAS. Según ARCHIVO_MODO esas alertas:
+- coleccion: se mueven a predicciones_cancelacion_archivo
+- archivos:  se mueven a archivos NDJSON comprimidos en ARCHIVO_DIR (uno por
+             día, un miembro gzip por lote)
+- ttl:       las borra MongoDB con índices TTL (sin copia)
+
+En los dos primeros modos un job diario mueve las alertas cerradas por
+lotes: copia el lote al destino, lo borra de la colección y espera
+ARCHIVO_PAUSA_MS antes del siguiente, con un máximo de documentos por
+ejecución para no competir con el tráfico de /predict. Si el proceso se
+interrumpe entre la copia y el borrado, la siguiente ejecución vuelve a
+copiar el lote sin duplicarlo en la colección de archivo.
+
+El job diario y POST /recordatorios/archivar comparten el bloqueo
+"archivado" (app/services/bloqueos.py): con varios workers o réplicas solo
+una ejecución mueve alertas a la vez; las demás terminan sin hacer nada.
+"""
+
+from app.database import get_db
+from app.services.bloqueos import BloqueoService
+from app.services.metricas import ALERTAS_ARCHIVADAS
+from datetime import datetime, timedelta
+import gzip
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+ARCHIVO_ACTIVO = os.getenv("ARCHIVO_ACTIVO", "true").lower() == "true"
+ARCHIVO_MODO = os.getenv("ARCHIVO_MODO", "coleccion").lower()
+ARCHIVO_DIR = os.getenv("ARCHIVO_DIR", "archivo")
+RETENCION_ENVIADOS_DIAS = float(os.getenv("ARCHIVO_RETENCION_ENVIADOS_DIAS", 30))
+RETENCION_VENCIDOS_DIAS = float(os.getenv("ARCHIVO_RETENCION_VENCIDOS_DIAS", 7))
+TAMANO_LOTE_ARCHIVO = int(os.getenv("ARCHIVO_TAMANO_LOTE", 500))
+PAUSA_ARCHIVO = float(os.getenv("ARCHIVO_PAUSA_MS", 200)) / 1000
+MAX_POR_EJECUCION = int(os.getenv("ARCHIVO_MAX_POR_EJECUCION", 50000))
+# Hora del job diario (fuera del pico de tráfico)
+ARCHIVO_HORA = int(os.getenv("ARCHIVO_HORA", 3))
+
+COLECCION_ARCHIVO = "predicciones_cancelacion_archivo"
+
+# Bloqueo compartido por el cron y el endpoint; se renueva en cada lote
+BLOQUEO_ARCHIVADO = "archivado"
+DURACION_BLOQUEO = float(os.getenv("ARCHIVO_BLOQUEO_S", 600))
+
+MODOS = ("coleccion", "archivos", "ttl")
+
+# Índices que usa el filtro de alertas cerradas (TTL en el modo ttl)
+INDICE_ENVIADOS = "retencion_enviados"
+INDICE_VENCIDOS = "retencion_fecha_venta"
+
+
+class ArchivoService:
+    """Archivado por lotes (o TTL) de las alertas que ya no son accionables"""
+
+    @staticmethod
+    def filtro_cerradas(ahora: datetime) -> dict:
+        """Alertas con recordatorio enviado hace tiempo o con la venta ya pasada"""
+        return {"$or": [
+            {
+                "recordatorio_enviado": True,
+                "fecha_envio_recordatorio": {"$lt": ahora - timedelta(days=RETENCION_ENVIADOS_DIAS)}
+            },
+            {"fecha_venta": {"$lt": ahora - timedelta(days=RETENCION_VENCIDOS_DIAS)}},
+        ]}
+
+    @staticmethod
+    def asegurar_indices():
+        """
+        Índices de retención sobre fecha_envio_recordatorio y fecha_venta
+
+        En el modo ttl llevan expireAfterSeconds; al cambiar de modo el
+        índice existente se recrea con las opciones nuevas.
+        """
+        if ARCHIVO_MODO not in MODOS:
+            logger.error(f"❌ ARCHIVO_MODO inválido: {ARCHIVO_MODO} (opciones: {', '.join(MODOS)})")
+            return
+        try:
+            from pymongo.errors import OperationFailure
+
+            db = get_db()
+            col = db.predicciones_cancelacion
+            ttl = ARCHIVO_MODO == "ttl"
+            indices = (
+                (INDICE_ENVIADOS, [("fecha_envio_recordatorio", 1)], RETENCION_ENVIADOS_DIAS,
+                 {"partialFilterExpression": {"recordatorio_enviado": True}}),
+                (INDICE_VENCIDOS, [("fecha_venta", 1)], RETENCION_VENCIDOS_DIAS, {}),
+            )
+            for nombre, claves, dias, opciones in indices:
+                if ttl:
+                    opciones = {**opciones, "expireAfterSeconds": int(dias * 86400)}
+                try:
+                    col.create_index(claves, name=nombre, **opciones)
+                except OperationFailure as e:
+                    # IndexOptionsConflict / IndexKeySpecsConflict: otro modo o retención
+                    if e.code not in (85, 86):
+                        raise
+                    logger.warning(f"⚠️  Recreando el índice {nombre} con las opciones de ARCHIVO_MODO={ARCHIVO_MODO}")
+                    col.drop_index(nombre)
+                    col.create_index(claves, name=nombre, **opciones)
+
+            if ARCHIVO_MODO == "coleccion":
+                db[COLECCION_ARCHIVO].create_index("venta_id", name="venta_id")
+            logger.info(f"✅ Índices de retención verificados (modo {ARCHIVO_MODO})")
+
+        except Exception as e:
+            logger.error(f"❌ Error creando índices de retención: {e}")
+
+    @staticmethod
+    def archivar(max_documentos: int = MAX_POR_EJECUCION, tamano_lote: int = TAMANO_LOTE_ARCHIVO,
+                 pausa: float = PAUSA_ARCHIVO) -> dict:
+        """
+        Mueve las alertas cerradas al destino de ARCHIVO_MODO por lotes
+
+        Bloqueante (pausa entre lotes): el scheduler lo ejecuta en su pool de hilos.
+        Si otra ejecución tiene el bloqueo no archiva nada y devuelve en_curso=True.
+
+        Returns:
+            Diccionario con archivados, lotes, modo, segundos y en_curso
+        """
+        if ARCHIVO_MODO not in ("coleccion", "archivos"):
+            return {"archivados": 0, "lotes": 0, "modo": ARCHIVO_MODO, "segundos": 0.0, "en_curso": False}
+
+        dueno = BloqueoService.tomar(BLOQUEO_ARCHIVADO, DURACION_BLOQUEO)
+        if dueno is None:
+            logger.info("⏸️  Archivado en curso en otro proceso: se omite esta ejecución")
+            return {"archivados": 0, "lotes": 0, "modo": ARCHIVO_MODO, "segundos": 0.0, "en_curso": True}
+        try:
+            return ArchivoService._archivar_lotes(dueno, max_documentos, tamano_lote, pausa)
+        finally:
+            BloqueoService.liberar(BLOQUEO_ARCHIVADO, dueno)
+
+    @staticmethod
+    def _archivar_lotes(dueno: str, max_documentos: int, tamano_lote: int, pausa: float) -> dict:
+        """Bucle de archivado con el bloqueo tomado"""
+        t0 = time.perf_counter()
+        col = get_db().predicciones_cancelacion
+        filtro = ArchivoService.filtro_cerradas(datetime.utcnow())
+        archivados = 0
+        lotes = 0
+
+        while archivados < max_documentos:
+            if not BloqueoService.renovar(BLOQUEO_ARCHIVADO, dueno, DURACION_BLOQUEO):
+                logger.warning("⚠️  Se perdió el bloqueo de archivado (venció): se detiene la ejecución")
+                break
+            lote = list(col.find(filtro).limit(min(tamano_lote, max_documentos - archivados)))
+            if not lote:
+                break
+
+            if ARCHIVO_MODO == "coleccion":
+                ArchivoService._copiar_a_coleccion(lote)
+            else:
+                ArchivoService._copiar_a_archivo(lote)
+            col.delete_many({"_id": {"$in": [doc["_id"] for doc in lote]}})
+
+            archivados += len(lote)
+            lotes += 1
+            ALERTAS_ARCHIVADAS.inc(ARCHIVO_MODO, len(lote))
+            if len(lote) < tamano_lote:
+                break
+            time.sleep(pausa)
+
+        segundos = time.perf_counter() - t0
+        if archivados:
+            logger.info(f"🗄️  Alertas archivadas ({ARCHIVO_MODO}): {archivados} en {lotes} lotes ({segundos:.1f} s)")
+        return {"archivados": archivados, "lotes": lotes, "modo": ARCHIVO_MODO,
+                "segundos": round(segundos, 3), "en_curso": False}
+
+    @staticmethod
+    def _copiar_a_coleccion(lote: list):
+        """insert_many sin orden; los _id ya copiados en una ejecución interrumpida se ignoran"""
+        from pymongo.errors import BulkWriteError
+
+        try:
+            get_db()[COLECCION_ARCHIVO].insert_many(lote, ordered=False)
+        except BulkWriteError as e:
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+
+    @staticmethod
+    def _copiar_a_archivo(lote: list):
+        """Agrega el lote como un miembro gzip al archivo del día y lo lleva a disco"""
+        from bson import json_util
+
+        os.makedirs(ARCHIVO_DIR, exist_ok=True)
+        ruta = os.path.join(ARCHIVO_DIR, f"predicciones_cancelacion-{datetime.utcnow():%Y%m%d}.ndjson.gz")
+        datos = "".join(json_util.dumps(doc) + "\n" for doc in lote).encode("utf-8")
+        with open(ruta, "ab") as archivo:
+            with gzip.GzipFile(fileobj=archivo, mode="wb") as comprimido:
+                comprimido.write(datos)
+            archivo.flush()
+            os.fsync(archivo.fileno())
@@ -0,0 +1,65 @@
+"""
+Perfil de arranque del proceso
+
+Registra cuándo termina cada fase del arranque, en segundos desde que el
+sistema operativo creó el proceso (o desde el fork, con servidor.py):
+- imports:           main_v4 importado (FastAPI, routers, servicios livianos)
+- modelo, mongo:     fase crítica (en paralelo): modelo cargado y MongoDB conectado
+- listo:             fin de la fase crítica, el servicio empieza a responder
+- indices, scheduler: fase diferida, ya con tráfico
+- diferido_completo: fin de la fase diferida
+
+El perfil se incluye en GET /health y cada fase en el histograma
+arranque_fase_segundos de /metrics (time-to-ready entre réplicas).
+"""
+
+from app.services.metricas import Histograma
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+FASES = ("imports", "modelo", "mongo", "listo", "indices", "scheduler", "diferido_completo")
+
+ARRANQUE_FASES = Histograma(
+    "arranque_fase_segundos",
+    "Segundos desde el inicio del proceso hasta el fin de cada fase del arranque",
+    buckets=(0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 20.0, 30.0, 60.0),
+    etiqueta="fase",
+    valores=FASES
+)
+
+
+def _inicio_proceso() -> float:
+    """Instante de creación del proceso en el reloj de time.monotonic()"""
+    try:
+        with open("/proc/self/stat") as f:
+            # El nombre del comando va entre paréntesis y puede tener espacios
+            campos = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        edad = uptime - int(campos[19]) / os.sysconf("SC_CLK_TCK")
+        return time.monotonic() - max(edad, 0.0)
+    except (OSError, ValueError, IndexError):
+        # Sin /proc: se cuenta desde la importación de este módulo
+        return time.monotonic()
+
+
+INICIO_PROCESO = _inicio_proceso()
+
+_marcas = {}
+
+
+def marcar(fase: str) -> float:
+    """Registra el fin de una fase; devuelve los segundos desde el inicio del proceso"""
+    segundos = time.monotonic() - INICIO_PROCESO
+    _marcas[fase] = segundos
+    ARRANQUE_FASES.observar(fase, segundos)
+    logger.info("⏱️  Arranque: %s a los %.2f s", fase, segundos)
+    return segundos
+
+
+def perfil() -> dict:
+    """Segundos hasta cada fase registrada (las pendientes no aparecen)"""
+    return {fase: round(_marcas[fase], 3) for fase in FASES if fase in _marcas}
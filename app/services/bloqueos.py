@@ -0,0 +1,67 @@
+"""
+Bloqueos con vencimiento en MongoDB para tareas que deben correr una sola vez
+
+Con varios workers (servidor.py) y varias réplicas, tareas como el archivado
+o la creación de índices pueden dispararse a la vez desde distintos procesos.
+Un bloqueo es un documento {_id: nombre, dueno, hasta} en la colección
+bloqueos_jobs: lo toma quien logra escribirlo cuando no existe o ya venció.
+Si el proceso muere sin liberarlo, vence solo al pasar 'hasta'.
+"""
+
+from app.database import get_db
+from datetime import datetime, timedelta
+import logging
+import os
+import socket
+import uuid
+
+logger = logging.getLogger(__name__)
+
+COLECCION_BLOQUEOS = "bloqueos_jobs"
+
+
+class BloqueoService:
+    """Toma, renovación y liberación de bloqueos por nombre"""
+
+    @staticmethod
+    def tomar(nombre: str, duracion: float):
+        """
+        Intenta tomar el bloqueo por 'duracion' segundos
+
+        Returns:
+            Identificador del dueño (para renovar/liberar) o None si lo tiene otro proceso
+        """
+        from pymongo.errors import DuplicateKeyError
+
+        dueno = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        ahora = datetime.utcnow()
+        try:
+            # Si el bloqueo vigente es de otro, el filtro no coincide y el upsert choca con el _id
+            get_db()[COLECCION_BLOQUEOS].update_one(
+                {"_id": nombre, "hasta": {"$lt": ahora}},
+                {"$set": {"dueno": dueno, "desde": ahora, "hasta": ahora + timedelta(seconds=duracion)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return None
+        return dueno
+
+    @staticmethod
+    def renovar(nombre: str, dueno: str, duracion: float) -> bool:
+        """Extiende el bloqueo propio; False si ya no es de este dueño"""
+        resultado = get_db()[COLECCION_BLOQUEOS].update_one(
+            {"_id": nombre, "dueno": dueno},
+            {"$set": {"hasta": datetime.utcnow() + timedelta(seconds=duracion)}}
+        )
+        return resultado.matched_count > 0
+
+    @staticmethod
+    def liberar(nombre: str, dueno: str):
+        """Libera el bloqueo propio (vence ya)"""
+        try:
+            get_db()[COLECCION_BLOQUEOS].update_one(
+                {"_id": nombre, "dueno": dueno},
+                {"$set": {"hasta": datetime.utcnow()}}
+            )
+        except Exception as e:
+            logger.error(f"❌ Error liberando el bloqueo {nombre}: {e}")
@@ -0,0 +1,131 @@
+"""
+Captura muestreada de tráfico real de /predict para reproducirlo después
+
+Una fracción CAPTURA_TASA_MUESTREO de los POST a CAPTURA_RUTAS se guarda
+como una línea JSON {"t", "ruta", "tasa", "body"} en archivos NDJSON
+comprimidos y rotativos (CAPTURA_DIR), con el instante de llegada en tiempo
+Unix. scripts/replay.py los vuelve a enviar respetando los tiempos relativos.
+
+El body se anonimiza en el hilo escritor (fuera de la ruta del request):
+- venta_id y cliente_id se reemplazan por un HMAC con CAPTURA_SAL, estable:
+  el mismo cliente sigue siendo el mismo cliente en la captura
+- email_cliente y nombre_cliente se derivan de ese mismo seudónimo (o, si
+  el body no trae cliente_id, de un HMAC del email): nunca se guardan tal cual
+- Las features, el paquete, el destino y fecha_venta se conservan
+
+El middleware lee el body completo antes de pasar el request a la app, así
+también quedan capturadas las llegadas que el control de admisión rechaza
+con 503 sin leer el body (el replay reproduce la tasa de llegada real).
+
+Sin CAPTURA_SAL cada proceso usa una sal aleatoria (los seudónimos no
+coinciden entre workers ni entre reinicios).
+"""
+
+from app.services.escritor_rotativo import EscritorRotativo
+import hashlib
+import hmac
+import json
+import os
+import random
+import time
+
+TASA_MUESTREO = float(os.getenv("CAPTURA_TASA_MUESTREO", 0.0))
+DIRECTORIO_CAPTURA = os.getenv("CAPTURA_DIR", "capturas")
+RUTAS = tuple(r.strip() for r in os.getenv("CAPTURA_RUTAS", "/predict,/predict/cliente").split(",") if r.strip())
+SAL = os.getenv("CAPTURA_SAL", "").encode("utf-8") or os.urandom(16)
+
+# Bodies más grandes no son de /predict: no se capturan
+MAX_BODY = 64 * 1024
+
+
+def _seudonimo(prefijo: str, valor) -> str:
+    resumen = hmac.new(SAL, str(valor).encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+    return f"{prefijo}_{resumen}"
+
+
+def anonimizar(body: dict) -> dict:
+    """Copia del body con los identificadores y datos personales reemplazados"""
+    anonimo = dict(body)
+    if "venta_id" in anonimo:
+        anonimo["venta_id"] = _seudonimo("venta", anonimo["venta_id"])
+    if "cliente_id" in anonimo:
+        cliente = _seudonimo("cli", anonimo["cliente_id"])
+        anonimo["cliente_id"] = cliente
+    else:
+        # Request incompleto (422): los datos personales se reemplazan igual
+        cliente = _seudonimo("cli", anonimo.get("email_cliente", anonimo.get("nombre_cliente")))
+    if "email_cliente" in anonimo:
+        anonimo["email_cliente"] = f"{cliente}@ejemplo.com"
+    if "nombre_cliente" in anonimo:
+        anonimo["nombre_cliente"] = f"Cliente {cliente[4:12]}"
+    return anonimo
+
+
+def _serializar_captura(registro: tuple) -> bytes:
+    t_llegada, ruta, body = registro
+    try:
+        datos = json.loads(body)
+    except ValueError:
+        return b""  # body inválido (422 en el servicio): no aporta a la reproducción
+    if not isinstance(datos, dict):
+        return b""
+    linea = {"t": round(t_llegada, 6), "ruta": ruta, "tasa": TASA_MUESTREO, "body": anonimizar(datos)}
+    return json.dumps(linea, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+exportador = EscritorRotativo(
+    directorio=DIRECTORIO_CAPTURA,
+    prefijo="captura",
+    extension=".ndjson.gz",
+    serializar=_serializar_captura,
+    max_bytes=int(os.getenv("CAPTURA_MAX_BYTES", 50 * 1024 * 1024)),
+    max_archivos=int(os.getenv("CAPTURA_MAX_ARCHIVOS", 20)),
+    comprimir=True
+)
+
+
+class CapturaMiddleware:
+    """Middleware ASGI que copia el body de los requests muestreados al capturador"""
+
+    def __init__(self, app, rutas: tuple = RUTAS):
+        self.app = app
+        self.rutas = frozenset(rutas)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            TASA_MUESTREO <= 0
+            or scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in self.rutas
+            or random.random() >= TASA_MUESTREO
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        t_llegada = time.time()
+
+        # Body completo (hasta MAX_BODY) antes de la app: un 503 de admisión no lo lee
+        mensajes = []
+        tamano = 0
+        while True:
+            message = await receive()
+            mensajes.append(message)
+            if message["type"] != "http.request":
+                break
+            tamano += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                if tamano <= MAX_BODY:
+                    cuerpo = b"".join(m.get("body", b"") for m in mensajes)
+                    exportador.escribir((t_llegada, scope["path"], cuerpo))
+                break
+            if tamano > MAX_BODY:
+                break
+
+        pendientes = iter(mensajes)
+
+        async def receive_captura():
+            # Primero los mensajes ya leídos; después, el receive original
+            message = next(pendientes, None)
+            return message if message is not None else await receive()
+
+        await self.app(scope, receive_captura, send)
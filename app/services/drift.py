@@ -0,0 +1,239 @@
+"""
+Monitor de drift de features y de probabilidad con memoria constante
+
+El perfil de referencia (app/ml/perfil_referencia.json, generado por
+scripts/train.py) define por feature un conjunto fijo de bins:
+- Features continuas: bordes en los deciles del dataset de entrenamiento
+- Features categóricas: un bin por valor visto en el entrenamiento + "otro"
+- probabilidad_cancelacion: 10 bins de ancho 0.1
+
+Cada predicción incrementa un contador por feature en un arreglo
+preasignado (ContadoresPorHilo, sin locks): la memoria no depende del
+tráfico y observar cuesta un bisect por feature continua y un dict.get por
+categórica. GET /drift compara los conteos con las proporciones de
+referencia mediante el PSI (Population Stability Index).
+
+Con varios workers (servidor.py) los conteos se suman entre procesos y la
+ventana (POST /drift/reiniciar) es común a todos: ver app/services/multiproceso.py.
+"""
+
+from app.services import multiproceso
+from app.services.metricas import ContadoresPorHilo
+from bisect import bisect_right
+from datetime import datetime
+import json
+import logging
+import math
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PERFIL_REFERENCIA = os.getenv("DRIFT_PERFIL", "app/ml/perfil_referencia.json")
+
+# Features discretas con pocos valores: un bin por valor
+FEATURES_CATEGORICAS = (
+    "es_temporada_alta", "dia_semana_reserva", "metodo_pago_tarjeta",
+    "tiene_paquete", "destino_categoria"
+)
+
+CUANTILES_REFERENCIA = tuple(i / 10 for i in range(1, 10))
+BORDES_PROBABILIDAD = tuple(i / 10 for i in range(1, 10))
+
+# Interpretación habitual del PSI
+UMBRAL_PSI_MODERADO = 0.10
+UMBRAL_PSI_SIGNIFICATIVO = 0.25
+
+# Observaciones mínimas para que el PSI sea representativo
+MIN_OBSERVACIONES = int(os.getenv("DRIFT_MIN_OBSERVACIONES", 200))
+
+# Proporción mínima por bin (evita log(0) en bins vacíos)
+_EPSILON = 1e-4
+
+
+def _proporciones(conteos) -> list:
+    total = sum(conteos)
+    if total == 0:
+        return [0.0] * len(conteos)
+    return [c / total for c in conteos]
+
+
+def construir_perfil(features: dict, probabilidades) -> dict:
+    """
+    Perfil de referencia a partir de los datos de entrenamiento
+
+    Args:
+        features: dict nombre_feature -> arreglo (o DataFrame con esas columnas)
+        probabilidades: probabilidad_cancelacion del modelo sobre datos no vistos
+
+    Returns:
+        dict serializable a JSON
+    """
+    from app.services.predictor import FEATURE_NAMES
+
+    continuas, categoricas = {}, {}
+    for nombre in FEATURE_NAMES:
+        valores = np.asarray(features[nombre], dtype=np.float64)
+        if nombre in FEATURES_CATEGORICAS:
+            unicos, conteos = np.unique(valores, return_counts=True)
+            categoricas[nombre] = {
+                "valores": [int(v) if float(v).is_integer() else float(v) for v in unicos],
+                "proporciones": _proporciones(conteos.tolist()) + [0.0],  # último bin: "otro"
+            }
+        else:
+            bordes = np.unique(np.quantile(valores, CUANTILES_REFERENCIA))
+            conteos = np.bincount(np.searchsorted(bordes, valores, side="right"), minlength=len(bordes) + 1)
+            continuas[nombre] = {"bordes": bordes.tolist(), "proporciones": _proporciones(conteos.tolist())}
+
+    probabilidades = np.asarray(probabilidades, dtype=np.float64)
+    conteos = np.bincount(np.searchsorted(BORDES_PROBABILIDAD, probabilidades, side="right"),
+                          minlength=len(BORDES_PROBABILIDAD) + 1)
+    return {
+        "creado": datetime.now().isoformat(timespec="seconds"),
+        "filas": int(len(probabilidades)),
+        "continuas": continuas,
+        "categoricas": categoricas,
+        "probabilidad": {"bordes": list(BORDES_PROBABILIDAD), "proporciones": _proporciones(conteos.tolist())},
+    }
+
+
+def psi(referencia: list, observado: list) -> float:
+    """Population Stability Index entre dos distribuciones sobre los mismos bins"""
+    total = 0.0
+    for r, o in zip(referencia, observado):
+        r, o = max(r, _EPSILON), max(o, _EPSILON)
+        total += (o - r) * math.log(o / r)
+    return total
+
+
+def nivel_psi(valor: float) -> str:
+    if valor >= UMBRAL_PSI_SIGNIFICATIVO:
+        return "significativo"
+    if valor >= UMBRAL_PSI_MODERADO:
+        return "moderado"
+    return "estable"
+
+
+class MonitorDrift:
+    """Histogramas de tamaño fijo de las features y la probabilidad observadas"""
+
+    def __init__(self, perfil: dict):
+        self.perfil = perfil
+        self._continuas = []
+        self._categoricas = []
+        desplazamiento = 0
+
+        for nombre, datos in perfil["continuas"].items():
+            self._continuas.append((nombre, desplazamiento, tuple(datos["bordes"])))
+            desplazamiento += len(datos["proporciones"])
+        for nombre, datos in perfil["categoricas"].items():
+            indices = {valor: i for i, valor in enumerate(datos["valores"])}
+            self._categoricas.append((nombre, desplazamiento, indices, len(datos["valores"])))
+            desplazamiento += len(datos["proporciones"])
+
+        self._bordes_probabilidad = tuple(perfil["probabilidad"]["bordes"])
+        self._desplazamiento_probabilidad = desplazamiento
+        desplazamiento += len(perfil["probabilidad"]["proporciones"])
+
+        self._contadores = ContadoresPorHilo(desplazamiento)
+        self._base = [0] * desplazamiento
+        self._desde = datetime.utcnow()
+        self._lock = threading.Lock()
+        multiproceso.registrar_fuente("drift", self._contadores.totales)
+
+    def observar(self, features: dict, probabilidad: float, peso_probabilidad: int = 1):
+        """
+        Cuenta una predicción (features ya validadas por el schema)
+
+        probabilidad None cuenta solo las features (p. ej. una estimación del
+        modo de decisión); peso_probabilidad > 1 cuenta una probabilidad exacta
+        muestreada en nombre de las filas que no se completaron.
+        """
+        fragmento = self._contadores.fragmento()
+        for nombre, desplazamiento, bordes in self._continuas:
+            fragmento[desplazamiento + bisect_right(bordes, features[nombre])] += 1
+        for nombre, desplazamiento, indices, otro in self._categoricas:
+            fragmento[desplazamiento + indices.get(features[nombre], otro)] += 1
+        if probabilidad is not None:
+            indice = self._desplazamiento_probabilidad + bisect_right(self._bordes_probabilidad, probabilidad)
+            fragmento[indice] += peso_probabilidad
+
+    def _totales(self) -> list:
+        """Conteos acumulados de este proceso más los de los demás workers"""
+        otros = [datos.get("drift") for _, datos in multiproceso.leer_otros()]
+        return multiproceso.sumar(self._contadores.totales(), otros)
+
+    def _ventana(self):
+        """(base, desde) de la ventana actual, compartida entre workers si los hay"""
+        compartida = multiproceso.leer_compartido("drift_ventana")
+        if compartida and len(compartida["base"]) == len(self._base):
+            return compartida["base"], datetime.fromisoformat(compartida["desde"])
+        with self._lock:
+            return list(self._base), self._desde
+
+    def _conteos(self) -> list:
+        base, _ = self._ventana()
+        return [max(t - b, 0) for t, b in zip(self._totales(), base)]
+
+    def reiniciar(self):
+        """Empieza una ventana nueva de observación (los conteos anteriores se descartan)"""
+        totales = self._totales()
+        desde = datetime.utcnow()
+        with self._lock:
+            self._base = totales
+            self._desde = desde
+        if multiproceso.ACTIVO:
+            multiproceso.guardar_compartido("drift_ventana", {"base": totales, "desde": desde.isoformat()})
+
+    def reporte(self) -> dict:
+        """PSI por feature y de la probabilidad contra el perfil de referencia"""
+        conteos = self._conteos()
+        features = {}
+
+        grupos = [(nombre, d, self.perfil["continuas"][nombre]) for nombre, d, _ in self._continuas]
+        grupos += [(nombre, d, self.perfil["categoricas"][nombre]) for nombre, d, _, _ in self._categoricas]
+        for nombre, desplazamiento, datos in grupos:
+            referencia = datos["proporciones"]
+            valor = psi(referencia, _proporciones(conteos[desplazamiento:desplazamiento + len(referencia)]))
+            features[nombre] = {"psi": round(valor, 4), "nivel": nivel_psi(valor)}
+
+        referencia = self.perfil["probabilidad"]["proporciones"]
+        inicio = self._desplazamiento_probabilidad
+        histograma = conteos[inicio:inicio + len(referencia)]
+        # Cada fila cuenta en todas las features; la probabilidad puede venir muestreada y ponderada
+        observaciones = sum(histograma)
+        if grupos:
+            _, desplazamiento, datos = grupos[0]
+            observaciones = sum(conteos[desplazamiento:desplazamiento + len(datos["proporciones"])])
+        valor = psi(referencia, _proporciones(histograma))
+
+        return {
+            "observaciones": observaciones,
+            "suficientes": observaciones >= MIN_OBSERVACIONES,
+            "desde": self._ventana()[1].isoformat(timespec="seconds") + "Z",
+            "perfil_creado": self.perfil.get("creado"),
+            "max_psi_features": max((f["psi"] for f in features.values()), default=0.0),
+            "features": features,
+            "probabilidad": {
+                "psi": round(valor, 4),
+                "nivel": nivel_psi(valor),
+                "bordes": list(self._bordes_probabilidad),
+                "histograma": histograma,
+                "referencia": [round(p, 4) for p in referencia],
+            },
+        }
+
+
+def cargar_monitor(ruta: str = PERFIL_REFERENCIA):
+    """MonitorDrift con el perfil de ruta, o None si no existe (monitor desactivado)"""
+    if not os.path.exists(ruta):
+        logger.warning("⚠️  Sin perfil de referencia en %s - monitor de drift desactivado", ruta)
+        return None
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return MonitorDrift(json.load(f))
+    except (OSError, ValueError, KeyError) as e:
+        logger.error("❌ Perfil de referencia inválido (%s): %s", ruta, e)
+        return None
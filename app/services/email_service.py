@@ -10,8 +10,10 @@ import os
 from datetime import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import aiosmtplib
 import asyncio
+import time
+
+from app.services.metricas import ETAPAS
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +27,8 @@ class EmailService:
         self.smtp_user = os.getenv("SMTP_USER", "").strip()
         self.smtp_password = os.getenv("SMTP_PASSWORD", "").strip()
         self.email_mode = os.getenv("EMAIL_MODE", "simulacion").lower()
+        # Permite desactivar la verificación del certificado (p. ej. sink SMTP local de benchmarks)
+        self.smtp_validate_certs = os.getenv("SMTP_VALIDATE_CERTS", "true").lower() != "false"
         
         # Determinar si SMTP está configurado
         self.smtp_configured = bool(self.smtp_host and self.smtp_user and self.smtp_password)
@@ -130,6 +134,9 @@ class EmailService:
         Returns:
             True si se envió exitosamente, False en caso contrario
         """
+        # Solo el modo real usa SMTP: se importa con el primer envío, no al arrancar
+        import aiosmtplib
+        
         try:
             # Validar email del destinatario
             if not destinatario or "@" not in destinatario:
@@ -176,7 +183,8 @@ Agencia de Viajes
                 hostname=self.smtp_host,
                 port=self.smtp_port,
                 use_tls=False,  # Inicialmente sin TLS
-                start_tls=True   # Luego iniciar TLS con STARTTLS
+                start_tls=True,  # Luego iniciar TLS con STARTTLS
+                validate_certs=self.smtp_validate_certs
             ) as smtp:
                 await smtp.login(self.smtp_user, self.smtp_password)
                 await smtp.send_message(message)
@@ -211,6 +219,7 @@ Agencia de Viajes
         Returns:
             True si se procesó (enviado o simulado), False solo en errores críticos
         """
+        t0 = time.perf_counter()
         try:
             # Extraer datos del cliente
             email = alerta.get("email_cliente", "").strip()
@@ -281,6 +290,8 @@ Agencia de Viajes
             logger.error(f"❌ Error procesando recordatorio: {e}")
             # Importante: retornamos True para no bloquear el resto de recordatorios
             return True
+        finally:
+            ETAPAS.observar("email", time.perf_counter() - t0)
     
     def enviar_recordatorio_sync(self, alerta: dict) -> bool:
         """Versión sincrónica del envío de recordatorio"""
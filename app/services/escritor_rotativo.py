@@ -0,0 +1,132 @@
+"""
+Escritor de archivos rotativos en un hilo de fondo
+
+La ruta caliente solo encola el objeto (sin bloquear); la serialización y la
+escritura a disco ocurren en el hilo escritor. Cuando el archivo actual
+supera max_bytes se abre uno nuevo y se borran los más antiguos para no
+superar max_archivos.
+"""
+
+import glob
+import gzip
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+_FIN = object()
+
+
+class EscritorRotativo:
+    """Sink de archivos rotativos alimentado por una cola acotada"""
+
+    def __init__(self, directorio: str, prefijo: str, extension: str, serializar,
+                 max_bytes: int = 10 * 1024 * 1024, max_archivos: int = 5,
+                 cabecera: bytes = b"", comprimir: bool = False, max_cola: int = 10000):
+        """
+        Args:
+            directorio: Carpeta de salida (se crea si no existe)
+            prefijo: Prefijo de los nombres de archivo
+            extension: Extensión (p. ej. ".json", ".ndjson.gz")
+            serializar: Función objeto -> bytes, se ejecuta en el hilo escritor
+            max_bytes: Bytes (sin comprimir) por archivo antes de rotar
+            max_archivos: Archivos que se conservan
+            cabecera: Bytes al inicio de cada archivo nuevo
+            comprimir: Escribir con gzip
+            max_cola: Elementos pendientes antes de empezar a descartar
+        """
+        self.directorio = directorio
+        self.prefijo = prefijo
+        self.extension = extension
+        self.serializar = serializar
+        self.max_bytes = max_bytes
+        self.max_archivos = max_archivos
+        self.cabecera = cabecera
+        self.comprimir = comprimir
+
+        self.descartados = 0
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._archivo = None
+        self._escritos = 0
+        self._secuencia = 0
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def escribir(self, objeto) -> bool:
+        """Encola un objeto; si la cola está llena se descarta (nunca bloquea)"""
+        if self._hilo is None:
+            self._iniciar()
+        try:
+            self._cola.put_nowait(objeto)
+            return True
+        except queue.Full:
+            self.descartados += 1
+            return False
+
+    def cerrar(self, timeout: float = 5.0):
+        """Vacía la cola y cierra el archivo actual"""
+        if self._hilo is None:
+            return
+        self._cola.put(_FIN)
+        self._hilo.join(timeout)
+        self._hilo = None
+
+    def _iniciar(self):
+        with self._lock:
+            if self._hilo is None:
+                os.makedirs(self.directorio, exist_ok=True)
+                self._hilo = threading.Thread(
+                    target=self._bucle, name=f"escritor-{self.prefijo}", daemon=True
+                )
+                self._hilo.start()
+
+    def _abrir(self):
+        self._secuencia += 1
+        nombre = f"{self.prefijo}-{datetime.utcnow():%Y%m%d-%H%M%S}-{os.getpid()}-{self._secuencia:04d}{self.extension}"
+        ruta = os.path.join(self.directorio, nombre)
+        self._archivo = gzip.open(ruta, "wb") if self.comprimir else open(ruta, "wb")
+        self._escritos = 0
+        if self.cabecera:
+            self._archivo.write(self.cabecera)
+            self._escritos += len(self.cabecera)
+        self._purgar()
+
+    def _purgar(self):
+        """Borra los archivos más antiguos por encima de max_archivos"""
+        patron = os.path.join(self.directorio, f"{self.prefijo}-*{self.extension}")
+        archivos = sorted(glob.glob(patron), key=os.path.getmtime)
+        for ruta in archivos[:-self.max_archivos]:
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+
+    def _cerrar_archivo(self):
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+    def _bucle(self):
+        while True:
+            objeto = self._cola.get()
+            if objeto is _FIN:
+                self._cerrar_archivo()
+                return
+
+            try:
+                datos = self.serializar(objeto)
+                if self._archivo is None:
+                    self._abrir()
+                self._archivo.write(datos)
+                self._escritos += len(datos)
+
+                if self._escritos >= self.max_bytes:
+                    self._cerrar_archivo()
+                elif self._cola.empty():
+                    self._archivo.flush()
+
+            except Exception as e:
+                logger.error(f"❌ Error escribiendo en {self.directorio}: {e}")
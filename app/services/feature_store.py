@@ -0,0 +1,210 @@
+"""
+Feature store de clientes
+
+Mantiene por cliente_id los agregados con los que se calculan las 4
+features de cliente, en la colección compacta clientes_agregados:
+
+    {_id: cliente_id, compras, cancelaciones, suma_montos, compras_sin_monto,
+     ultimos_eventos, actualizado}
+
+- Los eventos de compra/cancelación (POST /clientes/eventos) actualizan el
+  documento de forma incremental con $inc; el evento_id opcional evita
+  contar dos veces un evento reenviado
+- Una compra sin monto cuenta en compras pero no en el promedio de montos
+  (compras_sin_monto)
+- Una caché LRU en memoria con TTL evita ir a MongoDB en cada /predict; las
+  actualizaciones de este proceso la refrescan al momento y las de otras
+  réplicas se ven al vencer el TTL
+"""
+
+from app.database import get_db
+from app.services.metricas import FEATURE_STORE_CACHE
+from collections import OrderedDict
+from datetime import datetime
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+COLECCION_AGREGADOS = "clientes_agregados"
+
+# Features de cliente que se pueden completar desde el store
+CAMPOS_CLIENTE = (
+    "total_compras_previas",
+    "total_cancelaciones_previas",
+    "tasa_cancelacion_historica",
+    "monto_promedio_compras",
+)
+
+CACHE_MAX = int(os.getenv("FEATURE_STORE_CACHE_MAX", 100000))
+CACHE_TTL = float(os.getenv("FEATURE_STORE_CACHE_TTL", 300))
+
+# Eventos recientes recordados por cliente para descartar duplicados
+EVENTOS_RECORDADOS = 20
+
+PROYECCION_AGREGADOS = {"compras": 1, "cancelaciones": 1, "suma_montos": 1, "compras_sin_monto": 1}
+
+
+def features_desde_agregados(doc: dict) -> dict:
+    """Las 4 features de cliente a partir del documento de agregados (None = cliente nuevo)"""
+    compras = (doc or {}).get("compras", 0)
+    cancelaciones = (doc or {}).get("cancelaciones", 0)
+    suma_montos = (doc or {}).get("suma_montos", 0.0)
+    compras_con_monto = compras - (doc or {}).get("compras_sin_monto", 0)
+    return {
+        "total_compras_previas": compras,
+        "total_cancelaciones_previas": cancelaciones,
+        "tasa_cancelacion_historica": min(cancelaciones / compras, 1.0) if compras > 0 else 0.0,
+        "monto_promedio_compras": suma_montos / compras_con_monto if compras_con_monto > 0 else 0.0,
+    }
+
+
+class CacheLRU:
+    """LRU con TTL, segura entre hilos"""
+
+    def __init__(self, maximo: int, ttl: float):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            valor, vence = entrada
+            if vence < time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic() + self.ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class FeatureStore:
+    """Agregados por cliente con caché en memoria delante de MongoDB"""
+
+    def __init__(self, maximo: int = CACHE_MAX, ttl: float = CACHE_TTL):
+        self.cache = CacheLRU(maximo, ttl)
+
+    def obtener(self, cliente_id: str) -> dict:
+        """
+        Features de cliente para un cliente_id
+
+        Returns:
+            dict con los 4 CAMPOS_CLIENTE (ceros si el cliente no tiene historial)
+        """
+        features = self.cache.obtener(cliente_id)
+        if features is not None:
+            FEATURE_STORE_CACHE.inc("hit")
+            return features
+
+        FEATURE_STORE_CACHE.inc("miss")
+        doc = get_db()[COLECCION_AGREGADOS].find_one({"_id": cliente_id}, PROYECCION_AGREGADOS)
+        features = features_desde_agregados(doc)
+        self.cache.guardar(cliente_id, features)
+        return features
+
+    def registrar_evento(self, cliente_id: str, tipo: str, monto: float = None, evento_id: str = None) -> bool:
+        """
+        Aplica un evento de compra o cancelación a los agregados del cliente
+
+        Args:
+            cliente_id: ID del cliente
+            tipo: "compra" o "cancelacion"
+            monto: Monto de la compra (solo compras; None = sin monto, no entra en el promedio)
+            evento_id: ID único del evento para ignorar reenvíos
+
+        Returns:
+            True si se aplicó, False si era un duplicado
+        """
+        from pymongo import ReturnDocument
+        from pymongo.errors import DuplicateKeyError
+        
+        if tipo == "compra" and monto is None:
+            incrementos = {"compras": 1, "compras_sin_monto": 1}
+        elif tipo == "compra":
+            incrementos = {"compras": 1, "suma_montos": float(monto)}
+        elif tipo == "cancelacion":
+            incrementos = {"cancelaciones": 1}
+        else:
+            raise ValueError(f"Tipo de evento desconocido: {tipo}")
+
+        filtro = {"_id": cliente_id}
+        actualizacion = {
+            "$inc": incrementos,
+            "$set": {"actualizado": datetime.utcnow()},
+        }
+        if evento_id:
+            # Si el evento ya está en ultimos_eventos el filtro no coincide y el
+            # upsert choca con el _id existente: es un duplicado
+            filtro["ultimos_eventos"] = {"$ne": evento_id}
+            actualizacion["$push"] = {"ultimos_eventos": {"$each": [evento_id], "$slice": -EVENTOS_RECORDADOS}}
+
+        col = get_db()[COLECCION_AGREGADOS]
+
+        def aplicar():
+            return col.find_one_and_update(
+                filtro, actualizacion, upsert=True, return_document=ReturnDocument.AFTER,
+                projection=PROYECCION_AGREGADOS
+            )
+
+        try:
+            doc = aplicar()
+        except DuplicateKeyError:
+            # Dos primeros eventos simultáneos del cliente: el otro upsert creó
+            # el documento. Reintentar una vez ahora que existe
+            try:
+                doc = aplicar()
+            except DuplicateKeyError:
+                # Solo es un reenvío si el evento_id ya está aplicado
+                if not evento_id or col.find_one({"_id": cliente_id, "ultimos_eventos": evento_id}) is None:
+                    raise
+                logger.debug("⚠️  Evento duplicado ignorado: %s (%s)", evento_id, cliente_id)
+                return False
+
+        self.cache.guardar(cliente_id, features_desde_agregados(doc))
+        return True
+
+    def establecer(self, cliente_id: str, compras: int, cancelaciones: int, suma_montos: float) -> dict:
+        """Fija los agregados absolutos de un cliente (carga inicial o reconciliación)"""
+        get_db()[COLECCION_AGREGADOS].update_one(
+            {"_id": cliente_id},
+            {"$set": {
+                "compras": compras,
+                "cancelaciones": cancelaciones,
+                "suma_montos": float(suma_montos),
+                "compras_sin_monto": 0,
+                "actualizado": datetime.utcnow()
+            }},
+            upsert=True
+        )
+        features = features_desde_agregados(
+            {"compras": compras, "cancelaciones": cancelaciones, "suma_montos": suma_montos}
+        )
+        self.cache.guardar(cliente_id, features)
+        return features
+
+
+# Instancia global (singleton)
+feature_store = None
+
+
+def get_feature_store() -> FeatureStore:
+    """Obtiene la instancia del feature store"""
+    global feature_store
+    if feature_store is None:
+        feature_store = FeatureStore()
+    return feature_store
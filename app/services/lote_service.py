@@ -0,0 +1,280 @@
+"""
+Puntuación masiva de ventas a partir de archivos columnares
+
+Acepta el body de POST /predict/lote como flujo de bytes:
+- CSV con la cabecera de data/dataset_sintetico.csv (las 11 features; la
+  columna fue_cancelada se ignora y venta_id es opcional)
+- Archivo .npy de NumPy con forma (n, 11) o (n, 12), columnas en el orden
+  de FEATURE_NAMES (la columna 12, fue_cancelada, se ignora)
+
+Las filas se decodifican a medida que llegan, se validan con los rangos de
+Field de PredictRequestFull mediante chequeos vectorizados de NumPy y se
+puntúan en chunks de tamaño fijo. La memoria queda acotada por el tamaño
+del chunk, no por el del archivo.
+"""
+
+import io
+import json
+import logging
+import os
+
+import numpy as np
+
+from app.schemas import PredictRequestFull
+from app.services.predictor import FEATURE_NAMES, RECOMENDACIONES, PredictorService
+
+logger = logging.getLogger(__name__)
+
+# Filas por chunk de inferencia
+TAMANO_CHUNK = int(os.getenv("LOTE_TAMANO_CHUNK", 10000))
+
+TIPOS_CSV = ("text/csv", "application/csv")
+TIPOS_NPY = ("application/x-npy", "application/octet-stream")
+
+
+class ErrorFormatoLote(ValueError):
+    """El archivo no tiene el formato esperado"""
+
+
+def _limites_desde_schema():
+    """
+    Rangos de Field de PredictRequestFull por columna, como arreglos alineados con FEATURE_NAMES
+
+    Returns:
+        (minimos, minimo_inclusivo, maximos, enteras)
+    """
+    n = len(FEATURE_NAMES)
+    minimos = np.full(n, -np.inf)
+    minimo_inclusivo = np.ones(n, dtype=bool)
+    maximos = np.full(n, np.inf)
+    enteras = np.zeros(n, dtype=bool)
+
+    for j, nombre in enumerate(FEATURE_NAMES):
+        campo = PredictRequestFull.model_fields[nombre]
+        enteras[j] = campo.annotation is int
+        for restriccion in campo.metadata:
+            if getattr(restriccion, "gt", None) is not None:
+                minimos[j], minimo_inclusivo[j] = restriccion.gt, False
+            if getattr(restriccion, "ge", None) is not None:
+                minimos[j], minimo_inclusivo[j] = restriccion.ge, True
+            if getattr(restriccion, "le", None) is not None:
+                maximos[j] = restriccion.le
+    return minimos, minimo_inclusivo, maximos, enteras
+
+
+_MINIMOS, _MINIMO_INCLUSIVO, _MAXIMOS, _ENTERAS = _limites_desde_schema()
+
+
+def filas_validas(X: np.ndarray) -> np.ndarray:
+    """
+    Máscara (n,) de filas que cumplen los rangos de PredictRequestFull
+
+    Rechaza NaN/inf, valores fuera de rango y decimales en columnas enteras.
+    """
+    finitas = np.isfinite(X)
+    sobre_minimo = np.where(_MINIMO_INCLUSIVO, X >= _MINIMOS, X > _MINIMOS)
+    bajo_maximo = X <= _MAXIMOS
+    enteros_ok = ~_ENTERAS | (X == np.floor(X))
+    return np.all(finitas & sobre_minimo & bajo_maximo & enteros_ok, axis=1)
+
+
+class DecodificadorCSV:
+    """Convierte bloques de bytes CSV en (ids, X) a medida que llegan"""
+
+    def __init__(self, tamano_chunk: int = TAMANO_CHUNK):
+        self.tamano_chunk = tamano_chunk
+        self._pendiente = b""
+        self._columnas = None
+        self._usar = None
+        self._tiene_id = False
+        self._fila = 0
+
+    @property
+    def cabecera_leida(self) -> bool:
+        return self._columnas is not None
+
+    def _leer_cabecera(self):
+        fin = self._pendiente.find(b"\n")
+        if fin < 0:
+            return
+        try:
+            linea = self._pendiente[:fin].decode("utf-8-sig").strip()
+        except UnicodeDecodeError:
+            raise ErrorFormatoLote("La cabecera CSV no es UTF-8")
+        self._pendiente = self._pendiente[fin + 1:]
+        columnas = [c.strip() for c in linea.split(",")]
+        faltantes = [c for c in FEATURE_NAMES if c not in columnas]
+        if faltantes:
+            raise ErrorFormatoLote(f"Faltan columnas en la cabecera CSV: {', '.join(faltantes)}")
+        self._columnas = columnas
+        self._tiene_id = "venta_id" in columnas
+        self._usar = list(FEATURE_NAMES) + (["venta_id"] if self._tiene_id else [])
+
+    def _parsear(self, bloque: bytes):
+        # pandas solo hace falta para CSV: se importa con el primer lote, no al arrancar
+        import pandas as pd
+        
+        try:
+            df = pd.read_csv(
+                io.BytesIO(bloque), header=None, names=self._columnas, usecols=self._usar,
+                dtype={"venta_id": str} if self._tiene_id else None, keep_default_na=False
+            )
+        except (pd.errors.ParserError, UnicodeDecodeError) as e:
+            raise ErrorFormatoLote(f"CSV mal formado cerca de la fila {self._fila}: {e}")
+        X = np.empty((len(df), len(FEATURE_NAMES)), dtype=np.float64)
+        for j, nombre in enumerate(FEATURE_NAMES):
+            X[:, j] = pd.to_numeric(df[nombre], errors="coerce")
+        if self._tiene_id:
+            ids = df["venta_id"].to_numpy()
+        else:
+            ids = np.arange(self._fila, self._fila + len(df))
+        self._fila += len(df)
+        return ids, X
+
+    def alimentar(self, datos: bytes) -> list:
+        """Agrega bytes; devuelve los bloques (ids, X) completos listos para puntuar"""
+        self._pendiente += datos
+        if self._columnas is None:
+            self._leer_cabecera()
+            if self._columnas is None:
+                return []
+        if self._pendiente.count(b"\n") < self.tamano_chunk:
+            return []
+        corte = self._pendiente.rfind(b"\n") + 1
+        bloque, self._pendiente = self._pendiente[:corte], self._pendiente[corte:]
+        return [self._parsear(bloque)]
+
+    def finalizar(self) -> list:
+        """Bloque con las filas restantes al terminar el body"""
+        if self._columnas is None:
+            self._pendiente += b"\n"
+            self._leer_cabecera()
+            if self._columnas is None:
+                raise ErrorFormatoLote("CSV sin cabecera")
+        bloque, self._pendiente = self._pendiente, b""
+        if not bloque.strip():
+            return []
+        return [self._parsear(bloque)]
+
+
+class DecodificadorNPY:
+    """Convierte bloques de bytes de un archivo .npy en (ids, X) a medida que llegan"""
+
+    def __init__(self, tamano_chunk: int = TAMANO_CHUNK):
+        self.tamano_chunk = tamano_chunk
+        self._pendiente = b""
+        self._dtype = None
+        self._columnas = None
+        self._filas_total = None
+        self._fila = 0
+
+    @property
+    def cabecera_leida(self) -> bool:
+        return self._dtype is not None
+
+    def _leer_cabecera(self):
+        if len(self._pendiente) < 12:
+            return
+        if not self._pendiente.startswith(b"\x93NUMPY"):
+            raise ErrorFormatoLote("No es un archivo .npy")
+        mayor = self._pendiente[6]
+        largo_prefijo = 10 if mayor == 1 else 12
+        largo_cabecera = int.from_bytes(self._pendiente[8:largo_prefijo], "little")
+        if len(self._pendiente) < largo_prefijo + largo_cabecera:
+            return
+
+        archivo = io.BytesIO(self._pendiente[:largo_prefijo + largo_cabecera])
+        version = np.lib.format.read_magic(archivo)
+        if version == (1, 0):
+            forma, orden_fortran, dtype = np.lib.format.read_array_header_1_0(archivo)
+        else:
+            forma, orden_fortran, dtype = np.lib.format.read_array_header_2_0(archivo)
+
+        if len(forma) != 2 or forma[1] not in (len(FEATURE_NAMES), len(FEATURE_NAMES) + 1):
+            raise ErrorFormatoLote(f"Se esperaba un arreglo (n, {len(FEATURE_NAMES)}), recibido {forma}")
+        if orden_fortran:
+            raise ErrorFormatoLote("El arreglo .npy debe estar en orden C (filas contiguas)")
+        if dtype.kind not in "fiub" or dtype.hasobject:
+            raise ErrorFormatoLote(f"Tipo de dato no soportado: {dtype}")
+
+        self._dtype = dtype
+        self._columnas = forma[1]
+        self._filas_total = forma[0]
+        self._pendiente = self._pendiente[largo_prefijo + largo_cabecera:]
+
+    def _extraer(self, filas: int):
+        bytes_fila = self._columnas * self._dtype.itemsize
+        bloque = self._pendiente[:filas * bytes_fila]
+        self._pendiente = self._pendiente[filas * bytes_fila:]
+        X = np.frombuffer(bloque, dtype=self._dtype).reshape(filas, self._columnas)
+        X = X[:, :len(FEATURE_NAMES)].astype(np.float64)
+        ids = np.arange(self._fila, self._fila + filas)
+        self._fila += filas
+        return ids, X
+
+    def alimentar(self, datos: bytes) -> list:
+        """Agrega bytes; devuelve los bloques (ids, X) completos listos para puntuar"""
+        self._pendiente += datos
+        if self._dtype is None:
+            self._leer_cabecera()
+            if self._dtype is None:
+                return []
+        filas = len(self._pendiente) // (self._columnas * self._dtype.itemsize)
+        if filas < self.tamano_chunk:
+            return []
+        return [self._extraer(filas)]
+
+    def finalizar(self) -> list:
+        """Bloque con las filas restantes al terminar el body"""
+        if self._dtype is None:
+            raise ErrorFormatoLote("Archivo .npy incompleto")
+        filas = len(self._pendiente) // (self._columnas * self._dtype.itemsize)
+        if self._fila + filas != self._filas_total:
+            raise ErrorFormatoLote(
+                f"Archivo .npy truncado: {self._fila + filas} de {self._filas_total} filas"
+            )
+        return [self._extraer(filas)] if filas else []
+
+
+def crear_decodificador(content_type: str, tamano_chunk: int = TAMANO_CHUNK):
+    """Decodificador según el Content-Type del request (None si no se soporta)"""
+    tipo = (content_type or "").split(";", 1)[0].strip().lower()
+    if tipo in TIPOS_CSV:
+        return DecodificadorCSV(tamano_chunk)
+    if tipo in TIPOS_NPY:
+        return DecodificadorNPY(tamano_chunk)
+    return None
+
+
+class LoteService:
+    """Puntuación por chunks y serialización NDJSON"""
+
+    @staticmethod
+    def puntuar(predictor: PredictorService, ids: np.ndarray, X: np.ndarray,
+                tamano_chunk: int = TAMANO_CHUNK):
+        """
+        Valida y puntúa un bloque en chunks de tamaño fijo
+
+        Returns:
+            (líneas NDJSON en bytes, conteo de filas por recomendación)
+        """
+        validas = filas_validas(X)
+        probabilidades = np.full(len(X), np.nan)
+        for inicio in range(0, len(X), tamano_chunk):
+            fin = inicio + tamano_chunk
+            mascara = validas[inicio:fin]
+            if mascara.any():
+                probabilidades[inicio:fin][mascara] = predictor.predecir_lote(X[inicio:fin][mascara])
+
+        indices = PredictorService.recomendaciones_lote(probabilidades)
+        conteo = np.bincount(indices[validas], minlength=len(RECOMENDACIONES))
+
+        lineas = []
+        for venta_id, prob, indice, valida in zip(ids.tolist(), probabilidades.tolist(),
+                                                  indices.tolist(), validas.tolist()):
+            if valida:
+                lineas.append('{"venta_id":%s,"probabilidad":%.4f,"recomendacion":"%s"}\n'
+                              % (json.dumps(venta_id), prob, RECOMENDACIONES[indice]))
+            else:
+                lineas.append('{"venta_id":%s,"error":"valores fuera de rango"}\n' % json.dumps(venta_id))
+        return "".join(lineas).encode("utf-8"), dict(zip(RECOMENDACIONES, conteo.tolist()))
@@ -0,0 +1,270 @@
+"""
+Métricas en formato Prometheus (expuestas en GET /metrics)
+
+Los contadores se guardan en un fragmento por hilo: cada hilo incrementa su
+propia lista sin locks y solo al exponer las métricas se suman los
+fragmentos. Observar un valor no crea objetos: un bisect sobre los límites
+de los buckets y dos sumas sobre una lista preasignada.
+
+Con varios workers (servidor.py) /metrics suma además las instantáneas de
+los demás procesos (ver app/services/multiproceso.py).
+"""
+
+from app.services import multiproceso
+from bisect import bisect_left
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Buckets (segundos) para las etapas de /predict y el envío de emails
+BUCKETS_LATENCIA = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Registro global de métricas, en orden de creación
+REGISTRO = []
+
+
+class ContadoresPorHilo:
+    """Arreglo de contadores con un fragmento independiente por hilo"""
+
+    def __init__(self, tamano: int):
+        self.tamano = tamano
+        self._local = threading.local()
+        self._fragmentos = []
+        self._lock = threading.Lock()
+
+    def fragmento(self) -> list:
+        """Lista de contadores del hilo actual (se crea en el primer uso)"""
+        try:
+            return self._local.valores
+        except AttributeError:
+            valores = [0] * self.tamano
+            with self._lock:
+                self._fragmentos.append(valores)
+            self._local.valores = valores
+            return valores
+
+    def totales(self) -> list:
+        """Suma de todos los fragmentos (los de hilos terminados se conservan)"""
+        totales = [0] * self.tamano
+        with self._lock:
+            fragmentos = list(self._fragmentos)
+        for valores in fragmentos:
+            for i, v in enumerate(valores):
+                totales[i] += v
+        return totales
+
+
+def _formatear(valor) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+def _etiquetas(pares) -> str:
+    contenido = ",".join(f'{k}="{v}"' for k, v in pares if k)
+    return "{" + contenido + "}" if contenido else ""
+
+
+class _Metrica:
+    tipo = "untyped"
+
+    def __init__(self, nombre: str, ayuda: str, etiqueta: str = None, valores: tuple = (None,)):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiqueta = etiqueta
+        self.valores = tuple(valores) if etiqueta else (None,)
+        self._indices = {v: i for i, v in enumerate(self.valores)}
+        REGISTRO.append(self)
+
+    def _cabecera(self) -> list:
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+
+    def totales(self) -> list:
+        return self._contadores.totales()
+
+
+class Contador(_Metrica):
+    """Contador monotónico, opcionalmente con una etiqueta de valores fijos"""
+
+    tipo = "counter"
+
+    def __init__(self, nombre, ayuda, etiqueta=None, valores=(None,)):
+        super().__init__(nombre, ayuda, etiqueta, valores)
+        self._contadores = ContadoresPorHilo(len(self.valores))
+
+    def inc(self, valor_etiqueta=None, n=1):
+        self._contadores.fragmento()[self._indices[valor_etiqueta]] += n
+
+    def valor(self, valor_etiqueta=None):
+        return self._contadores.totales()[self._indices[valor_etiqueta]]
+
+    def exponer(self, totales: list = None) -> list:
+        if totales is None:
+            totales = self.totales()
+        lineas = self._cabecera()
+        for v, total in zip(self.valores, totales):
+            lineas.append(f"{self.nombre}{_etiquetas([(self.etiqueta, v)])} {_formatear(total)}")
+        return lineas
+
+
+class Medidor(Contador):
+    """Valor que sube y baja (p. ej. peticiones en curso)"""
+
+    tipo = "gauge"
+
+    def dec(self, valor_etiqueta=None, n=1):
+        self._contadores.fragmento()[self._indices[valor_etiqueta]] -= n
+
+
+class Histograma(_Metrica):
+    """Histograma con buckets fijos, opcionalmente con una etiqueta de valores fijos"""
+
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, buckets=BUCKETS_LATENCIA, etiqueta=None, valores=(None,)):
+        super().__init__(nombre, ayuda, etiqueta, valores)
+        self.buckets = tuple(buckets)
+        # Por valor de etiqueta: un contador por bucket, uno para +Inf y la suma
+        self._ancho = len(self.buckets) + 2
+        self._contadores = ContadoresPorHilo(self._ancho * len(self.valores))
+
+    def observar(self, valor_etiqueta, valor: float):
+        base = self._indices[valor_etiqueta] * self._ancho
+        fragmento = self._contadores.fragmento()
+        fragmento[base + bisect_left(self.buckets, valor)] += 1
+        fragmento[base + self._ancho - 1] += valor
+
+    def exponer(self, totales: list = None) -> list:
+        if totales is None:
+            totales = self.totales()
+        lineas = self._cabecera()
+        limites = self.buckets + (float("inf"),)
+        for i, v in enumerate(self.valores):
+            base = i * self._ancho
+            acumulado = 0
+            for j, limite in enumerate(limites):
+                acumulado += totales[base + j]
+                etiquetas = _etiquetas([(self.etiqueta, v), ("le", _formatear(limite))])
+                lineas.append(f"{self.nombre}_bucket{etiquetas} {acumulado}")
+            etiquetas = _etiquetas([(self.etiqueta, v)])
+            lineas.append(f"{self.nombre}_sum{etiquetas} {_formatear(float(totales[base + self._ancho - 1]))}")
+            lineas.append(f"{self.nombre}_count{etiquetas} {acumulado}")
+        return lineas
+
+
+def totales_registro() -> dict:
+    """Totales de este proceso por métrica (la instantánea que publica cada worker)"""
+    return {metrica.nombre: metrica.totales() for metrica in REGISTRO}
+
+
+multiproceso.registrar_fuente("metricas", totales_registro)
+
+
+def exponer() -> str:
+    """Todas las métricas registradas en formato de texto de Prometheus"""
+    otros = multiproceso.leer_otros()
+    lineas = []
+    for metrica in REGISTRO:
+        # Los medidores de workers terminados ya no aportan (en curso, cola...)
+        valores = [
+            datos.get("metricas", {}).get(metrica.nombre)
+            for vivo, datos in otros
+            if vivo or not isinstance(metrica, Medidor)
+        ]
+        lineas.extend(metrica.exponer(multiproceso.sumar(metrica.totales(), valores)))
+    return "\n".join(lineas) + "\n"
+
+
+# ============================================
+# Métricas del servicio
+# ============================================
+
+ETAPAS = Histograma(
+    "prediccion_etapa_duracion_segundos",
+    "Duración de cada etapa de /predict y del envío de recordatorios",
+    etiqueta="etapa",
+    valores=("validacion", "feature_store", "features", "inferencia", "persistencia", "email")
+)
+
+PREDICCIONES = Contador(
+    "predicciones_total",
+    "Predicciones realizadas por recomendación",
+    etiqueta="recomendacion",
+    valores=("sin_accion", "revisar_manual", "enviar_recordatorio")
+)
+
+PREDICCIONES_COALESCIDAS = Contador(
+    "predicciones_coalescidas_total",
+    "Requests de /predict duplicados en vuelo que reutilizaron el resultado de otro"
+)
+
+FEATURE_STORE_CACHE = Contador(
+    "feature_store_cache_total",
+    "Consultas al feature store de clientes por resultado de la caché en memoria",
+    etiqueta="resultado",
+    valores=("hit", "miss")
+)
+
+ALERTAS_ARCHIVADAS = Contador(
+    "alertas_archivadas_total",
+    "Alertas cerradas movidas fuera de predicciones_cancelacion por destino",
+    etiqueta="destino",
+    valores=("coleccion", "archivos")
+)
+
+ARBOLES_EVALUADOS = Histograma(
+    "predictor_arboles_evaluados",
+    "Árboles del bosque evaluados por predicción en el modo de decisión anticipada",
+    buckets=(10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 200, 500)
+)
+
+DECISIONES = Contador(
+    "predictor_decisiones_total",
+    "Predicciones del modo de decisión anticipada por forma de terminar",
+    etiqueta="salida",
+    valores=("anticipada", "completa", "predict_proba")
+)
+
+PETICIONES_EN_CURSO = Medidor(
+    "peticiones_http_en_curso",
+    "Peticiones HTTP en proceso"
+)
+
+WS_CONEXIONES = Medidor(
+    "ws_predict_conexiones_abiertas",
+    "Conexiones abiertas en el canal WebSocket /ws/predict"
+)
+
+WS_TAMANO_LOTE = Histograma(
+    "ws_predict_tamano_lote",
+    "Mensajes puntuados juntos por micro-lote en /ws/predict",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+
+class MetricasMiddleware:
+    """
+    Middleware ASGI que cuenta peticiones en curso y marca el instante de
+    llegada (request.state.t_inicio) para medir la validación en /predict
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        scope.setdefault("state", {})["t_inicio"] = time.perf_counter()
+        PETICIONES_EN_CURSO.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            PETICIONES_EN_CURSO.dec()
@@ -0,0 +1,136 @@
+"""
+Estado compartido entre los workers de servidor.py (métricas y drift)
+
+Cada worker tiene sus propios contadores en memoria. Con MULTIPROCESO_DIR
+definido (servidor.py lo crea en el maestro antes del fork) cada worker
+publica cada MULTIPROCESO_INTERVALO_S una instantánea de sus totales en
+<dir>/<pid>.json, y el worker que atiende GET /metrics o GET /drift suma sus
+valores en vivo con las instantáneas de los demás:
+- Contadores e histogramas: todos los archivos, también los de workers ya
+  terminados (un reinicio no hace retroceder los totales)
+- Medidores (en curso, cola, límite): solo los de workers vivos
+
+Lo que publican los demás tiene hasta MULTIPROCESO_INTERVALO_S de atraso.
+Sin MULTIPROCESO_DIR (un solo proceso) nada de esto se activa.
+"""
+
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO = os.getenv("MULTIPROCESO_DIR", "")
+INTERVALO = float(os.getenv("MULTIPROCESO_INTERVALO_S", 1.0))
+ACTIVO = bool(DIRECTORIO)
+
+# nombre -> función sin argumentos que devuelve datos serializables en JSON
+_fuentes = {}
+_detener = threading.Event()
+_hilo = None
+
+
+def registrar_fuente(nombre: str, funcion):
+    """Agrega datos a la instantánea que publica este worker"""
+    _fuentes[nombre] = funcion
+
+
+def _escribir(ruta: str, datos: dict):
+    """Escritura atómica: un lector nunca ve un archivo a medias"""
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(datos, f, separators=(",", ":"))
+    os.replace(temporal, ruta)
+
+
+def publicar():
+    """Escribe la instantánea de este worker"""
+    if not ACTIVO:
+        return
+    try:
+        datos = {nombre: funcion() for nombre, funcion in _fuentes.items()}
+        _escribir(os.path.join(DIRECTORIO, f"{os.getpid()}.json"), datos)
+    except Exception as e:
+        logger.error(f"❌ Error publicando la instantánea del worker: {e}")
+
+
+def _bucle():
+    while not _detener.wait(INTERVALO):
+        publicar()
+
+
+def iniciar():
+    """Hilo que publica periódicamente (en cada worker, después del fork)"""
+    global _hilo
+    if not ACTIVO or _hilo is not None:
+        return
+    _detener.clear()
+    _hilo = threading.Thread(target=_bucle, name="multiproceso", daemon=True)
+    _hilo.start()
+
+
+def detener():
+    """Última publicación al apagar el worker"""
+    global _hilo
+    if _hilo is not None:
+        _detener.set()
+        _hilo.join(timeout=2)
+        _hilo = None
+    publicar()
+
+
+def _vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def leer_otros() -> list:
+    """[(vivo, datos)] de las instantáneas de los demás workers"""
+    if not ACTIVO:
+        return []
+    propio = os.getpid()
+    otros = []
+    try:
+        nombres = os.listdir(DIRECTORIO)
+    except OSError:
+        return []
+    for nombre in nombres:
+        pid, _, extension = nombre.partition(".")
+        if extension != "json" or not pid.isdigit() or int(pid) == propio:
+            continue
+        try:
+            with open(os.path.join(DIRECTORIO, nombre), encoding="utf-8") as f:
+                otros.append((_vivo(int(pid)), json.load(f)))
+        except (OSError, ValueError):
+            continue
+    return otros
+
+
+def sumar(propios: list, otros: list) -> list:
+    """Suma elemento a elemento; ignora listas de otro largo (otra versión del registro)"""
+    totales = list(propios)
+    for valores in otros:
+        if valores and len(valores) == len(totales):
+            totales = [a + b for a, b in zip(totales, valores)]
+    return totales
+
+
+def leer_compartido(nombre: str):
+    """Estado común a todos los workers (p. ej. la ventana de drift) o None"""
+    if not ACTIVO:
+        return None
+    try:
+        with open(os.path.join(DIRECTORIO, f"_{nombre}.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def guardar_compartido(nombre: str, datos):
+    _escribir(os.path.join(DIRECTORIO, f"_{nombre}.json"), datos)
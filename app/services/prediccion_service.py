@@ -4,19 +4,101 @@ Guarda predicciones de alto riesgo y gestiona recordatorios
 """
 
 from app.database import get_db
-from datetime import datetime, timedelta
+from app.services.metricas import ETAPAS
+from app.services.trazas import registrar_span
+from datetime import datetime, timedelta, timezone
 import os
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 # Umbral de riesgo para guardar en MongoDB
 UMBRAL_RIESGO = float(os.getenv("UMBRAL_RIESGO", 0.70))
 
+# Alertas por lote en los jobs de recordatorios
+TAMANO_LOTE_RECORDATORIOS = int(os.getenv("RECORDATORIOS_TAMANO_LOTE", 200))
+
+# Página de GET /recordatorios/alertas (por defecto y máxima)
+ALERTAS_PAGINA = int(os.getenv("ALERTAS_PAGINA", 100))
+ALERTAS_PAGINA_MAX = int(os.getenv("ALERTAS_PAGINA_MAX", 1000))
+
+# Colección con el avance de los jobs de recordatorios (para reanudar)
+COLECCION_CHECKPOINTS = "recordatorios_checkpoints"
+
+# El recordatorio vence esta cantidad de horas antes de fecha_venta
+ANTICIPACION_RECORDATORIO = timedelta(hours=float(os.getenv("RECORDATORIOS_ANTICIPACION_HORAS", 24)))
+
+# Índice parcial (solo alertas pendientes) del job frecuente de recordatorios
+INDICE_DUE_AT = "recordatorios_due_at"
+INDICE_VENTA_ID = "venta_id_unico"
+
 
 class PrediccionService:
     """Servicio para gestionar predicciones de alto riesgo"""
     
+    @staticmethod
+    def construir_documento(data: dict, resultado: dict) -> dict:
+        """
+        Documento de predicciones_cancelacion para una predicción de alto riesgo
+        
+        Args:
+            data: Datos completos del request (con email, nombre, etc.)
+            resultado: Resultado de la predicción (probabilidad, recomendación, factores)
+        
+        Returns:
+            Documento listo para insertar (sin _id)
+        """
+        ahora = datetime.utcnow()
+        return {
+            "venta_id": data["venta_id"],
+            "cliente_id": data["cliente_id"],
+            "email_cliente": data.get("email_cliente"),
+            "nombre_cliente": data.get("nombre_cliente"),
+            "nombre_paquete": data.get("nombre_paquete"),
+            "destino": data.get("destino"),
+            "monto_total": data.get("monto_total"),
+            "fecha_venta": data.get("fecha_venta"),
+            "probabilidad_cancelacion": resultado["probabilidad_cancelacion"],
+            "recomendacion": resultado["recomendacion"],
+            "fecha_prediccion": ahora,
+            "features": {
+                "monto_total": data.get("monto_total"),
+                "es_temporada_alta": data.get("es_temporada_alta"),
+                "dia_semana_reserva": data.get("dia_semana_reserva"),
+                "metodo_pago_tarjeta": data.get("metodo_pago_tarjeta"),
+                "tiene_paquete": data.get("tiene_paquete"),
+                "duracion_dias": data.get("duracion_dias"),
+                "destino_categoria": data.get("destino_categoria"),
+                "total_compras_previas": data.get("total_compras_previas"),
+                "total_cancelaciones_previas": data.get("total_cancelaciones_previas"),
+                "tasa_cancelacion_historica": data.get("tasa_cancelacion_historica"),
+                "monto_promedio_compras": data.get("monto_promedio_compras")
+            },
+            "factores_riesgo": resultado.get("factores_riesgo", []),
+            "recordatorio_enviado": False,
+            "fecha_envio_recordatorio": None,
+            "recordatorio_due_at": PrediccionService.calcular_due_at(data.get("fecha_venta"), ahora),
+            "created_at": ahora
+        }
+    
+    @staticmethod
+    def calcular_due_at(fecha_venta, fecha_prediccion: datetime):
+        """
+        Instante (UTC sin zona, como lo devuelve pymongo) en que vence el recordatorio
+        
+        fecha_venta - ANTICIPACION_RECORDATORIO, o fecha_prediccion si eso ya
+        pasó (venta dentro de las próximas horas). None sin fecha_venta o con
+        la venta ya pasada: no hay nada que recordar.
+        """
+        if not isinstance(fecha_venta, datetime):
+            return None
+        if fecha_venta.tzinfo is not None:
+            fecha_venta = fecha_venta.astimezone(timezone.utc).replace(tzinfo=None)
+        if fecha_venta <= fecha_prediccion:
+            return None
+        return max(fecha_venta - ANTICIPACION_RECORDATORIO, fecha_prediccion)
+    
     @staticmethod
     def guardar_prediccion(data: dict, resultado: dict) -> dict:
         """
@@ -31,121 +113,327 @@ class PrediccionService:
         """
         try:
             prob = resultado["probabilidad_cancelacion"]
-            logger.info(f"🔍 Verificando si guardar: {data['venta_id']} - Probabilidad: {prob*100:.2f}% - Umbral: {UMBRAL_RIESGO*100:.0f}%")
             
             # Solo guardar si supera el umbral de riesgo
             if prob < UMBRAL_RIESGO:
-                logger.info(f"⚪ {data['venta_id']}: {prob*100:.0f}% - Por debajo del umbral ({UMBRAL_RIESGO*100:.0f}%) - NO se guarda")
+                logger.debug("⚪ %s: %.2f%% - Por debajo del umbral (%.0f%%) - NO se guarda",
+                             data["venta_id"], prob * 100, UMBRAL_RIESGO * 100)
                 return None
             
-            logger.info(f"🟢 {data['venta_id']}: {prob*100:.2f}% >= {UMBRAL_RIESGO*100:.0f}% - SÍ se guardará")
+            from pymongo.errors import DuplicateKeyError
             
+            t_persistencia = time.perf_counter()
             db = get_db()
-            logger.info(f"📦 Database obtenida: {db.name}")
-            
             col = db.predicciones_cancelacion
-            logger.info(f"📁 Colección: predicciones_cancelacion")
             
             # No duplicar si ya existe
+            t_find = time.perf_counter()
             existe = col.find_one({"venta_id": data["venta_id"]})
+            registrar_span("mongo.find_one", t_find)
             if existe:
-                logger.warning(f"⚠️  {data['venta_id']}: Ya existe en MongoDB (duplicado evitado)")
+                logger.debug("⚠️  %s: Ya existe en MongoDB (duplicado evitado)", data["venta_id"])
                 return None
             
-            logger.info(f"✅ No existe duplicado, procediendo a insertar...")
-            
-            logger.info(f"✅ No existe duplicado, procediendo a insertar...")
-            
             # Crear documento
-            documento = {
-                "venta_id": data["venta_id"],
-                "cliente_id": data["cliente_id"],
-                "email_cliente": data.get("email_cliente"),
-                "nombre_cliente": data.get("nombre_cliente"),
-                "nombre_paquete": data.get("nombre_paquete"),
-                "destino": data.get("destino"),
-                "monto_total": data.get("monto_total"),
-                "fecha_venta": data.get("fecha_venta"),
-                "probabilidad_cancelacion": resultado["probabilidad_cancelacion"],
-                "recomendacion": resultado["recomendacion"],
-                "fecha_prediccion": datetime.utcnow(),
-                "features": {
-                    "monto_total": data.get("monto_total"),
-                    "es_temporada_alta": data.get("es_temporada_alta"),
-                    "dia_semana_reserva": data.get("dia_semana_reserva"),
-                    "metodo_pago_tarjeta": data.get("metodo_pago_tarjeta"),
-                    "tiene_paquete": data.get("tiene_paquete"),
-                    "duracion_dias": data.get("duracion_dias"),
-                    "destino_categoria": data.get("destino_categoria"),
-                    "total_compras_previas": data.get("total_compras_previas"),
-                    "total_cancelaciones_previas": data.get("total_cancelaciones_previas"),
-                    "tasa_cancelacion_historica": data.get("tasa_cancelacion_historica"),
-                    "monto_promedio_compras": data.get("monto_promedio_compras")
-                },
-                "factores_riesgo": resultado.get("factores_riesgo", []),
-                "recordatorio_enviado": False,
-                "fecha_envio_recordatorio": None,
-                "created_at": datetime.utcnow()
-            }
-            
-            logger.info(f"📄 Documento creado con {len(documento)} campos")
+            documento = PrediccionService.construir_documento(data, resultado)
             
-            # Insertar en MongoDB
-            logger.info(f"💾 Insertando en MongoDB...")
-            result = col.insert_one(documento)
+            # Insertar en MongoDB (el índice único de venta_id cubre la carrera con otro worker)
+            t_insert = time.perf_counter()
+            try:
+                result = col.insert_one(documento)
+            except DuplicateKeyError:
+                logger.debug("⚠️  %s: Insertado por otro worker (duplicado evitado)", data["venta_id"])
+                return None
             documento["_id"] = str(result.inserted_id)
+            t_fin = time.perf_counter()
+            registrar_span("mongo.insert_one", t_insert, t_fin)
+            registrar_span("prediccion_service.guardar_prediccion", t_persistencia, t_fin)
+            ETAPAS.observar("persistencia", t_fin - t_persistencia)
             
-            logger.warning(f"🚨 ✅ ALERTA GUARDADA EXITOSAMENTE: {data['venta_id']} - ID: {result.inserted_id} - {resultado['probabilidad_cancelacion']*100:.0f}% riesgo")
+            logger.warning("🚨 ✅ ALERTA GUARDADA: %s - ID: %s - %.0f%% riesgo",
+                           data["venta_id"], documento["_id"], prob * 100)
             
             return documento
             
         except Exception as e:
-            logger.error(f"❌ ERROR CRÍTICO guardando predicción: {e}")
-            logger.error(f"❌ Tipo de error: {type(e).__name__}")
-            logger.error(f"❌ Detalles: {str(e)}")
-            import traceback
-            logger.error(f"❌ Traceback:\n{traceback.format_exc()}")
+            # Un solo registro; el traceback se formatea en el hilo escritor de logs
+            logger.exception("❌ ERROR CRÍTICO guardando predicción %s: %s (%s)",
+                             data.get("venta_id"), e, type(e).__name__)
             return None
     
     @staticmethod
-    def obtener_alertas_pendientes():
-        """Obtiene todas las alertas sin recordatorio enviado"""
+    def guardar_lote(documentos: list) -> int:
+        """
+        Inserta en bloque documentos de construir_documento sin duplicar venta_id
+        
+        Usa upserts con $setOnInsert: una venta que ya tiene alerta no se
+        modifica (mismo criterio que guardar_prediccion).
+        
+        Args:
+            documentos: Documentos de alto riesgo
+        
+        Returns:
+            Número de alertas nuevas insertadas
+        """
+        if not documentos:
+            return 0
+        
+        from pymongo import UpdateOne
+        from pymongo.errors import BulkWriteError
+        
+        operaciones = [
+            UpdateOne({"venta_id": doc["venta_id"]}, {"$setOnInsert": doc}, upsert=True)
+            for doc in documentos
+        ]
+        try:
+            resultado = get_db().predicciones_cancelacion.bulk_write(operaciones, ordered=False)
+            nuevas = resultado.upserted_count
+        except BulkWriteError as e:
+            # Upserts que perdieron la carrera con otro worker (índice único de venta_id)
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+            nuevas = e.details.get("nUpserted", 0)
+        logger.info("💾 Alertas en bloque: %d nuevas de %d", nuevas, len(documentos))
+        return nuevas
+    
+    @staticmethod
+    def obtener_alertas_pendientes(limite: int = ALERTAS_PAGINA, cursor: str = None):
+        """
+        Una página de alertas sin recordatorio enviado (mayor probabilidad primero)
+
+        Usa la misma paginación por clave que iterar_alertas: cada página es
+        una consulta con límite, sin importar cuántas alertas haya pendientes.
+
+        Args:
+            limite: Alertas por página (hasta ALERTAS_PAGINA_MAX)
+            cursor: 'siguiente' de la página anterior (None = primera página)
+
+        Returns:
+            (alertas, siguiente) - siguiente es None en la última página
+        """
+        from bson import ObjectId
+
+        limite = max(1, min(limite, ALERTAS_PAGINA_MAX))
+        posicion = None
+        if cursor:
+            probabilidad, _, id_alerta = cursor.partition("_")
+            posicion = {"probabilidad_cancelacion": float(probabilidad), "_id": ObjectId(id_alerta)}
+
+        lote, posicion = next(PrediccionService.iterar_alertas(limite, posicion), ([], None))
+        siguiente = None
+        if len(lote) == limite:
+            siguiente = f"{posicion['probabilidad_cancelacion']!r}_{posicion['_id']}"
+        return lote, siguiente
+    
+    @staticmethod
+    def iterar_alertas(tamano_lote: int = TAMANO_LOTE_RECORDATORIOS, posicion: dict = None):
+        """
+        Recorre las alertas sin recordatorio enviado en lotes de tamaño fijo
+
+        Usa paginación por clave (probabilidad_cancelacion desc, _id asc):
+        cada lote es una consulta con límite que continúa después del último
+        documento del lote anterior, así la memoria no depende del total de
+        alertas y un job interrumpido puede continuar desde la última posición.
+
+        Args:
+            tamano_lote: Documentos por lote
+            posicion: Última posición procesada {"probabilidad_cancelacion", "_id"}
+
+        Yields:
+            (lote, posicion) - lista de alertas y posición del último documento
+        """
+        db = get_db()
+        col = db.predicciones_cancelacion
+
+        filtro_base = {"recordatorio_enviado": False}
+
+        while True:
+            filtro = filtro_base
+            if posicion:
+                prob = posicion["probabilidad_cancelacion"]
+                filtro = {"$and": [filtro_base, {"$or": [
+                    {"probabilidad_cancelacion": {"$lt": prob}},
+                    {"probabilidad_cancelacion": prob, "_id": {"$gt": posicion["_id"]}}
+                ]}]}
+
+            lote = list(
+                col.find(filtro)
+                .sort([("probabilidad_cancelacion", -1), ("_id", 1)])
+                .limit(tamano_lote)
+            )
+            if not lote:
+                return
+
+            ultimo = lote[-1]
+            posicion = {"probabilidad_cancelacion": ultimo["probabilidad_cancelacion"], "_id": ultimo["_id"]}
+            yield lote, posicion
+
+            if len(lote) < tamano_lote:
+                return
+
+    @staticmethod
+    def completar_due_at() -> int:
+        """
+        Calcula recordatorio_due_at en las alertas pendientes guardadas antes de que existiera
+        
+        Una sola actualización en el servidor (pipeline, MongoDB 4.2+) con la
+        misma regla que calcular_due_at: las alertas con la venta ya pasada
+        quedan sin due_at. Sin documentos por completar no escribe nada.
+        """
+        resultado = get_db().predicciones_cancelacion.update_many(
+            {
+                "recordatorio_enviado": False,
+                "recordatorio_due_at": {"$exists": False},
+                "fecha_venta": {"$type": "date", "$gt": datetime.utcnow()}
+            },
+            [{"$set": {"recordatorio_due_at": {"$max": [
+                {"$subtract": ["$fecha_venta", int(ANTICIPACION_RECORDATORIO.total_seconds() * 1000)]},
+                "$fecha_prediccion"
+            ]}}}]
+        )
+        if resultado.modified_count:
+            logger.info(f"🕒 recordatorio_due_at completado en {resultado.modified_count} alertas existentes")
+        return resultado.modified_count
+
+    @staticmethod
+    def iterar_alertas_vencidas(hasta: datetime, marca: dict, limite: int,
+                                tamano_lote: int = TAMANO_LOTE_RECORDATORIOS, ahora: datetime = None):
+        """
+        Alertas pendientes con recordatorio_due_at después de la marca y hasta 'hasta'
+
+        Solo las de ventas todavía futuras (fecha_venta > ahora): una alerta
+        que vence mientras el job no corrió no recibe el recordatorio tarde.
+
+        Recorre el índice parcial recordatorios_due_at (due_at asc, _id asc)
+        por rango: cada lote es una consulta con límite que continúa después
+        del último documento del lote anterior, con 'limite' documentos como
+        máximo en total.
+
+        Args:
+            hasta: Fin de la franja (inclusive)
+            marca: Última posición procesada {"due_at": datetime, "_id": ObjectId o None}
+                   (_id None = todo lo que vence después de due_at)
+            limite: Máximo de alertas a devolver
+            tamano_lote: Documentos por lote
+            ahora: Instante de referencia para fecha_venta (None = datetime.utcnow())
+
+        Yields:
+            (lote, marca) - lista de alertas y posición del último documento
+        """
+        col = get_db().predicciones_cancelacion
+        futuras = {"$gt": ahora or datetime.utcnow()}
+        restantes = limite
+
+        while restantes > 0:
+            rango = {"recordatorio_enviado": False,
+                     "recordatorio_due_at": {"$gt": marca["due_at"], "$lte": hasta},
+                     "fecha_venta": futuras}
+            if marca.get("_id") is not None:
+                rango = {"$or": [rango, {"recordatorio_enviado": False,
+                                         "recordatorio_due_at": marca["due_at"],
+                                         "_id": {"$gt": marca["_id"]},
+                                         "fecha_venta": futuras}]}
+
+            n = min(tamano_lote, restantes)
+            lote = list(
+                col.find(rango)
+                .sort([("recordatorio_due_at", 1), ("_id", 1)])
+                .limit(n)
+            )
+            if not lote:
+                return
+
+            ultimo = lote[-1]
+            marca = {"due_at": ultimo["recordatorio_due_at"], "_id": ultimo["_id"]}
+            restantes -= len(lote)
+            yield lote, marca
+
+            if len(lote) < n:
+                return
+
+    @staticmethod
+    def obtener_marca(job_id: str):
+        """Marca de agua del job frecuente de recordatorios (o None)"""
+        try:
+            checkpoint = get_db()[COLECCION_CHECKPOINTS].find_one({"_id": job_id})
+            return checkpoint.get("marca") if checkpoint else None
+
+        except Exception as e:
+            logger.error(f"❌ Error leyendo la marca de {job_id}: {e}")
+            return None
+
+    @staticmethod
+    def guardar_marca(job_id: str, marca: dict):
+        """Guarda hasta dónde procesó el job frecuente de recordatorios"""
+        try:
+            get_db()[COLECCION_CHECKPOINTS].update_one(
+                {"_id": job_id},
+                {"$set": {"marca": marca, "actualizado": datetime.utcnow()}},
+                upsert=True
+            )
+
+        except Exception as e:
+            logger.error(f"❌ Error guardando la marca de {job_id}: {e}")
+
+    @staticmethod
+    def obtener_checkpoint(job_id: str):
+        """Obtiene el checkpoint de una ejecución no completada (o None)"""
         try:
             db = get_db()
-            alertas = list(db.predicciones_cancelacion.find(
-                {"recordatorio_enviado": False}
-            ).sort("probabilidad_cancelacion", -1))
-            
-            return alertas
-            
+            return db[COLECCION_CHECKPOINTS].find_one({"_id": job_id, "completado": False})
+
         except Exception as e:
-            logger.error(f"❌ Error obteniendo alertas: {e}")
-            return []
-    
+            logger.error(f"❌ Error leyendo checkpoint {job_id}: {e}")
+            return None
+
+    @staticmethod
+    def guardar_checkpoint(job_id: str, estado: dict, completado: bool = False):
+        """Guarda el avance de una ejecución de recordatorios"""
+        try:
+            db = get_db()
+            db[COLECCION_CHECKPOINTS].update_one(
+                {"_id": job_id},
+                {"$set": {**estado, "completado": completado, "actualizado": datetime.utcnow()}},
+                upsert=True
+            )
+
+        except Exception as e:
+            logger.error(f"❌ Error guardando checkpoint {job_id}: {e}")
+
     @staticmethod
-    def obtener_alertas_proximas():
+    def asegurar_indices():
         """
-        Obtiene alertas de ventas que ocurren en las próximas 24 horas
-        y que aún no tienen recordatorio enviado
+        Crea los índices de predicciones_cancelacion
+
+        venta_id es único: los upserts de guardar_lote lo usan en vez de
+        recorrer la colección, y dos workers que guardan la misma venta a la
+        vez no pueden insertar dos alertas (la segunda recibe DuplicateKeyError).
         """
         try:
+            from pymongo.errors import OperationFailure
+
             db = get_db()
-            ahora = datetime.utcnow()
-            manana = ahora + timedelta(days=1)
-            
-            alertas = list(db.predicciones_cancelacion.find({
-                "recordatorio_enviado": False,
-                "fecha_venta": {
-                    "$gte": ahora,
-                    "$lte": manana
-                }
-            }).sort("probabilidad_cancelacion", -1))
-            
-            return alertas
-            
+            try:
+                db.predicciones_cancelacion.create_index("venta_id", name=INDICE_VENTA_ID, unique=True)
+            except OperationFailure as e:
+                if e.code != 11000:
+                    raise
+                logger.error("❌ Hay venta_id duplicados en predicciones_cancelacion: "
+                             "el índice único no se crea hasta eliminarlos")
+            db.predicciones_cancelacion.create_index(
+                [("recordatorio_enviado", 1), ("probabilidad_cancelacion", -1), ("_id", 1)],
+                name="recordatorios_pendientes"
+            )
+            db.predicciones_cancelacion.create_index(
+                [("recordatorio_due_at", 1), ("_id", 1)],
+                name=INDICE_DUE_AT,
+                partialFilterExpression={"recordatorio_enviado": False}
+            )
+            PrediccionService.completar_due_at()
+            logger.info("✅ Índices de predicciones_cancelacion verificados")
+
         except Exception as e:
-            logger.error(f"❌ Error obteniendo alertas próximas: {e}")
-            return []
+            logger.error(f"❌ Error creando índices: {e}")
     
     @staticmethod
     def marcar_enviado(venta_id: str):
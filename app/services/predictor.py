@@ -5,28 +5,70 @@ VERSIÓN FINAL: Solo 11 features reales disponibles en MongoDB
 edad_cliente ELIMINADA: fechaNacimiento es OPCIONAL en MongoDB
 """
 
+import itertools
 import joblib
-import pandas as pd
+import logging
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Tuple
 import os
+import time
+
+from app.services.drift import cargar_monitor
+from app.services.metricas import ARBOLES_EVALUADOS, DECISIONES, ETAPAS
+from app.services.trazas import registrar_span
+
+# 11 features reales disponibles en MongoDB (SIN edad_cliente), en el orden del modelo
+FEATURE_NAMES = (
+    'monto_total', 'es_temporada_alta', 'dia_semana_reserva',
+    'metodo_pago_tarjeta', 'tiene_paquete', 'duracion_dias',
+    'destino_categoria', 'total_compras_previas',
+    'total_cancelaciones_previas', 'tasa_cancelacion_historica',
+    'monto_promedio_compras'
+)
+
+# Umbrales de recomendación
+UMBRAL_ENVIAR_RECORDATORIO = 0.70
+UMBRAL_REVISAR_MANUAL = 0.50
+
+RECOMENDACIONES = ("sin_accion", "revisar_manual", "enviar_recordatorio")
+
+logger = logging.getLogger(__name__)
+
+# Modo de decisión anticipada: los árboles se evalúan uno a uno y se deja de
+# evaluar cuando el promedio final ya no puede cruzar ningún umbral
+MODO_DECISION = os.getenv("PREDICTOR_MODO_DECISION", "false").lower() == "true"
+
+# Distancia mínima a cada umbral para cortar antes (cubre el redondeo a 4
+# decimales de la respuesta y el orden de suma distinto al de predict_proba)
+MARGEN_DECISION = 1e-4
+
+# De cada cuántas filas cortadas antes se calcula también la probabilidad
+# exacta para el histograma de drift (se cuenta con ese peso: sin sesgo)
+MUESTREO_DRIFT_DECISION = max(1, int(os.getenv("PREDICTOR_DRIFT_MUESTREO", 10)))
 
 
 class PredictorService:
     """Servicio para cargar el modelo y hacer predicciones con 11 features"""
     
-    def __init__(self, modelo_path='app/ml/modelo.pkl'):
+    def __init__(self, modelo_path='app/ml/modelo.pkl', modo_decision: bool = MODO_DECISION,
+                 umbrales: Tuple[float, ...] = (UMBRAL_REVISAR_MANUAL, UMBRAL_ENVIAR_RECORDATORIO),
+                 umbral_exacto: float = None):
         self.modelo_path = modelo_path
         self.modelo = None
         # 11 features reales disponibles en MongoDB (SIN edad_cliente)
-        self.feature_names = [
-            'monto_total', 'es_temporada_alta', 'dia_semana_reserva',
-            'metodo_pago_tarjeta', 'tiene_paquete', 'duracion_dias',
-            'destino_categoria', 'total_compras_previas',
-            'total_cancelaciones_previas', 'tasa_cancelacion_historica',
-            'monto_promedio_compras'
-        ]
+        self.feature_names = list(FEATURE_NAMES)
+        # Monitor de drift (solo en la instancia del servicio, ver get_predictor)
+        self.drift = None
+        # Umbrales que el modo de decisión no puede dejar sin resolver
+        self.umbrales = tuple(sorted(set(umbrales)))
+        # Desde esta probabilidad no se corta antes: la alerta se guarda y su
+        # probabilidad ordena los recordatorios y la paginación (None = siempre se corta)
+        self.umbral_exacto = umbral_exacto
+        self._muestreo = itertools.count()
+        self._arboles = None
         self._cargar_modelo()
+        if modo_decision:
+            self._preparar_arboles()
     
     def _cargar_modelo(self):
         """Carga el modelo desde el archivo .pkl"""
@@ -34,8 +76,107 @@ class PredictorService:
             raise FileNotFoundError(f"Modelo no encontrado en: {self.modelo_path}")
         
         self.modelo = joblib.load(self.modelo_path)
+        
+        # El modelo se entrenó con un DataFrame: se verifica una vez que sus
+        # columnas son FEATURE_NAMES en el mismo orden y se le quitan los nombres,
+        # así acepta arreglos NumPy sin pandas ni la validación por llamada
+        nombres = getattr(self.modelo, "feature_names_in_", None)
+        if nombres is not None:
+            if tuple(nombres) != FEATURE_NAMES:
+                raise ValueError(f"El modelo espera las columnas {list(nombres)}, no {list(FEATURE_NAMES)}")
+            del self.modelo.feature_names_in_
         print(f"✅ Modelo cargado desde: {self.modelo_path} (11 features)")
     
+    def _preparar_arboles(self):
+        """
+        Copia los nodos de cada árbol del bosque a listas de Python para el modo de decisión
+
+        Por árbol: hijos izquierdo/derecho, feature, umbral de corte y
+        probabilidad de la clase 1 en cada hoja (la misma que usa
+        predict_proba). Además, para cada k, las cotas mínima y máxima de lo
+        que pueden sumar los árboles k, k+1, ... (su hoja más baja y más alta).
+        """
+        estimadores = getattr(self.modelo, "estimators_", None)
+        if not estimadores or not all(hasattr(e, "tree_") for e in estimadores):
+            logger.warning("⚠️  PREDICTOR_MODO_DECISION requiere un bosque de árboles: se usa predict_proba")
+            return
+        
+        arboles = []
+        for estimador in estimadores:
+            arbol = estimador.tree_
+            valores = arbol.value[:, 0, :]
+            totales = valores.sum(axis=1)
+            totales[totales == 0] = 1.0
+            probabilidades = valores[:, 1] / totales
+            hojas = arbol.children_left == -1
+            arboles.append((
+                arbol.children_left.tolist(),
+                arbol.children_right.tolist(),
+                arbol.feature.tolist(),
+                arbol.threshold.tolist(),
+                probabilidades.tolist(),
+                float(probabilidades[hojas].min()),
+                float(probabilidades[hojas].max()),
+            ))
+        
+        resto_min = [0.0] * (len(arboles) + 1)
+        resto_max = [0.0] * (len(arboles) + 1)
+        for k in range(len(arboles) - 1, -1, -1):
+            resto_min[k] = resto_min[k + 1] + arboles[k][5]
+            resto_max[k] = resto_max[k + 1] + arboles[k][6]
+        
+        self._arboles = arboles
+        self._resto_min = resto_min
+        self._resto_max = resto_max
+        logger.info(f"🌲 Modo de decisión anticipada activo ({len(arboles)} árboles, umbrales {self.umbrales})")
+    
+    def decidir(self, fila: List[float], completa: bool = False) -> Tuple[float, int, str]:
+        """
+        Probabilidad evaluando árboles hasta que la recomendación queda fija
+
+        Tras k árboles con suma s, el promedio final de los n árboles está
+        entre (s + mínimo del resto) / n y (s + máximo del resto) / n. Si ese
+        intervalo queda entero de un lado de cada umbral (con MARGEN_DECISION)
+        y por debajo de umbral_exacto, la recomendación y la decisión de
+        guardar la alerta ya no cambian.
+        
+        Args:
+            fila: Las 11 features en el orden de FEATURE_NAMES
+            completa: True = sin corte anticipado (probabilidad exacta)
+        
+        Returns:
+            (probabilidad, árboles evaluados, salida). Con salida "anticipada"
+            (solo por debajo de umbral_exacto) la probabilidad es una estimación
+            dentro del intervalo (el promedio de los árboles evaluados); con
+            "completa" o "predict_proba" es la del modelo.
+        """
+        # predict_proba compara en float32 contra umbrales float64
+        x = np.asarray(fila, dtype=np.float32).tolist()
+        n = len(self._arboles)
+        suma = 0.0
+        
+        for k, (izq, der, feature, corte, prob, _, _) in enumerate(self._arboles, 1):
+            nodo = 0
+            while izq[nodo] != -1:
+                nodo = izq[nodo] if x[feature[nodo]] <= corte[nodo] else der[nodo]
+            suma += prob[nodo]
+            
+            if k == n or completa:
+                continue
+            minimo = (suma + self._resto_min[k]) / n
+            maximo = (suma + self._resto_max[k]) / n
+            if self.umbral_exacto is not None and maximo >= self.umbral_exacto - MARGEN_DECISION:
+                continue
+            if all(minimo >= u + MARGEN_DECISION or maximo < u - MARGEN_DECISION for u in self.umbrales):
+                return min(max(suma / k, minimo), maximo), k, "anticipada"
+        
+        probabilidad = suma / n
+        if any(abs(probabilidad - u) < MARGEN_DECISION for u in self.umbrales):
+            # Pegada a un umbral: el valor exacto de predict_proba decide
+            X = np.array([fila], dtype=np.float64)
+            return float(self.modelo.predict_proba(X)[0][1]), n, "predict_proba"
+        return probabilidad, n, "completa"
+    
     def predecir(self, data: Dict) -> Dict:
         """
         Realiza una predicción de cancelación con 11 features
@@ -46,6 +187,8 @@ class PredictorService:
         Returns:
             Diccionario con la predicción y recomendación
         """
+        t0 = time.perf_counter()
+        
         # Preparar features en el orden correcto (11 features, SIN edad_cliente)
         features = {
             'monto_total': data['monto_total'],
@@ -61,19 +204,76 @@ class PredictorService:
             'monto_promedio_compras': data['monto_promedio_compras']
         }
         
-        # Convertir a DataFrame (el modelo espera un DataFrame)
-        df = pd.DataFrame([features])
+        # Fila (1, 11) en el orden del modelo
+        X = np.array([[features[nombre] for nombre in FEATURE_NAMES]], dtype=np.float64)
         
-        # Asegurar el orden correcto de columnas
-        df = df[self.feature_names]
+        t1 = time.perf_counter()
+        ETAPAS.observar("features", t1 - t0)
+        registrar_span("predictor.features", t0, t1)
         
         # Hacer predicción
-        probabilidad = self.modelo.predict_proba(df)[0][1]  # Probabilidad de clase 1 (cancelada)
+        estimada = False
+        if self._arboles is not None:
+            probabilidad, arboles, salida = self.decidir(X[0].tolist())
+            ARBOLES_EVALUADOS.observar(None, arboles)
+            DECISIONES.inc(salida)
+            estimada = salida == "anticipada"
+            t2 = time.perf_counter()
+            registrar_span("predictor.decidir", t1, t2)
+        else:
+            probabilidad = self.modelo.predict_proba(X)[0][1]  # Probabilidad de clase 1 (cancelada)
+            t2 = time.perf_counter()
+            registrar_span("predictor.predict_proba", t1, t2)
+        ETAPAS.observar("inferencia", t2 - t1)
+        
+        if estimada:
+            # Una estimación no entra al histograma de probabilidad de drift:
+            # una de cada MUESTREO_DRIFT_DECISION filas cortadas se completa y
+            # cuenta por todas ellas
+            if self.drift is not None and next(self._muestreo) % MUESTREO_DRIFT_DECISION == 0:
+                exacta, _, _ = self.decidir(X[0].tolist(), completa=True)
+                self.drift.observar(features, exacta, peso_probabilidad=MUESTREO_DRIFT_DECISION)
+            elif self.drift is not None:
+                self.drift.observar(features, None)
+            resultado = self._armar_resultado(features, probabilidad, observar_drift=False)
+            resultado['probabilidad_estimada'] = True
+        else:
+            resultado = self._armar_resultado(features, probabilidad)
+        
+        registrar_span("predictor.predecir", t0)
+        return resultado
+    
+    def predecir_varios(self, filas: List[Dict]) -> List[Dict]:
+        """
+        predecir() para varias filas con una sola llamada al modelo
+        
+        Args:
+            filas: Diccionarios con las 11 features (p. ej. un micro-lote del canal WebSocket)
+        
+        Returns:
+            Un resultado por fila, con el mismo contenido que predecir()
+        """
+        t0 = time.perf_counter()
+        X = np.array([[fila[nombre] for nombre in FEATURE_NAMES] for fila in filas], dtype=np.float64)
+        t1 = time.perf_counter()
+        ETAPAS.observar("features", t1 - t0)
+        
+        probabilidades = self.modelo.predict_proba(X)[:, 1]
+        t2 = time.perf_counter()
+        ETAPAS.observar("inferencia", t2 - t1)
+        registrar_span("predictor.predict_proba", t1, t2)
+        
+        return [self._armar_resultado(fila, probabilidad) for fila, probabilidad in zip(filas, probabilidades)]
+    
+    def _armar_resultado(self, features: Dict, probabilidad: float, observar_drift: bool = True) -> Dict:
+        """Drift, recomendación y factores de riesgo de una fila ya puntuada"""
+        if observar_drift and self.drift is not None:
+            self.drift.observar(features, probabilidad)
         
         # Determinar recomendación
-        if probabilidad >= 0.70:
+        if probabilidad >= UMBRAL_ENVIAR_RECORDATORIO:
             recomendacion = "enviar_recordatorio"
-        elif probabilidad >= 0.50:
+        elif probabilidad >= UMBRAL_REVISAR_MANUAL:
             recomendacion = "revisar_manual"
         else:
             recomendacion = "sin_accion"
@@ -81,15 +281,35 @@ class PredictorService:
         # Identificar factores de riesgo
         factores_riesgo = self._identificar_factores_riesgo(features)
         
-        resultado = {
+        return {
             'probabilidad_cancelacion': round(probabilidad, 4),
             'recomendacion': recomendacion,
-            'factores_riesgo': factores_riesgo
+            'factores_riesgo': factores_riesgo,
+            'probabilidad_estimada': False
         }
-        
-        return resultado
     
-    def _identificar_factores_riesgo(self, features: Dict) -> List[str]:
+    def predecir_lote(self, X: np.ndarray) -> np.ndarray:
+        """
+        Probabilidades de cancelación para un lote de filas
+
+        Args:
+            X: Matriz (n, 11) con las columnas en el orden de FEATURE_NAMES
+
+        Returns:
+            np.ndarray (n,) con la probabilidad de la clase 1 (cancelada)
+        """
+        return self.modelo.predict_proba(np.asarray(X, dtype=np.float64))[:, 1]
+    
+    @staticmethod
+    def recomendaciones_lote(probabilidades: np.ndarray) -> np.ndarray:
+        """Índices en RECOMENDACIONES (0=sin_accion, 1=revisar_manual, 2=enviar_recordatorio)"""
+        return (
+            (probabilidades >= UMBRAL_REVISAR_MANUAL).astype(np.int8)
+            + (probabilidades >= UMBRAL_ENVIAR_RECORDATORIO).astype(np.int8)
+        )
+    
+    @staticmethod
+    def _identificar_factores_riesgo(features: Dict) -> List[str]:
         """
         Identifica factores de riesgo basados en los 11 features
         (SIN edad_cliente - fechaNacimiento es opcional en MongoDB)
@@ -141,5 +361,8 @@ def get_predictor() -> PredictorService:
     """Obtiene la instancia del predictor"""
     global predictor
     if predictor is None:
-        predictor = PredictorService()
+        from app.services.prediccion_service import UMBRAL_RIESGO
+        predictor = PredictorService(umbrales=(UMBRAL_REVISAR_MANUAL, UMBRAL_ENVIAR_RECORDATORIO, UMBRAL_RIESGO),
+                                     umbral_exacto=UMBRAL_RIESGO)
+        predictor.drift = cargar_monitor()
     return predictor
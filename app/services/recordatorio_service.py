@@ -0,0 +1,132 @@
+"""
+Servicio que ejecuta los jobs de envío de recordatorios
+Procesa las alertas por lotes y guarda un checkpoint tras cada lote para
+poder reanudar una ejecución interrumpida donde se quedó
+"""
+
+from app.services.prediccion_service import PrediccionService, TAMANO_LOTE_RECORDATORIOS
+from datetime import datetime, timedelta
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Máximo de recordatorios por ejecución del job frecuente (lo que sobre queda para la siguiente)
+LIMITE_POR_EJECUCION = int(os.getenv("RECORDATORIOS_LIMITE_EJECUCION", 1000))
+
+# Sin marca guardada (primera ejecución), se recuperan los vencidos en este lapso
+RECUPERACION_INICIAL = timedelta(hours=float(os.getenv("RECORDATORIOS_RECUPERACION_HORAS", 24)))
+
+# La franja termina un poco antes de "ahora": una alerta insertada mientras
+# corre el job, con due_at ya pasado, entra en la franja siguiente
+MARGEN_FRANJA = timedelta(seconds=60)
+
+
+class RecordatorioService:
+    """Ejecución por lotes y reanudable de los recordatorios"""
+
+    @staticmethod
+    async def ejecutar(job_id: str, email_service, tamano_lote: int = TAMANO_LOTE_RECORDATORIOS) -> dict:
+        """
+        Envía recordatorios a todas las alertas pendientes recorriéndolas lote a lote
+
+        Lo usa POST /recordatorios/enviar; el envío programado va por
+        ejecutar_vencidos (recordatorio_due_at).
+
+        Args:
+            job_id: Identificador del job (clave del checkpoint)
+            email_service: Instancia de EmailService
+            tamano_lote: Alertas por lote
+
+        Returns:
+            Diccionario con enviados, total procesado y si se reanudó un checkpoint
+        """
+        checkpoint = PrediccionService.obtener_checkpoint(job_id)
+
+        if checkpoint:
+            posicion = checkpoint.get("posicion")
+            procesados = checkpoint.get("procesados", 0)
+            enviados = checkpoint.get("enviados", 0)
+            logger.info(f"♻️  Reanudando {job_id}: {enviados}/{procesados} ya procesados")
+        else:
+            posicion = None
+            procesados = 0
+            enviados = 0
+
+        for lote, posicion in PrediccionService.iterar_alertas(tamano_lote, posicion):
+            for alerta in lote:
+                if await email_service.enviar_recordatorio(alerta):
+                    PrediccionService.marcar_enviado(alerta["venta_id"])
+                    enviados += 1
+
+            procesados += len(lote)
+            PrediccionService.guardar_checkpoint(job_id, {
+                "posicion": posicion,
+                "procesados": procesados,
+                "enviados": enviados
+            })
+            logger.info(f"📦 {job_id}: lote de {len(lote)} procesado ({enviados}/{procesados})")
+
+        PrediccionService.guardar_checkpoint(job_id, {
+            "posicion": posicion,
+            "procesados": procesados,
+            "enviados": enviados
+        }, completado=True)
+
+        return {
+            "enviados": enviados,
+            "total": procesados,
+            "reanudado": checkpoint is not None
+        }
+
+    @staticmethod
+    async def ejecutar_vencidos(job_id: str, email_service, limite: int = LIMITE_POR_EJECUCION,
+                                tamano_lote: int = TAMANO_LOTE_RECORDATORIOS) -> dict:
+        """
+        Job frecuente: recordatorios cuyo recordatorio_due_at venció desde la ejecución anterior
+
+        La franja va de la marca de agua guardada (última alerta procesada o fin
+        de la franja anterior) hasta ahora - MARGEN_FRANJA, por rango del índice
+        recordatorios_due_at y con 'limite' alertas como máximo. La marca se
+        guarda tras cada lote; si se alcanza el límite, la siguiente ejecución
+        continúa desde la última alerta procesada. Un envío fallido no se
+        reintenta aquí (POST /recordatorios/enviar recorre todas las pendientes).
+
+        Args:
+            job_id: Identificador del job (clave de la marca de agua)
+            email_service: Instancia de EmailService
+            limite: Máximo de alertas por ejecución
+            tamano_lote: Alertas por lote
+
+        Returns:
+            Diccionario con enviados, total procesado, fin de la franja y si quedaron pendientes
+        """
+        hasta = datetime.utcnow() - MARGEN_FRANJA
+        marca = PrediccionService.obtener_marca(job_id) or {"due_at": hasta - RECUPERACION_INICIAL, "_id": None}
+        procesados = 0
+        enviados = 0
+
+        for lote, marca in PrediccionService.iterar_alertas_vencidas(hasta, marca, limite, tamano_lote):
+            for alerta in lote:
+                if await email_service.enviar_recordatorio(alerta):
+                    PrediccionService.marcar_enviado(alerta["venta_id"])
+                    enviados += 1
+
+            procesados += len(lote)
+            PrediccionService.guardar_marca(job_id, marca)
+            logger.info(f"📦 {job_id}: lote de {len(lote)} procesado ({enviados}/{procesados})")
+
+        pendientes = procesados >= limite
+        if not pendientes:
+            # Franja completa: la próxima ejecución empieza donde terminó esta
+            marca = {"due_at": hasta, "_id": None}
+            PrediccionService.guardar_marca(job_id, marca)
+        else:
+            logger.warning(f"⚠️  {job_id}: límite de {limite} recordatorios alcanzado - el resto queda para la próxima ejecución")
+
+        return {
+            "enviados": enviados,
+            "total": procesados,
+            "hasta": marca["due_at"].isoformat(),
+            "pendientes": pendientes
+        }
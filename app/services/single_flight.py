@@ -0,0 +1,80 @@
+"""
+Deduplicación de llamadas idénticas en vuelo (single-flight)
+
+Spring Boot reintenta /predict ante un timeout, así que llegan dos o tres
+requests iguales para la misma venta al mismo tiempo. La primera llamada
+con una clave ejecuta la función; las que llegan mientras sigue en curso
+esperan su resultado (o su excepción) en lugar de repetir la inferencia y
+competir en find_one/insert_one. Al terminar la clave se libera: un
+request posterior vuelve a ejecutarse normalmente.
+
+Con varios workers (servidor.py) cada proceso tiene su propio registro: un
+reintento que llega a otro worker se ejecuta de nuevo. El find_one de
+guardar_prediccion no basta (los dos pueden no encontrar nada e insertar):
+el duplicado lo evita el índice único de venta_id, y el insert que pierde
+la carrera recibe DuplicateKeyError y no guarda nada.
+"""
+
+from app.services.metricas import PREDICCIONES_COALESCIDAS
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class _Llamada:
+    """Resultado compartido de una llamada en vuelo"""
+
+    __slots__ = ("evento", "resultado", "error", "esperando")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error = None
+        self.esperando = 0
+
+
+class SingleFlight:
+    """Ejecuta una sola vez cada clave mientras haya una llamada en curso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_vuelo = {}
+
+    def ejecutar(self, clave, funcion, *args):
+        """
+        Ejecuta funcion(*args) o espera la llamada en curso con la misma clave
+
+        Returns:
+            (resultado, compartido) - compartido=True si se reutilizó otra llamada
+        """
+        with self._lock:
+            llamada = self._en_vuelo.get(clave)
+            lider = llamada is None
+            if lider:
+                llamada = self._en_vuelo[clave] = _Llamada()
+            else:
+                llamada.esperando += 1
+
+        if not lider:
+            PREDICCIONES_COALESCIDAS.inc()
+            llamada.evento.wait()
+            if llamada.error is not None:
+                raise llamada.error
+            return llamada.resultado, True
+
+        try:
+            llamada.resultado = funcion(*args)
+        except BaseException as e:
+            llamada.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_vuelo[clave]
+            if llamada.esperando:
+                logger.debug("🔁 %d llamadas duplicadas resueltas con una sola ejecución", llamada.esperando)
+            llamada.evento.set()
+        return llamada.resultado, False
+
+    def en_vuelo(self) -> int:
+        return len(self._en_vuelo)
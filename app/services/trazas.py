@@ -0,0 +1,149 @@
+"""
+Trazas ligeras por request
+
+Cada request HTTP recibe un request id (X-Request-ID entrante o uno nuevo) y
+una Traza donde el router, PredictorService y PrediccionService registran
+spans (nombre, inicio, fin). Las duraciones se devuelven siempre en la
+cabecera Server-Timing; una fracción muestreada (TRAZAS_TASA_MUESTREO) se
+exporta a archivos rotativos en Trace Event Format (JSON de Chrome), que se
+abren directamente en Perfetto o chrome://tracing.
+"""
+
+from contextvars import ContextVar
+from starlette.datastructures import MutableHeaders
+from app.services.escritor_rotativo import EscritorRotativo
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+TASA_MUESTREO = float(os.getenv("TRAZAS_TASA_MUESTREO", 0.0))
+DIRECTORIO_TRAZAS = os.getenv("TRAZAS_DIR", "trazas")
+
+# Desfase para pasar de perf_counter() a tiempo Unix
+_DESFASE_EPOCH = time.time() - time.perf_counter()
+
+_traza_actual: ContextVar = ContextVar("traza_actual", default=None)
+
+
+class Traza:
+    """Spans de un request"""
+
+    __slots__ = ("request_id", "muestreada", "spans")
+
+    def __init__(self, request_id: str, muestreada: bool):
+        self.request_id = request_id
+        self.muestreada = muestreada
+        self.spans = []
+
+    def server_timing(self) -> str:
+        """Duraciones agregadas por nombre de span en formato Server-Timing"""
+        duraciones = {}
+        for nombre, inicio, fin, _ in self.spans:
+            duraciones[nombre] = duraciones.get(nombre, 0.0) + (fin - inicio)
+        return ", ".join(f"{nombre};dur={dur * 1000:.3f}" for nombre, dur in duraciones.items())
+
+    def eventos(self) -> list:
+        """
+        Spans como eventos completos ('X') del Trace Event Format
+
+        El pid se lee aquí y no al importar: servidor.py importa este módulo en
+        el maestro antes del fork, y el pid separa en pistas distintas los
+        spans de cada worker (los hilos principales comparten el mismo tid).
+        """
+        pid = os.getpid()
+        return [
+            {
+                "name": nombre,
+                "cat": "prediccion",
+                "ph": "X",
+                "ts": round((inicio + _DESFASE_EPOCH) * 1_000_000, 1),
+                "dur": round((fin - inicio) * 1_000_000, 1),
+                "pid": pid,
+                "tid": tid,
+                "args": {"request_id": self.request_id}
+            }
+            for nombre, inicio, fin, tid in self.spans
+        ]
+
+
+def registrar_span(nombre: str, inicio: float, fin: float = None):
+    """
+    Registra un span en la traza del request actual (no hace nada fuera de un request)
+
+    Args:
+        nombre: Nombre del span (token válido para Server-Timing)
+        inicio: time.perf_counter() al comenzar
+        fin: time.perf_counter() al terminar (por defecto, ahora)
+    """
+    traza = _traza_actual.get()
+    if traza is not None:
+        traza.spans.append((nombre, inicio, fin or time.perf_counter(), threading.get_ident()))
+
+
+def request_id_actual():
+    """Request id del request en curso (o None)"""
+    traza = _traza_actual.get()
+    return traza.request_id if traza is not None else None
+
+
+def _serializar_traza(traza: Traza) -> bytes:
+    # Formato de arreglo JSON: el ']' final es opcional en Trace Event Format,
+    # así cada archivo se puede abrir aunque siga creciendo
+    return b"".join(
+        json.dumps(evento, separators=(",", ":")).encode("utf-8") + b",\n"
+        for evento in traza.eventos()
+    )
+
+
+exportador = EscritorRotativo(
+    directorio=DIRECTORIO_TRAZAS,
+    prefijo="trazas",
+    extension=".json",
+    serializar=_serializar_traza,
+    max_bytes=int(os.getenv("TRAZAS_MAX_BYTES", 10 * 1024 * 1024)),
+    max_archivos=int(os.getenv("TRAZAS_MAX_ARCHIVOS", 5)),
+    cabecera=b"[\n"
+)
+
+
+class TrazasMiddleware:
+    """
+    Middleware ASGI que crea la Traza del request, añade las cabeceras
+    X-Request-ID y Server-Timing a la respuesta y exporta las muestreadas
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for clave, valor in scope.get("headers", []):
+            if clave == b"x-request-id":
+                request_id = valor.decode("latin-1")
+                break
+
+        traza = Traza(request_id or uuid.uuid4().hex, TASA_MUESTREO > 0 and random.random() < TASA_MUESTREO)
+        token = _traza_actual.set(traza)
+        t0 = time.perf_counter()
+
+        async def send_con_cabeceras(message):
+            if message["type"] == "http.response.start":
+                traza.spans.append(("total", t0, time.perf_counter(), threading.get_ident()))
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Request-ID", traza.request_id)
+                headers.append("Server-Timing", traza.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_con_cabeceras)
+        finally:
+            _traza_actual.reset(token)
+            if traza.muestreada:
+                exportador.escribir(traza)
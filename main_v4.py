@@ -4,88 +4,178 @@ VERSIÓN 4.0: Con MongoDB Atlas y sistema de recordatorios
 """
 
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from contextlib import asynccontextmanager
+import asyncio
 import logging
+import os
 
+from app.logging_config import configurar_logging
 from app.database import connect_db, close_db
-from app.routers import prediccion, recordatorios
+from app.routers import prediccion, recordatorios, metricas, clientes, ws_prediccion
 from app.services.prediccion_service import PrediccionService
+from app.services.recordatorio_service import RecordatorioService
+from app.services.archivo_service import ArchivoService, ARCHIVO_ACTIVO, ARCHIVO_HORA
 from app.services.email_service import EmailService
+from app.services.bloqueos import BloqueoService
+from app.services.metricas import MetricasMiddleware
+from app.services.admision import ControlAdmisionMiddleware, LimitadorAdaptativo
+from app.services.trazas import TrazasMiddleware, exportador as exportador_trazas
+from app.services.captura import CapturaMiddleware, exportador as exportador_captura
+from app.services import arranque, multiproceso
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)-8s | %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+# Configurar logging (cola + hilo escritor, ver app/logging_config.py)
+configurar_logging()
 logger = logging.getLogger(__name__)
 
-# Scheduler para cron jobs
-scheduler = AsyncIOScheduler()
+# Scheduler para cron jobs (con servidor.py solo corre en el worker 0).
+# Se crea en la fase diferida del arranque: APScheduler no se importa antes
+SCHEDULER_ACTIVO = os.getenv("SCHEDULER_ACTIVO", "true").lower() == "true"
+# Cada cuántos minutos se envían los recordatorios que vencieron (recordatorio_due_at)
+RECORDATORIOS_INTERVALO_MIN = float(os.getenv("RECORDATORIOS_INTERVALO_MIN", 5))
+# Verificación de índices al arrancar: bloqueo entre réplicas (vence solo si el proceso muere)
+BLOQUEO_INDICES = "indices"
+DURACION_BLOQUEO_INDICES = 600
+scheduler = None
 email_service = EmailService()
 
 
 async def cron_enviar_recordatorios():
     """
-    Cron job que se ejecuta diariamente a las 10:00 AM
-    Envía recordatorios a clientes con reservas próximas (24 horas)
+    Job que se ejecuta cada RECORDATORIOS_INTERVALO_MIN minutos
+    Envía los recordatorios cuyo recordatorio_due_at (24 horas antes de la
+    venta) venció desde la ejecución anterior: los envíos se reparten en el día
     """
-    logger.info("🔔 Cron job: Enviando recordatorios automáticos...")
-    
     try:
-        alertas = PrediccionService.obtener_alertas_proximas()
-        logger.info(f"📊 Alertas próximas encontradas: {len(alertas)}")
-        
-        enviados = 0
-        for alerta in alertas:
-            if await email_service.enviar_recordatorio(alerta):
-                PrediccionService.marcar_enviado(alerta["venta_id"])
-                enviados += 1
+        resultado = await RecordatorioService.ejecutar_vencidos("recordatorios_due_at", email_service)
         
-        logger.info(f"✅ Recordatorios automáticos enviados: {enviados}/{len(alertas)}")
+        if resultado["total"]:
+            logger.info(f"✅ Recordatorios automáticos enviados: {resultado['enviados']}/{resultado['total']}")
         
     except Exception as e:
         logger.error(f"❌ Error en cron job: {e}")
 
 
+def cron_archivar_alertas():
+    """
+    Cron job diario (ARCHIVO_HORA): mueve las alertas cerradas al archivo
+    Es bloqueante a propósito (pausa entre lotes): APScheduler lo corre en su pool de hilos
+    """
+    try:
+        ArchivoService.archivar()
+    except Exception as e:
+        logger.error(f"❌ Error en cron de archivado: {e}")
+
+
+def _asegurar_indices_una_vez():
+    """Verifica los índices si ninguna otra réplica lo está haciendo ahora"""
+    dueno = BloqueoService.tomar(BLOQUEO_INDICES, DURACION_BLOQUEO_INDICES)
+    if dueno is None:
+        logger.info("⏸️  Otra réplica está verificando los índices: se omite")
+        return
+    try:
+        PrediccionService.asegurar_indices()
+        ArchivoService.asegurar_indices()
+    finally:
+        BloqueoService.liberar(BLOQUEO_INDICES, dueno)
+
+
+async def _fase_critica():
+    """
+    Lo que /predict necesita antes del primer request, en paralelo:
+    cargar el modelo (joblib + sklearn) y conectar a MongoDB
+    """
+    from app.services.predictor import get_predictor
+
+    async def cargar_modelo():
+        await run_in_threadpool(get_predictor)
+        arranque.marcar("modelo")
+
+    async def conectar_mongo():
+        await run_in_threadpool(connect_db)
+        arranque.marcar("mongo")
+
+    resultados = await asyncio.gather(cargar_modelo(), conectar_mongo(), return_exceptions=True)
+    for resultado in resultados:
+        if isinstance(resultado, Exception):
+            logger.error(f"❌ Error en startup: {resultado}")
+
+
+async def _fase_diferida():
+    """Lo que puede completarse con el servicio ya respondiendo: índices y scheduler"""
+    global scheduler
+    try:
+        # Índices, recreación del índice de retención y backfill de due_at: una
+        # sola vez por réplica (el worker con scheduler) y una réplica a la vez
+        if SCHEDULER_ACTIVO:
+            await run_in_threadpool(_asegurar_indices_una_vez)
+            arranque.marcar("indices")
+        
+        # Configurar jobs (recordatorios vencidos cada pocos minutos, archivado diario)
+        if SCHEDULER_ACTIVO:
+            from apscheduler.schedulers.asyncio import AsyncIOScheduler
+            
+            scheduler = AsyncIOScheduler()
+            scheduler.add_job(
+                cron_enviar_recordatorios,
+                'interval',
+                minutes=RECORDATORIOS_INTERVALO_MIN,
+                id='enviar_recordatorios',
+                max_instances=1,
+                coalesce=True
+            )
+            if ARCHIVO_ACTIVO:
+                scheduler.add_job(
+                    cron_archivar_alertas,
+                    'cron',
+                    hour=ARCHIVO_HORA,
+                    minute=0,
+                    id='archivar_alertas'
+                )
+            scheduler.start()
+            arranque.marcar("scheduler")
+            logger.info(f"✅ Job configurado: Recordatorios vencidos cada {RECORDATORIOS_INTERVALO_MIN:g} min")
+        else:
+            logger.info("⏸️  Scheduler e índices desactivados en este worker (SCHEDULER_ACTIVO=false)")
+        
+        arranque.marcar("diferido_completo")
+        
+    except Exception as e:
+        logger.error(f"❌ Error en la fase diferida del startup: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Contexto del ciclo de vida de la aplicación
-    - Startup: Conecta a MongoDB y configura cron jobs
+    - Startup crítico: carga el modelo y conecta a MongoDB (en paralelo)
+    - Startup diferido (en segundo plano, ya con tráfico): índices y cron jobs
     - Shutdown: Cierra conexiones
     """
     # Startup
     logger.info("🚀 Iniciando Microservicio de Predicción de Cancelaciones v4.0...")
     
-    try:
-        # Conectar a MongoDB
-        connect_db()
-        
-        # Configurar cron job (diariamente a las 10:00 AM)
-        scheduler.add_job(
-            cron_enviar_recordatorios,
-            'cron',
-            hour=10,
-            minute=0,
-            id='enviar_recordatorios'
-        )
-        scheduler.start()
-        logger.info("✅ Cron job configurado: Recordatorios automáticos a las 10:00 AM")
-        
-        logger.info("✅ Microservicio listo")
-        
-    except Exception as e:
-        logger.error(f"❌ Error en startup: {e}")
+    await _fase_critica()
+    arranque.marcar("listo")
+    # Con servidor.py: instantáneas de métricas y drift para los demás workers
+    multiproceso.iniciar()
+    logger.info("✅ Microservicio listo")
+    
+    diferida = asyncio.create_task(_fase_diferida())
     
     yield
     
     # Shutdown
     logger.info("🔌 Cerrando microservicio...")
-    scheduler.shutdown()
+    if not diferida.done():
+        diferida.cancel()
+    if scheduler is not None and scheduler.running:
+        scheduler.shutdown()
     close_db()
+    exportador_trazas.cerrar()
+    exportador_captura.cerrar()
+    multiproceso.detener()
     logger.info("👋 Microservicio cerrado")
 
 
@@ -108,9 +198,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas (peticiones en curso y tiempo de validación)
+app.add_middleware(MetricasMiddleware)
+
+# Trazas por request (X-Request-ID, Server-Timing y exportación muestreada)
+app.add_middleware(TrazasMiddleware)
+
+# Control de admisión de /predict (límite AIMD, cola acotada, 503 + Retry-After)
+limitador_admision = LimitadorAdaptativo()
+app.add_middleware(ControlAdmisionMiddleware, limitador=limitador_admision)
+
+# Captura muestreada de /predict para replay (la más externa: registra también lo que rechaza la admisión)
+app.add_middleware(CapturaMiddleware)
+
 # Incluir routers
 app.include_router(prediccion.router, tags=["Predicción"])
 app.include_router(recordatorios.router, tags=["Recordatorios"])
+app.include_router(metricas.router, tags=["Métricas"])
+app.include_router(clientes.router, tags=["Clientes"])
+app.include_router(ws_prediccion.router, tags=["Predicción"])
+
+arranque.marcar("imports")
 
 
 @app.get("/", tags=["Root"])
@@ -123,14 +231,20 @@ def root():
             "Predicción con ML (Random Forest)",
             "MongoDB Atlas integrado",
             "Sistema de recordatorios automáticos",
-            "Cron job diario (10:00 AM)"
+            "Recordatorios repartidos en el día (recordatorio_due_at)"
         ],
         "endpoints": {
             "predict": "POST /predict",
+            "predict_cliente": "POST /predict/cliente",
+            "ws_predict": "WebSocket /ws/predict",
+            "eventos_clientes": "POST /clientes/eventos",
             "recordatorios": "POST /recordatorios/enviar",
+            "archivar": "POST /recordatorios/archivar",
             "alertas": "GET /recordatorios/alertas",
             "estadisticas": "GET /recordatorios/estadisticas",
             "health": "GET /health",
+            "metrics": "GET /metrics",
+            "drift": "GET /drift",
             "docs": "GET /docs"
         }
     }
@@ -157,7 +271,9 @@ def health_check():
             "version": "4.0",
             "modelo_cargado": modelo_ok,
             "mongodb_conectado": mongo_ok,
-            "cron_activo": scheduler.running
+            "cron_activo": scheduler is not None and scheduler.running,
+            "admision": limitador_admision.estado(),
+            "arranque": arranque.perfil()
         }
         
     except Exception as e:
@@ -170,4 +286,5 @@ def health_check():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001, log_level="info")
+    # log_config=None: uvicorn usa el pipeline de logging ya configurado
+    uvicorn.run(app, host="0.0.0.0", port=8001, log_config=None)
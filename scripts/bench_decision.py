@@ -0,0 +1,143 @@
+"""
+Modo de decisión anticipada (PREDICTOR_MODO_DECISION) vs predict_proba completo
+
+Sobre N filas fijas (semilla constante, distribuciones del dataset sintético):
+1. Exactitud: para cada fila compara la recomendación y la decisión de guardar
+   la alerta (probabilidad redondeada >= UMBRAL_RIESGO) del modo de decisión
+   contra predict_proba, y que las alertas que se guardan tengan la misma
+   probabilidad redondeada (sin estimaciones en MongoDB). Cualquier diferencia
+   es un error (código de salida 1)
+2. Árboles evaluados: promedio, p50/p90 y promedio por recomendación, y
+   cuántas filas terminaron antes, con todos los árboles o en predict_proba
+3. Latencia: PredictorService.predecir por fila en ambos modos (mínimo de
+   --repeticiones), con p50/p99, promedio y el ahorro
+
+Uso:
+    python scripts/bench_decision.py --filas 2000
+    python scripts/bench_decision.py --filas 10000 --salida decision.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from generar_datos_sinteticos import generar_features
+from test_api import percentil
+
+
+def latencias_predecir(predictor, filas: list, repeticiones: int) -> list:
+    """Segundos de predecir() por fila (mínimo de las repeticiones)"""
+    mejores = [float("inf")] * len(filas)
+    for _ in range(repeticiones):
+        for i, fila in enumerate(filas):
+            t0 = time.perf_counter()
+            predictor.predecir(fila)
+            mejores[i] = min(mejores[i], time.perf_counter() - t0)
+    return mejores
+
+
+def resumir_latencias(latencias: list) -> dict:
+    ordenadas = sorted(latencias)
+    return {
+        "p50_us": round(percentil(ordenadas, 50) * 1e6, 1),
+        "p99_us": round(percentil(ordenadas, 99) * 1e6, 1),
+        "promedio_us": round(statistics.fmean(ordenadas) * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decisión anticipada vs predict_proba completo")
+    parser.add_argument("--modelo", default=os.path.join(RAIZ, "app", "ml", "modelo.pkl"))
+    parser.add_argument("--filas", type=int, default=2000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=1234)
+    parser.add_argument("--salida", default=None)
+    args = parser.parse_args()
+
+    from app.services.predictor import (FEATURE_NAMES, RECOMENDACIONES, UMBRAL_ENVIAR_RECORDATORIO,
+                                        UMBRAL_REVISAR_MANUAL, PredictorService)
+    from app.services.prediccion_service import UMBRAL_RIESGO
+
+    umbrales = (UMBRAL_REVISAR_MANUAL, UMBRAL_ENVIAR_RECORDATORIO, UMBRAL_RIESGO)
+    completo = PredictorService(modelo_path=args.modelo, modo_decision=False)
+    decision = PredictorService(modelo_path=args.modelo, modo_decision=True, umbrales=umbrales,
+                                umbral_exacto=UMBRAL_RIESGO)
+    if decision._arboles is None:
+        raise SystemExit("❌ El modelo no es un bosque de árboles: no hay modo de decisión que medir")
+    n_arboles = len(decision._arboles)
+
+    datos = generar_features(args.filas, np.random.RandomState(args.semilla))
+    filas = [{c: datos[c][i].item() for c in FEATURE_NAMES} for i in range(args.filas)]
+    X = np.array([[f[c] for c in FEATURE_NAMES] for f in filas], dtype=np.float64)
+    exactas = completo.modelo.predict_proba(X)[:, 1]
+
+    arboles = []
+    salidas = {"anticipada": 0, "completa": 0, "predict_proba": 0}
+    arboles_por_recomendacion = {r: [] for r in RECOMENDACIONES}
+    diferencias = []
+    for i, fila in enumerate(X.tolist()):
+        probabilidad, k, salida = decision.decidir(fila)
+        arboles.append(k)
+        salidas[salida] += 1
+
+        esperada = PredictorService.recomendaciones_lote(np.array([exactas[i]]))[0]
+        obtenida = PredictorService.recomendaciones_lote(np.array([probabilidad]))[0]
+        arboles_por_recomendacion[RECOMENDACIONES[esperada]].append(k)
+        guardar_esperado = round(float(exactas[i]), 4) >= UMBRAL_RIESGO
+        guardar_obtenido = round(probabilidad, 4) >= UMBRAL_RIESGO
+        distinta_guardada = guardar_esperado and round(probabilidad, 4) != round(float(exactas[i]), 4)
+        if esperada != obtenida or guardar_esperado != guardar_obtenido or distinta_guardada:
+            diferencias.append({"fila": i, "exacta": float(exactas[i]), "decision": probabilidad, "arboles": k})
+
+    lat_completo = latencias_predecir(completo, filas, args.repeticiones)
+    lat_decision = latencias_predecir(decision, filas, args.repeticiones)
+    resumen_completo = resumir_latencias(lat_completo)
+    resumen_decision = resumir_latencias(lat_decision)
+
+    ordenados = sorted(arboles)
+    reporte = {
+        "filas": args.filas,
+        "arboles_modelo": n_arboles,
+        "umbrales": sorted(set(umbrales)),
+        "diferencias": len(diferencias),
+        "arboles_evaluados": {
+            "promedio": round(statistics.fmean(arboles), 2),
+            "p50": percentil(ordenados, 50),
+            "p90": percentil(ordenados, 90),
+            "fraccion": round(statistics.fmean(arboles) / n_arboles, 4),
+            "por_recomendacion": {
+                r: round(statistics.fmean(v), 2) if v else None for r, v in arboles_por_recomendacion.items()
+            },
+        },
+        "salidas": salidas,
+        "predecir": {
+            "predict_proba": resumen_completo,
+            "decision": resumen_decision,
+            "ahorro_promedio_pct": round(
+                (1 - resumen_decision["promedio_us"] / resumen_completo["promedio_us"]) * 100, 1
+            ),
+        },
+    }
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Reporte guardado en: {args.salida}")
+
+    if diferencias:
+        print(f"\n❌ {len(diferencias)} filas con otra recomendación o decisión de alerta: {diferencias[:5]}")
+        sys.exit(1)
+    print("\n✅ Recomendaciones y alertas idénticas a predict_proba")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Benchmark end-to-end del envío de recordatorios contra un sink SMTP local
+
+Levanta scripts/smtp_sink.py en el mismo proceso, configura EmailService en
+MODO REAL apuntando al sink y mide:
+- Mensajes por segundo entregados al sink
+- Latencia por envío (p50 / p99)
+- Memoria (pico de RSS y, opcionalmente, pico de tracemalloc)
+
+Modos:
+- email: llama a EmailService.enviar_recordatorio sobre N alertas sintéticas
+         en memoria (no requiere MongoDB)
+- cron:  inserta N alertas vencidas en MongoDB (MONGODB_URI) y ejecuta el job
+         real de recordatorios (RecordatorioService.ejecutar_vencidos) con una
+         marca de agua propia; al terminar elimina las alertas y la marca
+
+Uso:
+    python scripts/bench_email.py --n 500 --latencia-ms 5
+    python scripts/bench_email.py --modo cron --n 200 --tasa-fallo 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from smtp_sink import SMTPSink
+
+PREFIJO_BENCH = "bench_email_"
+JOB_BENCH = "bench_email_cron"
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano (valores ya ordenados)"""
+    if not valores:
+        return 0.0
+    idx = max(0, math.ceil(p / 100 * len(valores)) - 1)
+    return valores[idx]
+
+
+def alerta_sintetica(i: int, ahora: datetime) -> dict:
+    """Alerta con la misma forma que PrediccionService.guardar_prediccion"""
+    return {
+        "venta_id": f"{PREFIJO_BENCH}{i:07d}",
+        "cliente_id": f"cli_bench_{i % 1000:04d}",
+        "email_cliente": f"cliente{i}@bench.local",
+        "nombre_cliente": f"Cliente Bench {i}",
+        "nombre_paquete": "Caribe Paradisíaco",
+        "destino": "Cancún",
+        "monto_total": 1850.0 + i % 500,
+        "fecha_venta": ahora + timedelta(hours=1 + (i % 20)),
+        "probabilidad_cancelacion": 0.70 + (i % 30) / 100,
+        "recomendacion": "enviar_recordatorio",
+        "fecha_prediccion": ahora,
+        "features": {},
+        "factores_riesgo": [],
+        "recordatorio_enviado": False,
+        "fecha_envio_recordatorio": None,
+        # Venta dentro de las próximas 24 h: el recordatorio ya venció
+        "recordatorio_due_at": ahora - timedelta(minutes=5),
+        "created_at": ahora
+    }
+
+
+def configurar_entorno(sink: SMTPSink):
+    """Apunta EmailService al sink (debe hacerse antes de importar la app)"""
+    os.environ["EMAIL_MODE"] = "real"
+    os.environ["SMTP_HOST"] = sink.host
+    os.environ["SMTP_PORT"] = str(sink.puerto)
+    os.environ["SMTP_USER"] = "bench@bench.local"
+    os.environ["SMTP_PASSWORD"] = "bench"
+    os.environ["SMTP_VALIDATE_CERTS"] = "false"
+
+
+async def bench_email(args, sink: SMTPSink) -> dict:
+    """Envía N recordatorios directamente con EmailService"""
+    from app.services.email_service import EmailService
+
+    email_service = EmailService()
+    ahora = datetime.utcnow()
+    alertas = [alerta_sintetica(i, ahora) for i in range(args.n)]
+    latencias = []
+    semaforo = asyncio.Semaphore(args.concurrencia)
+
+    async def enviar(alerta):
+        async with semaforo:
+            t0 = time.perf_counter()
+            await email_service.enviar_recordatorio(alerta)
+            latencias.append(time.perf_counter() - t0)
+
+    t_inicio = time.perf_counter()
+    await asyncio.gather(*(enviar(a) for a in alertas))
+    duracion = time.perf_counter() - t_inicio
+
+    return {"duracion_s": duracion, "latencias": latencias}
+
+
+async def bench_cron(args, sink: SMTPSink) -> dict:
+    """Siembra N alertas en MongoDB y ejecuta el job real de recordatorios"""
+    from app.database import get_db
+    from app.services.prediccion_service import COLECCION_CHECKPOINTS
+    from app.services.recordatorio_service import RecordatorioService
+    import main_v4
+
+    col = get_db().predicciones_cancelacion
+    ahora = datetime.utcnow()
+    col.delete_many({"venta_id": {"$regex": f"^{PREFIJO_BENCH}"}})
+    col.insert_many([alerta_sintetica(i, ahora) for i in range(args.n)])
+    print(f"🌱 {args.n} alertas sembradas en predicciones_cancelacion")
+
+    try:
+        t_inicio = time.perf_counter()
+        await RecordatorioService.ejecutar_vencidos(JOB_BENCH, main_v4.email_service, limite=args.n)
+        duracion = time.perf_counter() - t_inicio
+    finally:
+        get_db()[COLECCION_CHECKPOINTS].delete_one({"_id": JOB_BENCH})
+        borradas = col.delete_many({"venta_id": {"$regex": f"^{PREFIJO_BENCH}"}}).deleted_count
+        print(f"🧹 {borradas} alertas de benchmark eliminadas")
+
+    # En modo cron no se puede envolver cada envío: se usa el intervalo
+    # entre mensajes consecutivos recibidos por el sink (incluye MongoDB)
+    tiempos = [t_inicio] + sink.tiempos_recepcion
+    latencias = [b - a for a, b in zip(tiempos, tiempos[1:])]
+    return {"duracion_s": duracion, "latencias": latencias}
+
+
+async def _main(args) -> dict:
+    sink = SMTPSink(puerto=0, latencia_ms=args.latencia_ms, tasa_fallo=args.tasa_fallo, semilla=42)
+    await sink.iniciar()
+    configurar_entorno(sink)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    rss_inicial_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    try:
+        if args.modo == "cron":
+            medicion = await bench_cron(args, sink)
+        else:
+            medicion = await bench_email(args, sink)
+    finally:
+        await sink.detener()
+
+    latencias = sorted(medicion["latencias"])
+    duracion = medicion["duracion_s"]
+    estadisticas = sink.estadisticas()
+
+    reporte = {
+        "modo": args.modo,
+        "n": args.n,
+        "concurrencia": args.concurrencia if args.modo == "email" else 1,
+        "latencia_sink_ms": args.latencia_ms,
+        "tasa_fallo_sink": args.tasa_fallo,
+        "duracion_s": round(duracion, 3),
+        "mensajes_por_segundo": round(estadisticas["mensajes_recibidos"] / duracion, 2) if duracion else 0.0,
+        "latencia_p50_ms": round(percentil(latencias, 50) * 1000, 3),
+        "latencia_p99_ms": round(percentil(latencias, 99) * 1000, 3),
+        "latencia_max_ms": round(latencias[-1] * 1000, 3) if latencias else 0.0,
+        "rss_pico_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rss_pico_delta_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_inicial_kb) / 1024, 1),
+        "sink": estadisticas
+    }
+
+    if args.tracemalloc:
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        reporte["tracemalloc_pico_mb"] = round(pico / 1024 / 1024, 2)
+
+    return reporte
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de emails contra un sink SMTP local")
+    parser.add_argument("--modo", choices=["email", "cron"], default="email")
+    parser.add_argument("--n", type=int, default=200, help="Número de alertas")
+    parser.add_argument("--concurrencia", type=int, default=1, help="Envíos simultáneos (solo modo email)")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="Latencia inyectada en el sink")
+    parser.add_argument("--tasa-fallo", type=float, default=0.0, help="Tasa de fallos inyectados en el sink")
+    parser.add_argument("--tracemalloc", action="store_true", help="Medir pico de memoria Python (más lento)")
+    parser.add_argument("--salida", default=None, help="Guardar el reporte JSON en este archivo")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+
+    print("\n" + "="*60)
+    print(f"📧 BENCHMARK DE EMAILS - modo {args.modo} - {args.n} alertas")
+    print("="*60)
+
+    reporte = asyncio.run(_main(args))
+
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Reporte guardado en: {args.salida}")
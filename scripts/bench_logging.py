@@ -0,0 +1,135 @@
+"""
+Benchmark del costo de logging por request de /predict
+
+Compara, sobre un stream de salida que simula un colector de logs lento:
+- antes:   logging.basicConfig síncrono + los ~10 logger.info con f-strings
+           que emitía un /predict de alto riesgo (copia literal de la
+           secuencia anterior)
+- despues: pipeline de app/logging_config.py (cola + hilo escritor) con la
+           secuencia actual de la ruta caliente (debug perezoso + 1 warning),
+           a nivel INFO (producción) y DEBUG con muestreo
+
+Reporta microsegundos de logging por request vistos por el hilo del request.
+
+Uso:
+    python scripts/bench_logging.py --requests 20000 --latencia-sink-us 50
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.logging_config import configurar_logging, detener_logging
+
+UMBRAL_RIESGO = 0.70
+
+
+class SinkLento:
+    """Stream que tarda latencia_us en cada write (colector de logs lento)"""
+
+    def __init__(self, latencia_us: float):
+        self.latencia = latencia_us / 1_000_000
+        self.escrituras = 0
+
+    def write(self, texto):
+        self.escrituras += 1
+        if self.latencia:
+            fin = time.perf_counter() + self.latencia
+            while time.perf_counter() < fin:
+                pass
+        return len(texto)
+
+    def flush(self):
+        pass
+
+
+def ruta_antes(logger, venta_id: str, prob: float):
+    """Secuencia de logs de un /predict de alto riesgo antes del cambio"""
+    logger.info(f"📊 Predicción solicitada para venta: {venta_id}")
+    logger.info(f"✅ Predicción exitosa: {prob*100:.2f}% - enviar_recordatorio")
+    logger.info(f"📝 Request tipo: PredictRequestFull detectado - Evaluando para MongoDB...")
+    logger.info(f"🔍 Verificando si guardar: {venta_id} - Probabilidad: {prob*100:.2f}% - Umbral: {UMBRAL_RIESGO*100:.0f}%")
+    logger.info(f"🟢 {venta_id}: {prob*100:.2f}% >= {UMBRAL_RIESGO*100:.0f}% - SÍ se guardará")
+    logger.info(f"📦 Database obtenida: agencia_viajes")
+    logger.info(f"📁 Colección: predicciones_cancelacion")
+    logger.info(f"✅ No existe duplicado, procediendo a insertar...")
+    logger.info(f"✅ No existe duplicado, procediendo a insertar...")
+    logger.info(f"📄 Documento creado con 18 campos")
+    logger.info(f"💾 Insertando en MongoDB...")
+    logger.warning(f"🚨 ✅ ALERTA GUARDADA EXITOSAMENTE: {venta_id} - ID: 6571f0c2a1b2c3d4e5f60718 - {prob*100:.0f}% riesgo")
+    logger.info(f"💾 GUARDADO EN MONGODB: {venta_id} - {prob*100:.2f}%")
+
+
+def ruta_despues(logger, venta_id: str, prob: float):
+    """Secuencia actual de app/routers/prediccion.py + PrediccionService.guardar_prediccion"""
+    logger.debug("📊 Predicción solicitada para venta: %s", venta_id)
+    logger.debug("✅ Predicción exitosa: %s - %.2f%% - %s", venta_id, prob * 100, "enviar_recordatorio")
+    logger.warning("🚨 ✅ ALERTA GUARDADA: %s - ID: %s - %.0f%% riesgo",
+                   venta_id, "6571f0c2a1b2c3d4e5f60718", prob * 100)
+    logger.debug("💾 %s guardado en MongoDB: %s", venta_id, True)
+
+
+def medir(ruta, logger, n: int) -> float:
+    """Microsegundos por request en el hilo que registra"""
+    t0 = time.perf_counter()
+    for i in range(n):
+        ruta(logger, f"venta_{i:07d}", 0.8123)
+    return (time.perf_counter() - t0) / n * 1_000_000
+
+
+def bench_antes(n: int, latencia_us: float) -> dict:
+    sink = SinkLento(latencia_us)
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s | %(levelname)-8s | %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        stream=sink,
+        force=True
+    )
+    us = medir(ruta_antes, logging.getLogger("bench.antes"), n)
+    return {"us_por_request": round(us, 2), "escrituras": sink.escrituras}
+
+
+def bench_despues(n: int, latencia_us: float, nivel: str, formato: str) -> dict:
+    sink = SinkLento(latencia_us)
+    configurar_logging(nivel=nivel, formato=formato, stream=sink)
+    us = medir(ruta_despues, logging.getLogger("bench.despues"), n)
+
+    t0 = time.perf_counter()
+    detener_logging()
+    drenado_ms = (time.perf_counter() - t0) * 1000
+    return {
+        "us_por_request": round(us, 2),
+        "escrituras": sink.escrituras,
+        "drenado_cola_ms": round(drenado_ms, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo de logging por request (antes/después)")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--latencia-sink-us", type=float, default=0.0,
+                        help="Latencia por write del stream de salida (colector lento)")
+    args = parser.parse_args()
+
+    reporte = {
+        "requests": args.requests,
+        "latencia_sink_us": args.latencia_sink_us,
+        "antes_sincrono_info": bench_antes(args.requests, args.latencia_sink_us),
+        "despues_cola_info_texto": bench_despues(args.requests, args.latencia_sink_us, "INFO", "texto"),
+        "despues_cola_info_json": bench_despues(args.requests, args.latencia_sink_us, "INFO", "json"),
+        "despues_cola_debug_muestreado": bench_despues(args.requests, args.latencia_sink_us, "DEBUG", "texto"),
+    }
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Microbenchmarks de PredictorService con umbrales de regresión
+
+Mide sobre entradas fijas (semilla constante) cada etapa de la predicción:
+- features_dict:            armado del diccionario de 11 features
+- arreglo:                  construcción del arreglo NumPy (1, 11) en el orden del modelo
+- predict_proba_{1,16,256,4096}: inferencia del modelo por tamaño de lote
+- factores_riesgo:          _identificar_factores_riesgo
+- drift_observar:           MonitorDrift.observar (costo del monitor de drift por predicción)
+- predecir:                 PredictorService.predecir completo (1 request)
+
+Cada etapa se repite en varias rondas y se reporta la mediana (y el mínimo)
+del tiempo por llamada en microsegundos.
+
+Con --guardar-baseline el resultado se guarda como línea base; en ejecuciones
+posteriores se compara contra ella y el script termina con código 1 si alguna
+etapa supera la mediana de la línea base por más de --tolerancia. La línea
+base depende de la máquina: generarla en el mismo entorno donde se compara.
+Sin línea base el script también termina con código 1 (la comparación no
+puede pasar en silencio); --sin-base solo mide y reporta.
+
+Uso:
+    python scripts/bench_predictor.py --guardar-baseline
+    python scripts/bench_predictor.py --tolerancia 0.25
+    python scripts/bench_predictor.py --sin-base
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from generar_datos_sinteticos import generar_features
+
+BASELINE_POR_DEFECTO = os.path.join(RAIZ, "scripts", "bench_predictor_baseline.json")
+TAMANOS_LOTE = (1, 16, 256, 4096)
+
+
+def medir(funcion, rondas: int, min_tiempo_ronda: float = 0.05) -> dict:
+    """
+    Tiempo por llamada en microsegundos (mediana y mínimo de las rondas)
+
+    El número de llamadas por ronda se calibra para que cada ronda dure al
+    menos min_tiempo_ronda segundos.
+    """
+    funcion()  # calentamiento
+    llamadas = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(llamadas):
+            funcion()
+        if time.perf_counter() - t0 >= min_tiempo_ronda or llamadas >= 1_000_000:
+            break
+        llamadas *= 2
+
+    tiempos = []
+    for _ in range(rondas):
+        t0 = time.perf_counter()
+        for _ in range(llamadas):
+            funcion()
+        tiempos.append((time.perf_counter() - t0) / llamadas * 1_000_000)
+    return {
+        "mediana_us": round(statistics.median(tiempos), 3),
+        "min_us": round(min(tiempos), 3),
+        "llamadas_por_ronda": llamadas
+    }
+
+
+def ejecutar(predictor, rondas: int) -> dict:
+    """Corre todas las etapas y devuelve {etapa: estadísticas}"""
+    rng = np.random.RandomState(1234)
+    datos = generar_features(max(TAMANOS_LOTE), rng)
+    columnas = predictor.feature_names
+    filas = [{c: datos[c][i].item() for c in columnas} for i in range(max(TAMANOS_LOTE))]
+    fila = filas[0]
+
+    def features_dict():
+        return {c: fila[c] for c in columnas}
+
+    def arreglo():
+        return np.array([[fila[c] for c in columnas]], dtype=np.float64)
+
+    resultados = {
+        "features_dict": medir(features_dict, rondas),
+        "arreglo": medir(arreglo, rondas),
+    }
+
+    for n in TAMANOS_LOTE:
+        lote = np.array([[f[c] for c in columnas] for f in filas[:n]], dtype=np.float64)
+        resultados[f"predict_proba_{n}"] = medir(lambda lote=lote: predictor.modelo.predict_proba(lote), rondas)
+
+    resultados["factores_riesgo"] = medir(lambda: predictor._identificar_factores_riesgo(fila), rondas)
+
+    from app.services.drift import MonitorDrift, construir_perfil
+    referencia = np.array([[f[c] for c in columnas] for f in filas], dtype=np.float64)
+    perfil = construir_perfil({c: referencia[:, i] for i, c in enumerate(columnas)},
+                              predictor.predecir_lote(referencia))
+    monitor = MonitorDrift(perfil)
+    resultados["drift_observar"] = medir(lambda: monitor.observar(fila, 0.42), rondas)
+
+    resultados["predecir"] = medir(lambda: predictor.predecir(fila), rondas)
+    return resultados
+
+
+def comparar(resultados: dict, baseline: dict, tolerancia: float) -> list:
+    """Etapas cuya mediana supera la de la línea base por más de la tolerancia"""
+    regresiones = []
+    for etapa, stats in resultados.items():
+        base = baseline.get("etapas", {}).get(etapa)
+        if base is None:
+            continue
+        limite = base["mediana_us"] * (1 + tolerancia)
+        cambio = stats["mediana_us"] / base["mediana_us"] - 1 if base["mediana_us"] else 0.0
+        stats["baseline_us"] = base["mediana_us"]
+        stats["cambio_pct"] = round(cambio * 100, 1)
+        if stats["mediana_us"] > limite:
+            regresiones.append(etapa)
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks de PredictorService")
+    parser.add_argument("--modelo", default=os.path.join(RAIZ, "app", "ml", "modelo.pkl"))
+    parser.add_argument("--rondas", type=int, default=7)
+    parser.add_argument("--baseline", default=BASELINE_POR_DEFECTO, help="Archivo JSON de línea base")
+    parser.add_argument("--guardar-baseline", action="store_true", help="Guardar este resultado como línea base")
+    parser.add_argument("--tolerancia", type=float, default=0.20,
+                        help="Regresión permitida sobre la mediana de la línea base (0.20 = +20%%)")
+    parser.add_argument("--sin-base", action="store_true", help="Solo medir, sin comparar contra una línea base")
+    args = parser.parse_args()
+
+    from app.services.predictor import PredictorService
+    predictor = PredictorService(modelo_path=args.modelo, modo_decision=False)
+
+    resultados = ejecutar(predictor, args.rondas)
+    reporte = {
+        "python": platform.python_version(),
+        "maquina": platform.machine(),
+        "procesador": platform.processor() or platform.machine(),
+        "rondas": args.rondas,
+        "etapas": resultados
+    }
+
+    if args.guardar_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(json.dumps(reporte, indent=2, ensure_ascii=False))
+        print(f"\n💾 Línea base guardada en: {args.baseline}")
+        return
+
+    regresiones = []
+    if args.sin_base:
+        pass
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regresiones = comparar(resultados, baseline, args.tolerancia)
+        reporte["tolerancia"] = args.tolerancia
+        reporte["regresiones"] = regresiones
+    else:
+        print(json.dumps(reporte, indent=2, ensure_ascii=False))
+        print(f"\n❌ Sin línea base en {args.baseline}: créala con --guardar-baseline "
+              f"en esta máquina o usa --sin-base para solo medir")
+        sys.exit(1)
+
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+
+    if regresiones:
+        print(f"\n❌ Regresión de rendimiento (> +{args.tolerancia * 100:.0f}%): {', '.join(regresiones)}")
+        sys.exit(1)
+    if "regresiones" in reporte:
+        print("\n✅ Sin regresiones")
+
+
+if __name__ == "__main__":
+    main()
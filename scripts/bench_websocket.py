@@ -0,0 +1,153 @@
+"""
+Mensajes por segundo sostenidos: /ws/predict vs /predict con HTTP keep-alive
+
+Contra el mismo servicio en ejecución y con los mismos payloads (los de
+scripts/test_api.py):
+- http: carga cerrada de test_api.py sobre /predict (N clientes, una sesión
+        keep-alive por cliente)
+- ws:   C conexiones a /ws/predict; en cada una un emisor mantiene hasta
+        --ventana mensajes en vuelo (acotado por la ventana que anuncia el
+        servidor) y un receptor empareja las respuestas por id
+
+Reporta mensajes/s, latencia p50/p99 por mensaje, errores y, para ws, la
+fracción de respuestas que llegaron fuera de orden.
+
+Uso:
+    python scripts/bench_websocket.py --duracion 20 --concurrencia 32
+    python scripts/bench_websocket.py --conexiones 1 --ventana 128 --salida ws.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_api import (ClienteHTTP, GeneradorRequests, Resultados, carga_cerrada, percentil)
+
+
+async def medir_http(args, generador) -> dict:
+    cliente = ClienteHTTP(args.url, args.concurrencia)
+    await carga_cerrada(cliente, generador, Resultados(), min(args.concurrencia, 4), args.calentamiento, 0)
+
+    resultados = Resultados()
+    t0 = time.perf_counter()
+    await carga_cerrada(cliente, generador, resultados, args.concurrencia, args.duracion, 0)
+    duracion = time.perf_counter() - t0
+    await cliente.cerrar()
+
+    resumen = resultados.resumen(duracion)["predict"]
+    return {
+        "modo": f"http keep-alive ({args.concurrencia} clientes)",
+        "mensajes": resumen["requests"],
+        "mensajes_s": resumen["rps"],
+        "p50_ms": resumen["p50_ms"],
+        "p99_ms": resumen["p99_ms"],
+        "errores": resumen["errores"],
+    }
+
+
+async def conexion_ws(url: str, generador, ventana: int, duracion: float, latencias: list, conteo: dict):
+    """Una conexión: emisor con ventana de mensajes en vuelo + receptor"""
+    from websockets.asyncio.client import connect
+
+    async with connect(url, max_size=None) as ws:
+        anuncio = json.loads(await ws.recv())
+        en_vuelo = asyncio.Semaphore(min(ventana, anuncio.get("max_en_vuelo", ventana)))
+        enviados = {}
+        fin = time.perf_counter() + duracion
+        siguiente = 0
+
+        async def emisor():
+            nonlocal siguiente
+            i = 0
+            while time.perf_counter() < fin:
+                await en_vuelo.acquire()
+                body = generador.payloads[i % len(generador.payloads)]
+                enviados[siguiente] = time.perf_counter()
+                await ws.send(b'{"id":%d,"datos":' % siguiente + body + b"}", text=True)
+                siguiente += 1
+                i += 1
+
+        async def receptor():
+            esperado = 0
+            while True:
+                respuesta = json.loads(await ws.recv())
+                t_envio = enviados.pop(respuesta["id"])
+                latencias.append(time.perf_counter() - t_envio)
+                if "error" in respuesta:
+                    conteo["errores"] += 1
+                if respuesta["id"] != esperado:
+                    conteo["fuera_de_orden"] += 1
+                esperado = respuesta["id"] + 1
+                en_vuelo.release()
+
+        tarea_receptor = asyncio.create_task(receptor())
+        await emisor()
+        # Esperar las respuestas de lo que quedó en vuelo
+        limite = time.perf_counter() + 30
+        while enviados and time.perf_counter() < limite and not tarea_receptor.done():
+            await asyncio.sleep(0.005)
+        tarea_receptor.cancel()
+        await asyncio.gather(tarea_receptor, return_exceptions=True)
+
+
+async def medir_ws(args, generador) -> dict:
+    url = args.url.replace("http://", "ws://").replace("https://", "wss://").rstrip("/") + "/ws/predict"
+    await conexion_ws(url, generador, args.ventana, args.calentamiento, [], {"errores": 0, "fuera_de_orden": 0})
+
+    latencias = []
+    conteo = {"errores": 0, "fuera_de_orden": 0}
+    t0 = time.perf_counter()
+    await asyncio.gather(*(
+        conexion_ws(url, generador, args.ventana, args.duracion, latencias, conteo)
+        for _ in range(args.conexiones)
+    ))
+    duracion = time.perf_counter() - t0
+
+    ordenadas = sorted(latencias)
+    return {
+        "modo": f"websocket ({args.conexiones} conexiones, ventana {args.ventana})",
+        "mensajes": len(ordenadas),
+        "mensajes_s": round(len(ordenadas) / duracion, 2) if duracion else 0.0,
+        "p50_ms": round(percentil(ordenadas, 50) * 1000, 3),
+        "p99_ms": round(percentil(ordenadas, 99) * 1000, 3),
+        "errores": conteo["errores"],
+        "fuera_de_orden": round(conteo["fuera_de_orden"] / len(ordenadas), 4) if ordenadas else 0.0,
+    }
+
+
+async def _main(args) -> dict:
+    generador = GeneradorRequests({"predict": 1.0}, semilla=args.semilla)
+    resultados = [await medir_http(args, generador), await medir_ws(args, generador)]
+    base = resultados[0]["mensajes_s"]
+    for r in resultados:
+        r["vs_http"] = round(r["mensajes_s"] / base, 2) if base else None
+    return {"url": args.url, "duracion_s": args.duracion, "resultados": resultados}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput de /ws/predict vs /predict (HTTP keep-alive)")
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--duracion", type=float, default=15)
+    parser.add_argument("--calentamiento", type=float, default=2)
+    parser.add_argument("--concurrencia", type=int, default=32, help="Clientes HTTP keep-alive")
+    parser.add_argument("--conexiones", type=int, default=1, help="Conexiones WebSocket")
+    parser.add_argument("--ventana", type=int, default=128, help="Mensajes en vuelo por conexión WebSocket")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", default=None)
+    args = parser.parse_args()
+
+    reporte = asyncio.run(_main(args))
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Reporte guardado en: {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
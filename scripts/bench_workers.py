@@ -0,0 +1,147 @@
+"""
+Throughput por pod: un proceso (main_v4.py) vs servidor.py con N workers
+
+Para cada configuración levanta el servicio en un puerto local, espera a
+/health, lanza la carga cerrada de scripts/test_api.py (en varios procesos
+para que el generador no sea el cuello de botella) y suma RPS y errores;
+también reporta la memoria (PSS) del grupo de procesos del servidor, donde
+se ve el modelo compartido copy-on-write entre workers.
+
+Requiere MongoDB accesible con la configuración de .env (igual que el servicio).
+
+Uso:
+    python scripts/bench_workers.py --workers 1,2,4 --duracion 30 --concurrencia 32
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_API = os.path.join(RAIZ, "scripts", "test_api.py")
+
+
+def esperar_salud(url: str, timeout: float = 60.0):
+    fin = time.monotonic() + timeout
+    while time.monotonic() < fin:
+        try:
+            with urllib.request.urlopen(url + "/health", timeout=2) as respuesta:
+                if json.loads(respuesta.read()).get("status") == "healthy":
+                    return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"El servicio no respondió /health en {timeout:.0f} s")
+
+
+def pss_kb(pid: int) -> int:
+    """PSS (memoria proporcional, cuenta las páginas compartidas una sola vez) del proceso y sus hijos"""
+    total = 0
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(p) for p in f.read().split()]
+    except OSError:
+        pass
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/smaps_rollup") as f:
+                for linea in f:
+                    if linea.startswith("Pss:"):
+                        total += int(linea.split()[1])
+        except OSError:
+            pass
+    return total
+
+
+def comando_servidor(config: str, puerto: int) -> list:
+    if config == "main_v4":
+        # Lo mismo que "python main_v4.py" (un proceso), en otro puerto
+        return [sys.executable, "-c",
+                "import uvicorn, main_v4; "
+                f"uvicorn.run(main_v4.app, host='127.0.0.1', port={puerto}, log_config=None)"]
+    return [sys.executable, "servidor.py", "--host", "127.0.0.1", "--port", str(puerto), "--workers", config]
+
+
+def medir(config: str, args) -> dict:
+    url = f"http://127.0.0.1:{args.puerto}"
+    entorno = dict(os.environ, LOG_LEVEL="WARNING", ADMISION_ACTIVA="false")
+    servidor = subprocess.Popen(comando_servidor(config, args.puerto), cwd=RAIZ, env=entorno,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        esperar_salud(url)
+        with tempfile.TemporaryDirectory() as tmp:
+            salidas = [os.path.join(tmp, f"carga_{i}.json") for i in range(args.procesos_carga)]
+            generadores = [
+                subprocess.Popen(
+                    [sys.executable, TEST_API, "--url", url, "--modo", "cerrado",
+                     "--concurrencia", str(max(1, args.concurrencia // args.procesos_carga)),
+                     "--duracion", str(args.duracion), "--mezcla", args.mezcla,
+                     "--semilla", str(i), "--salida", salida],
+                    cwd=RAIZ, stdout=subprocess.DEVNULL
+                )
+                for i, salida in enumerate(salidas)
+            ]
+            time.sleep(args.duracion / 2)
+            memoria = pss_kb(servidor.pid)
+            for g in generadores:
+                g.wait()
+            reportes = []
+            for salida in salidas:
+                with open(salida, encoding="utf-8") as f:
+                    reportes.append(json.load(f))
+    finally:
+        servidor.terminate()
+        try:
+            servidor.wait(timeout=40)
+        except subprocess.TimeoutExpired:
+            servidor.kill()
+
+    requests_total = sum(r["total"]["requests"] for r in reportes)
+    errores = sum(r["total"]["errores"] for r in reportes)
+    p99 = max(e["p99_ms"] for r in reportes for e in r["endpoints"].values())
+    return {
+        "config": "main_v4 (1 proceso)" if config == "main_v4" else f"servidor.py --workers {config}",
+        "rps": round(sum(r["total"]["rps"] for r in reportes), 1),
+        "requests": requests_total,
+        "tasa_error": round(errores / requests_total, 4) if requests_total else 0.0,
+        "p99_ms_peor_generador": p99,
+        "pss_mb": round(memoria / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput por pod: un proceso vs pre-fork con N workers")
+    parser.add_argument("--workers", default="1,2,4", help="Configuraciones de servidor.py a medir")
+    parser.add_argument("--duracion", type=float, default=20)
+    parser.add_argument("--concurrencia", type=int, default=32)
+    parser.add_argument("--procesos-carga", type=int, default=4, help="Procesos de test_api.py en paralelo")
+    parser.add_argument("--mezcla", default="predict=1.0")
+    parser.add_argument("--puerto", type=int, default=8101)
+    parser.add_argument("--salida", default=None)
+    args = parser.parse_args()
+
+    resultados = [medir("main_v4", args)]
+    for n in args.workers.split(","):
+        resultados.append(medir(n.strip(), args))
+
+    base = resultados[0]["rps"]
+    for r in resultados:
+        r["vs_main_v4"] = round(r["rps"] / base, 2) if base else None
+
+    reporte = {"cpu_count": os.cpu_count(), "duracion_s": args.duracion,
+               "concurrencia": args.concurrencia, "resultados": resultados}
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Reporte guardado en: {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
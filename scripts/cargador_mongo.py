@@ -0,0 +1,222 @@
+"""
+Cargador de datos de entrenamiento desde MongoDB con caché columnar local
+
+- Lee las filas etiquetadas con una agregación que proyecta cada documento
+  a un arreglo [features..., etiqueta] (sin armar dicts por fila en Python)
+  y las copia en columnas NumPy preasignadas, por lotes del cursor
+- Guarda el resultado en data/cache/ como .npz (una columna por arreglo),
+  con nombre derivado de la consulta y la marca de agua (campo de fecha +
+  _id del último documento leído)
+- Las ejecuciones siguientes solo piden documentos posteriores a la marca
+  de agua y los agregan a la caché (reemplazando las filas de los _id que
+  vuelven a aparecer, p. ej. una etiqueta corregida)
+
+Requisito de la marca de agua: el campo (por defecto fecha_etiqueta) tiene
+que actualizarse a la hora actual cada vez que se escribe la etiqueta
+fue_cancelada, en el mismo update:
+    {"$set": {"fue_cancelada": 1, "fecha_etiqueta": <ahora>}}
+Las alertas se etiquetan después de creadas: con created_at como marca, un
+documento creado antes de la marca guardada pero etiquetado después no se
+volvería a leer y la caché dejaría de coincidir con MongoDB. Los documentos
+etiquetados sin ese campo no se leen (se avisa cuántos son).
+
+Uso desde train.py:
+    python scripts/train.py --fuente mongo --mongo-coleccion predicciones_cancelacion
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from app.services.predictor import FEATURE_NAMES
+
+DIRECTORIO_CACHE = os.path.join(RAIZ, "data", "cache")
+
+# Fecha en que se escribió la etiqueta (ver el requisito arriba)
+CAMPO_MARCA = "fecha_etiqueta"
+
+
+def clave_consulta(coleccion: str, filtro: dict, campo_etiqueta: str, campo_marca: str,
+                   prefijo_features: str, base_datos: str) -> str:
+    """Hash estable de todo lo que define el conjunto de filas"""
+    consulta = {
+        "base_datos": base_datos,
+        "coleccion": coleccion,
+        "filtro": filtro,
+        "etiqueta": campo_etiqueta,
+        "marca": campo_marca,
+        "prefijo": prefijo_features,
+        "features": list(FEATURE_NAMES),
+    }
+    texto = json.dumps(consulta, sort_keys=True, default=str)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()[:16]
+
+
+def _leer_cache(ruta: str):
+    if not os.path.exists(ruta):
+        return None
+    with np.load(ruta, allow_pickle=False) as datos:
+        if "_ids" not in datos.files:
+            return None  # caché sin _id por fila (versión anterior): se relee completa
+        columnas = {nombre: datos[nombre] for nombre in datos.files if not nombre.startswith("_")}
+        ids = datos["_ids"]
+        marca = datos["_marca"].item() if "_marca" in datos.files else None
+        ultimo_id = datos["_ultimo_id"].item() if "_ultimo_id" in datos.files else None
+    return columnas, ids, marca, ultimo_id
+
+
+def _guardar_cache(ruta: str, columnas: dict, ids, marca, ultimo_id, consulta: dict):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = ruta + ".tmp.npz"
+    extras = {"_consulta": np.array(json.dumps(consulta, default=str)), "_ids": ids}
+    if marca is not None:
+        extras["_marca"] = np.array(marca.isoformat() if hasattr(marca, "isoformat") else str(marca))
+        extras["_ultimo_id"] = np.array(str(ultimo_id))
+    np.savez(temporal, **columnas, **extras)
+    os.replace(temporal, ruta)
+
+
+def _filtro_posterior(filtro: dict, campo_marca: str, marca, ultimo_id) -> dict:
+    """Documentos estrictamente posteriores a (marca, _id)"""
+    if marca is None:
+        return filtro
+    from bson import ObjectId
+    if isinstance(marca, str):
+        marca = pd.Timestamp(marca).to_pydatetime()
+    try:
+        ultimo_id = ObjectId(ultimo_id)
+    except Exception:
+        pass
+    return {"$and": [filtro, {"$or": [
+        {campo_marca: {"$gt": marca}},
+        {campo_marca: marca, "_id": {"$gt": ultimo_id}},
+    ]}]}
+
+
+def leer_mongo(col, filtro: dict, campo_etiqueta: str, campo_marca: str,
+               prefijo_features: str, tamano_lote: int = 5000):
+    """
+    Lee las filas etiquetadas posteriores al filtro en columnas NumPy preasignadas
+
+    Returns:
+        (matriz (n, 12) float64 con features + etiqueta, _id de cada fila como texto,
+         marca del último, _id del último)
+    """
+    n = col.count_documents(filtro)
+    datos = np.empty((n, len(FEATURE_NAMES) + 1), dtype=np.float64)
+    ids = [None] * n
+    if n == 0:
+        return datos, np.array([], dtype=str), None, None
+
+    # Conversión a double en el servidor; valores ausentes o no numéricos -> null -> NaN
+    valores = [
+        {"$convert": {"input": f"${campo}", "to": "double", "onError": None, "onNull": None}}
+        for campo in [f"{prefijo_features}{c}" for c in FEATURE_NAMES] + [campo_etiqueta]
+    ]
+    pipeline = [
+        {"$match": filtro},
+        {"$sort": {campo_marca: 1, "_id": 1}},
+        {"$limit": n},  # lo que llegue durante la lectura queda para la próxima ejecución
+        {"$project": {"_id": 1, "m": f"${campo_marca}", "v": valores}},
+    ]
+
+    i = 0
+    ultimo = None
+    for doc in col.aggregate(pipeline, batchSize=tamano_lote, allowDiskUse=True):
+        datos[i] = doc["v"]  # None -> NaN
+        ids[i] = str(doc["_id"])
+        ultimo = doc
+        i += 1
+    if ultimo is None:
+        return datos[:0], np.array([], dtype=str), None, None
+    return datos[:i], np.array(ids[:i], dtype=str), ultimo["m"], ultimo["_id"]
+
+
+def cargar_dataset_mongo(coleccion: str = "predicciones_cancelacion", filtro: dict = None,
+                         campo_etiqueta: str = "fue_cancelada", campo_marca: str = CAMPO_MARCA,
+                         prefijo_features: str = "features.", usar_cache: bool = True,
+                         directorio_cache: str = DIRECTORIO_CACHE, tamano_lote: int = 5000,
+                         db=None) -> pd.DataFrame:
+    """
+    DataFrame con las 11 features + fue_cancelada (misma forma que el CSV sintético)
+
+    Las filas quedan en orden de (campo_marca, _id): train.py --incremental
+    toma las últimas como holdout reciente.
+
+    Args:
+        coleccion: Colección con los documentos etiquetados
+        filtro: Filtro adicional de MongoDB
+        campo_etiqueta: Campo con el resultado real (1/0 o bool)
+        campo_marca: Fecha usada como marca de agua; debe actualizarse al
+                     escribir la etiqueta (ver el requisito en el docstring del módulo)
+        prefijo_features: Prefijo de las features en el documento ("features." o "")
+        usar_cache: Leer/actualizar la caché .npz local
+        directorio_cache: Carpeta de la caché
+        tamano_lote: Documentos por lote del cursor
+        db: Base de datos (por defecto app.database.get_db())
+    """
+    if db is None:
+        from app.database import get_db
+        db = get_db()
+
+    etiquetados = {"$and": [filtro or {}, {campo_etiqueta: {"$exists": True, "$ne": None}}]}
+    filtro_base = {"$and": [etiquetados, {campo_marca: {"$type": "date"}}]}
+    consulta = {"coleccion": coleccion, "filtro": filtro_base, "marca": campo_marca,
+                "prefijo": prefijo_features}
+    clave = clave_consulta(coleccion, filtro_base, campo_etiqueta, campo_marca,
+                           prefijo_features, getattr(db, "name", ""))
+    ruta_cache = os.path.join(directorio_cache, f"entrenamiento_{clave}.npz")
+
+    sin_marca = db[coleccion].count_documents({"$and": [etiquetados, {campo_marca: {"$not": {"$type": "date"}}}]})
+    if sin_marca:
+        print(f"⚠️  {sin_marca} documentos etiquetados sin {campo_marca} (fecha): no se leen")
+
+    columnas, ids, marca, ultimo_id = None, None, None, None
+    if usar_cache:
+        cache = _leer_cache(ruta_cache)
+        if cache is not None:
+            columnas, ids, marca, ultimo_id = cache
+            print(f"📦 Caché local: {len(columnas['fue_cancelada'])} filas hasta {marca} ({ruta_cache})")
+
+    t0 = time.perf_counter()
+    nuevos, ids_nuevos, marca_nueva, ultimo_nuevo = leer_mongo(
+        db[coleccion], _filtro_posterior(filtro_base, campo_marca, marca, ultimo_id),
+        campo_etiqueta, campo_marca, prefijo_features, tamano_lote
+    )
+    print(f"📥 MongoDB: {len(nuevos)} filas nuevas en {time.perf_counter() - t0:.2f} s")
+
+    columnas_nuevas = {nombre: nuevos[:, j] for j, nombre in enumerate(FEATURE_NAMES)}
+    columnas_nuevas["fue_cancelada"] = nuevos[:, -1]
+    if columnas is None:
+        columnas, ids = columnas_nuevas, ids_nuevos
+    elif len(nuevos):
+        # Un _id que vuelve a aparecer (etiqueta reescrita) reemplaza su fila anterior
+        vigentes = ~np.isin(ids, ids_nuevos)
+        reemplazadas = int(len(ids) - vigentes.sum())
+        if reemplazadas:
+            print(f"♻️  {reemplazadas} filas de la caché reemplazadas por su versión nueva")
+        columnas = {nombre: np.concatenate([columnas[nombre][vigentes], columnas_nuevas[nombre]])
+                    for nombre in columnas}
+        ids = np.concatenate([ids[vigentes], ids_nuevos])
+
+    if len(nuevos):
+        marca, ultimo_id = marca_nueva, ultimo_nuevo
+        if usar_cache:
+            _guardar_cache(ruta_cache, columnas, ids, marca, ultimo_id, consulta)
+
+    df = pd.DataFrame(columnas, columns=list(FEATURE_NAMES) + ["fue_cancelada"])
+    incompletas = df.isna().any(axis=1)
+    if incompletas.any():
+        print(f"⚠️  {int(incompletas.sum())} filas con features faltantes descartadas")
+        df = df[~incompletas]
+    df["fue_cancelada"] = df["fue_cancelada"].astype(int)
+    return df.reset_index(drop=True)
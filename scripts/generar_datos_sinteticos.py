@@ -1,51 +1,72 @@
 """
 Script para generar datos sintéticos de entrenamiento
 VERSIÓN FINAL: 11 features (SIN edad_cliente - fechaNacimiento es opcional en MongoDB)
+
+Sin argumentos genera data/dataset_sintetico.csv (1000 registros, semilla 42).
+Para volúmenes grandes divide las filas en chunks con semillas independientes
+(SeedSequence.spawn) que se generan en un pool de procesos y se escriben en
+orden a medida que terminan (memoria acotada por chunks en vuelo):
+
+    python scripts/generar_datos_sinteticos.py --filas 20000000 --salida data/grande.csv
+    python scripts/generar_datos_sinteticos.py --filas 20000000 --formato npz --salida data/grande_npz
+    python scripts/generar_datos_sinteticos.py --filas 100000 --payloads data/payloads.jsonl
+
+El resultado depende de --semilla y --tamano-chunk, no del número de workers.
 """
 
+import argparse
+import json
 import pandas as pd
 import numpy as np
 import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
 
-def generar_datos_sinteticos(n_samples=1000):
+DESTINOS = {
+    0: [("Caribe Paradisíaco", "Cancún"), ("Playas del Pacífico", "Puerto Vallarta")],
+    1: [("Escapada Urbana", "Buenos Aires"), ("Capitales de Europa", "Madrid")],
+    2: [("Aventura Andina", "Cusco"), ("Selva y Cascadas", "Iguazú")],
+}
+
+
+def generar_features(n_samples, rng):
     """
-    Genera dataset sintético con 11 features para entrenar el modelo
-    
-    Features:
-    - 7 de venta: monto_total, es_temporada_alta, dia_semana_reserva, 
-                  metodo_pago_tarjeta, tiene_paquete, duracion_dias, destino_categoria
-    - 4 de cliente: total_compras_previas, total_cancelaciones_previas,
-                    tasa_cancelacion_historica, monto_promedio_compras
+    Genera las 11 features con las distribuciones del dataset sintético
+
+    Args:
+        n_samples: Número de registros
+        rng: np.random.RandomState con la semilla deseada
+
+    Returns:
+        dict nombre_feature -> np.ndarray
     """
-    
-    np.random.seed(42)
-    
-    print(f"🔄 Generando {n_samples} registros sintéticos con 11 features...")
-    
     # Features de venta (7)
-    monto_total = np.random.uniform(500, 4000, n_samples)
-    es_temporada_alta = np.random.choice([0, 1], n_samples, p=[0.65, 0.35])
-    dia_semana_reserva = np.random.randint(0, 7, n_samples)
-    metodo_pago_tarjeta = np.random.choice([0, 1], n_samples, p=[0.25, 0.75])
-    tiene_paquete = np.random.choice([0, 1], n_samples, p=[0.3, 0.7])
-    duracion_dias = np.random.randint(3, 15, n_samples)
-    destino_categoria = np.random.choice([0, 1, 2], n_samples, p=[0.4, 0.3, 0.3])
+    monto_total = rng.uniform(500, 4000, n_samples)
+    es_temporada_alta = rng.choice([0, 1], n_samples, p=[0.65, 0.35])
+    dia_semana_reserva = rng.randint(0, 7, n_samples)
+    metodo_pago_tarjeta = rng.choice([0, 1], n_samples, p=[0.25, 0.75])
+    tiene_paquete = rng.choice([0, 1], n_samples, p=[0.3, 0.7])
+    duracion_dias = rng.randint(3, 15, n_samples)
+    destino_categoria = rng.choice([0, 1, 2], n_samples, p=[0.4, 0.3, 0.3])
     
     # Features de cliente (4) - SIN edad_cliente
-    total_compras_previas = np.random.randint(0, 15, n_samples)
-    total_cancelaciones_previas = np.random.randint(0, 5, n_samples)
+    total_compras_previas = rng.randint(0, 15, n_samples)
+    total_cancelaciones_previas = rng.randint(0, 5, n_samples)
     
     # Calcular tasa_cancelacion_historica
-    tasa_cancelacion_historica = np.where(
-        total_compras_previas > 0,
-        total_cancelaciones_previas / total_compras_previas,
-        0
-    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tasa_cancelacion_historica = np.where(
+            total_compras_previas > 0,
+            total_cancelaciones_previas / total_compras_previas,
+            0
+        )
     
-    monto_promedio_compras = np.random.uniform(800, 3000, n_samples)
+    monto_promedio_compras = rng.uniform(800, 3000, n_samples)
     
-    # Crear DataFrame
-    df = pd.DataFrame({
+    return {
         'monto_total': monto_total,
         'es_temporada_alta': es_temporada_alta,
         'dia_semana_reserva': dia_semana_reserva,
@@ -57,9 +78,22 @@ def generar_datos_sinteticos(n_samples=1000):
         'total_cancelaciones_previas': total_cancelaciones_previas,
         'tasa_cancelacion_historica': tasa_cancelacion_historica,
         'monto_promedio_compras': monto_promedio_compras
-    })
+    }
+
+
+def calcular_target(df, rng):
+    """
+    Genera el target (fue_cancelada) basado en lógica de negocio
+
+    Args:
+        df: DataFrame (o dict de arrays) con las 11 features
+        rng: np.random.RandomState (para el ruido)
+
+    Returns:
+        np.ndarray de 0/1
+    """
+    n_samples = len(df['monto_total'])
     
-    # Generar target (fue_cancelada) basado en lógica de negocio
     # Factores de riesgo de cancelación
     probabilidad_cancelacion = (
         # Cliente con historial de cancelaciones
@@ -85,36 +119,284 @@ def generar_datos_sinteticos(n_samples=1000):
     )
     
     # Añadir ruido aleatorio
-    probabilidad_cancelacion += np.random.uniform(-0.15, 0.15, n_samples)
+    probabilidad_cancelacion = probabilidad_cancelacion + rng.uniform(-0.15, 0.15, n_samples)
     probabilidad_cancelacion = np.clip(probabilidad_cancelacion, 0, 1)
     
-    # Generar variable target
-    df['fue_cancelada'] = (probabilidad_cancelacion > 0.5).astype(int)
+    return (np.asarray(probabilidad_cancelacion) > 0.5).astype(int)
+
+
+def construir_payload(features, i, rng, fecha_base=None):
+    """
+    Construye un body de PredictRequestFull a partir de una fila de features
+
+    El dataset de entrenamiento puede tener más cancelaciones que compras
+    (tasa > 1); el body no: PredictRequestFull exige tasa_cancelacion_historica
+    <= 1, así que las cancelaciones se acotan a las compras y la tasa se recalcula.
+
+    Args:
+        features: dict nombre_feature -> valor (una fila)
+        i: Índice de la fila (para los IDs)
+        rng: np.random.RandomState (cliente, fecha de la venta)
+        fecha_base: datetime desde la que se generan las fechas de venta
+
+    Returns:
+        dict listo para serializar a JSON
+    """
+    fecha_base = fecha_base or datetime.utcnow()
+    categoria = int(features['destino_categoria'])
+    paquete, destino = DESTINOS[categoria][i % len(DESTINOS[categoria])]
+    cliente = int(rng.randint(0, 50000))
+    fecha_venta = fecha_base + timedelta(hours=int(rng.randint(1, 24 * 90)))
+    compras = int(features['total_compras_previas'])
+    cancelaciones = min(int(features['total_cancelaciones_previas']), compras)
+    tasa = cancelaciones / compras if compras else 0.0
+    
+    return {
+        "venta_id": f"venta_{i:09d}",
+        "cliente_id": f"cli_{cliente:06d}",
+        "email_cliente": f"cliente{cliente}@ejemplo.com",
+        "nombre_cliente": f"Cliente {cliente}",
+        "nombre_paquete": paquete,
+        "destino": destino,
+        "fecha_venta": fecha_venta.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "monto_total": round(float(features['monto_total']), 2),
+        "es_temporada_alta": int(features['es_temporada_alta']),
+        "dia_semana_reserva": int(features['dia_semana_reserva']),
+        "metodo_pago_tarjeta": int(features['metodo_pago_tarjeta']),
+        "tiene_paquete": int(features['tiene_paquete']),
+        "duracion_dias": int(features['duracion_dias']),
+        "destino_categoria": categoria,
+        "total_compras_previas": compras,
+        "total_cancelaciones_previas": cancelaciones,
+        "tasa_cancelacion_historica": round(tasa, 4),
+        "monto_promedio_compras": round(float(features['monto_promedio_compras']), 2)
+    }
+
+
+def validar_payloads(payloads):
+    """
+    Valida cada body contra PredictRequestFull (el schema de /predict)
+
+    Raises:
+        ValueError: con el venta_id y el error del primer body inválido
+    """
+    from pydantic import ValidationError
+
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if raiz not in sys.path:
+        sys.path.insert(0, raiz)
+    from app.schemas import PredictRequestFull
+
+    for payload in payloads:
+        try:
+            PredictRequestFull.model_validate(payload)
+        except ValidationError as e:
+            raise ValueError(f"Payload inválido {payload['venta_id']}: {e}") from e
+
+
+def generar_datos_sinteticos(n_samples=1000, semilla=42):
+    """
+    Genera dataset sintético con 11 features para entrenar el modelo
+    
+    Features:
+    - 7 de venta: monto_total, es_temporada_alta, dia_semana_reserva, 
+                  metodo_pago_tarjeta, tiene_paquete, duracion_dias, destino_categoria
+    - 4 de cliente: total_compras_previas, total_cancelaciones_previas,
+                    tasa_cancelacion_historica, monto_promedio_compras
+    """
+    
+    rng = np.random.RandomState(semilla)
+    
+    print(f"🔄 Generando {n_samples} registros sintéticos con 11 features...")
+    
+    # Crear DataFrame
+    df = pd.DataFrame(generar_features(n_samples, rng))
+    
+    # Generar variable target (fue_cancelada)
+    df['fue_cancelada'] = calcular_target(df, rng)
     
     return df
 
 
+def semillas_chunks(semilla, n_chunks):
+    """
+    (semilla de features, semilla de payloads) por chunk
+
+    Un solo chunk usa RandomState(semilla) para las features (mismo dataset
+    que generar_datos_sinteticos); con varios, cada chunk recibe un hijo
+    independiente de SeedSequence(semilla).
+    """
+    raiz = np.random.SeedSequence(semilla)
+    hijos = raiz.spawn(n_chunks)
+    if n_chunks == 1:
+        return [(semilla, hijos[0])]
+    return [tuple(hijo.spawn(2)) for hijo in hijos]
+
+
+def _crear_rng(semilla):
+    if isinstance(semilla, np.random.SeedSequence):
+        return np.random.RandomState(np.random.MT19937(semilla))
+    return np.random.RandomState(semilla)
+
+
+def generar_chunk(tarea):
+    """
+    Genera un chunk de filas (se ejecuta en un worker del pool)
+
+    Args:
+        tarea: dict con indice, inicio, filas, semilla_features, semilla_payloads,
+               formato, ruta_parte, fecha_base y payloads (filas con payload)
+
+    Returns:
+        dict con filas, canceladas y, según el formato, el texto CSV y las líneas JSON
+    """
+    rng = _crear_rng(tarea["semilla_features"])
+    df = pd.DataFrame(generar_features(tarea["filas"], rng))
+    df['fue_cancelada'] = calcular_target(df, rng)
+
+    resultado = {"filas": len(df), "canceladas": int(df['fue_cancelada'].sum()), "csv": None, "payloads": None}
+    if tarea["formato"] == "csv":
+        resultado["csv"] = df.to_csv(header=tarea["indice"] == 0, index=False)
+    else:
+        np.savez(tarea["ruta_parte"], **{columna: df[columna].to_numpy() for columna in df.columns})
+
+    if tarea["payloads"]:
+        rng_payloads = _crear_rng(tarea["semilla_payloads"])
+        registros = df.iloc[:tarea["payloads"]].to_dict("records")
+        payloads = [construir_payload(fila, tarea["inicio"] + i, rng_payloads, tarea["fecha_base"])
+                    for i, fila in enumerate(registros)]
+        validar_payloads(payloads)
+        resultado["payloads"] = "".join(json.dumps(payload, ensure_ascii=False) + "\n" for payload in payloads)
+    return resultado
+
+
+def generar_en_chunks(n_samples, salida, formato="csv", semilla=42, tamano_chunk=1_000_000,
+                      workers=1, ruta_payloads=None, max_payloads=None):
+    """
+    Genera n_samples filas por chunks y las escribe en orden
+
+    Args:
+        n_samples: Total de filas
+        salida: CSV de salida, o carpeta de partes .npz (una columna por arreglo)
+        formato: "csv" o "npz"
+        semilla: Semilla raíz
+        tamano_chunk: Filas por chunk
+        workers: Procesos del pool (1 = en el proceso actual)
+        ruta_payloads: JSON Lines con un body de PredictRequestFull por fila
+        max_payloads: Máximo de payloads a escribir (por defecto, todas las filas)
+
+    Returns:
+        dict con filas, canceladas y duracion_s
+    """
+    n_chunks = max(1, -(-n_samples // tamano_chunk))
+    semillas = semillas_chunks(semilla, n_chunks)
+    restantes_payloads = (n_samples if max_payloads is None else max_payloads) if ruta_payloads else 0
+    fecha_base = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if formato == "npz":
+        os.makedirs(salida, exist_ok=True)
+    elif os.path.dirname(salida):
+        os.makedirs(os.path.dirname(salida), exist_ok=True)
+
+    def tareas():
+        nonlocal restantes_payloads
+        for indice, (semilla_features, semilla_payloads) in enumerate(semillas):
+            inicio = indice * tamano_chunk
+            filas = min(tamano_chunk, n_samples - inicio)
+            payloads = min(filas, restantes_payloads)
+            restantes_payloads -= payloads
+            yield {
+                "indice": indice, "inicio": inicio, "filas": filas,
+                "semilla_features": semilla_features, "semilla_payloads": semilla_payloads,
+                "formato": formato, "fecha_base": fecha_base, "payloads": payloads,
+                "ruta_parte": os.path.join(salida, f"parte_{indice:05d}.npz") if formato == "npz" else None,
+            }
+
+    archivo = open(salida, "w", newline="", encoding="utf-8") if formato == "csv" else None
+    archivo_payloads = open(ruta_payloads, "w", encoding="utf-8") if ruta_payloads else None
+    total = {"filas": 0, "canceladas": 0}
+
+    def escribir(resultado):
+        total["filas"] += resultado["filas"]
+        total["canceladas"] += resultado["canceladas"]
+        if archivo:
+            archivo.write(resultado["csv"])
+        if archivo_payloads and resultado["payloads"]:
+            archivo_payloads.write(resultado["payloads"])
+        print(f"   {total['filas']:>12,} / {n_samples:,} filas", end="\r", flush=True)
+
+    t0 = time.perf_counter()
+    try:
+        if workers <= 1 or n_chunks == 1:
+            for tarea in tareas():
+                escribir(generar_chunk(tarea))
+        else:
+            # Como máximo 2 chunks en vuelo por worker; se escriben en orden
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                en_vuelo = deque()
+                for tarea in tareas():
+                    en_vuelo.append(pool.submit(generar_chunk, tarea))
+                    if len(en_vuelo) >= 2 * workers:
+                        escribir(en_vuelo.popleft().result())
+                while en_vuelo:
+                    escribir(en_vuelo.popleft().result())
+    finally:
+        if archivo:
+            archivo.close()
+        if archivo_payloads:
+            archivo_payloads.close()
+    print()
+
+    if formato == "npz":
+        with open(os.path.join(salida, "manifiesto.json"), "w", encoding="utf-8") as f:
+            json.dump({"filas": n_samples, "semilla": semilla, "tamano_chunk": tamano_chunk,
+                       "partes": [f"parte_{i:05d}.npz" for i in range(n_chunks)]}, f, indent=2)
+
+    total["duracion_s"] = round(time.perf_counter() - t0, 2)
+    return total
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos (11 features + fue_cancelada)")
+    parser.add_argument("--filas", type=int, default=1000)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", default=None,
+                        help="CSV (por defecto data/dataset_sintetico.csv) o carpeta de partes .npz")
+    parser.add_argument("--formato", choices=("csv", "npz"), default="csv")
+    parser.add_argument("--tamano-chunk", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--payloads", default=None,
+                        help="JSON Lines con bodies de PredictRequestFull de las mismas filas")
+    parser.add_argument("--max-payloads", type=int, default=None)
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    # Crear directorio data si no existe
-    os.makedirs("data", exist_ok=True)
+    args = _parse_args()
+    output_path = args.salida or ("data/dataset_sintetico.csv" if args.formato == "csv" else "data/dataset_sintetico_npz")
     
-    # Generar dataset
-    df = generar_datos_sinteticos(n_samples=1000)
-    
-    # Guardar a CSV
-    output_path = "data/dataset_sintetico.csv"
-    df.to_csv(output_path, index=False)
+    print(f"🔄 Generando {args.filas:,} registros sintéticos con 11 features "
+          f"({args.formato}, chunks de {args.tamano_chunk:,}, {args.workers} workers)...")
+    total = generar_en_chunks(
+        args.filas, output_path, args.formato, args.semilla, args.tamano_chunk,
+        args.workers, args.payloads, args.max_payloads
+    )
+    canceladas = total["canceladas"]
+    no_canceladas = total["filas"] - canceladas
     
     # Estadísticas
     print("\n" + "="*60)
     print("✅ Dataset generado exitosamente")
     print("="*60)
     print(f"📁 Archivo: {output_path}")
-    print(f"📊 Total registros: {len(df)}")
+    if args.payloads:
+        print(f"📁 Payloads: {args.payloads}")
+    print(f"📊 Total registros: {total['filas']}")
     print(f"📊 Features: 11")
+    print(f"⏱️  Duración: {total['duracion_s']} s ({total['filas'] / max(total['duracion_s'], 1e-9):,.0f} filas/s)")
     print(f"\n🔢 Distribución de la variable target:")
-    print(f"   - Canceladas: {df['fue_cancelada'].sum()} ({df['fue_cancelada'].mean()*100:.1f}%)")
-    print(f"   - No canceladas: {(1-df['fue_cancelada']).sum()} ({(1-df['fue_cancelada']).mean()*100:.1f}%)")
+    print(f"   - Canceladas: {canceladas} ({canceladas / max(total['filas'], 1) * 100:.1f}%)")
+    print(f"   - No canceladas: {no_canceladas} ({no_canceladas / max(total['filas'], 1) * 100:.1f}%)")
     print(f"\n📋 Features incluidas:")
     print(f"   Venta (7): monto_total, es_temporada_alta, dia_semana_reserva,")
     print(f"              metodo_pago_tarjeta, tiene_paquete, duracion_dias, destino_categoria")
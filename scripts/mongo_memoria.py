@@ -0,0 +1,195 @@
+"""
+Base de datos MongoDB en memoria para pruebas de carga en proceso
+
+Implementa el subconjunto de la API de pymongo que usa el microservicio
+(find_one, insert_one, update_one, find con sort/limit, count_documents, ...)
+para poder ejecutar la app ASGI sin MongoDB Atlas. No pretende ser un
+MongoDB completo: solo filtros por igualdad, $gt/$gte/$lt/$lte/$ne/$in/
+$exists, $and/$or y claves con punto.
+
+Uso:
+    import app.database as database
+    database.db = DBMemoria()
+"""
+
+import copy
+import threading
+
+from bson import ObjectId
+
+
+def _valor(doc: dict, clave: str):
+    actual = doc
+    for parte in clave.split("."):
+        if not isinstance(actual, dict) or parte not in actual:
+            return _FALTA
+        actual = actual[parte]
+    return actual
+
+
+_FALTA = object()
+
+_OPERADORES = {
+    "$gt": lambda v, x: v is not _FALTA and v is not None and v > x,
+    "$gte": lambda v, x: v is not _FALTA and v is not None and v >= x,
+    "$lt": lambda v, x: v is not _FALTA and v is not None and v < x,
+    "$lte": lambda v, x: v is not _FALTA and v is not None and v <= x,
+    "$ne": lambda v, x: v != x,
+    "$in": lambda v, x: v in x,
+    "$exists": lambda v, x: (v is not _FALTA) == bool(x),
+}
+
+
+def coincide(doc: dict, filtro: dict) -> bool:
+    """Evalúa un filtro de MongoDB (subconjunto) sobre un documento"""
+    for clave, condicion in filtro.items():
+        if clave == "$and":
+            if not all(coincide(doc, f) for f in condicion):
+                return False
+        elif clave == "$or":
+            if not any(coincide(doc, f) for f in condicion):
+                return False
+        else:
+            valor = _valor(doc, clave)
+            if isinstance(condicion, dict) and condicion and all(k.startswith("$") for k in condicion):
+                for op, argumento in condicion.items():
+                    if not _OPERADORES[op](valor, argumento):
+                        return False
+            elif valor is _FALTA or valor != condicion:
+                if not (valor is _FALTA and condicion is None):
+                    return False
+    return True
+
+
+def _clave_orden(campo: str):
+    def clave(doc):
+        valor = _valor(doc, campo)
+        return (valor is _FALTA, 0 if valor is _FALTA else valor)
+    return clave
+
+
+class CursorMemoria:
+    """Cursor con sort/limit/batch_size encadenables"""
+
+    def __init__(self, documentos: list):
+        self._documentos = documentos
+        self._limite = 0
+
+    def sort(self, clave, direccion=None):
+        orden = [(clave, direccion or 1)] if isinstance(clave, str) else list(clave)
+        for campo, sentido in reversed(orden):
+            self._documentos.sort(key=_clave_orden(campo), reverse=sentido == -1)
+        return self
+
+    def limit(self, n: int):
+        self._limite = n
+        return self
+
+    def batch_size(self, n: int):
+        return self
+
+    def __iter__(self):
+        documentos = self._documentos[:self._limite] if self._limite else self._documentos
+        return (copy.deepcopy(d) for d in documentos)
+
+
+class _Resultado:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class ColeccionMemoria:
+    """Colección en memoria protegida con un lock (los requests corren en threads)"""
+
+    def __init__(self, nombre: str):
+        self.name = nombre
+        self._docs = []
+        self._lock = threading.Lock()
+
+    def _buscar(self, filtro):
+        return [d for d in self._docs if coincide(d, filtro or {})]
+
+    def find_one(self, filtro=None, *args, **kwargs):
+        with self._lock:
+            encontrados = self._buscar(filtro)
+            return copy.deepcopy(encontrados[0]) if encontrados else None
+
+    def find(self, filtro=None, *args, **kwargs):
+        with self._lock:
+            return CursorMemoria(self._buscar(filtro))
+
+    def insert_one(self, documento: dict):
+        with self._lock:
+            documento.setdefault("_id", ObjectId())
+            self._docs.append(copy.deepcopy(documento))
+            return _Resultado(inserted_id=documento["_id"])
+
+    def insert_many(self, documentos, ordered=True):
+        ids = [self.insert_one(d).inserted_id for d in documentos]
+        return _Resultado(inserted_ids=ids)
+
+    def update_one(self, filtro, actualizacion, upsert=False):
+        with self._lock:
+            encontrados = self._buscar(filtro)
+            if not encontrados and not upsert:
+                return _Resultado(matched_count=0, modified_count=0, upserted_id=None)
+            if encontrados:
+                doc = encontrados[0]
+                upserted_id = None
+            else:
+                doc = {k: v for k, v in filtro.items() if not k.startswith("$") and not isinstance(v, dict)}
+                doc.setdefault("_id", ObjectId())
+                upserted_id = doc["_id"]
+                self._docs.append(doc)
+                doc.update(actualizacion.get("$setOnInsert", {}))
+            doc.update(copy.deepcopy(actualizacion.get("$set", {})))
+            for campo, n in actualizacion.get("$inc", {}).items():
+                doc[campo] = doc.get(campo, 0) + n
+            return _Resultado(matched_count=len(encontrados[:1]), modified_count=len(encontrados[:1]),
+                              upserted_id=upserted_id)
+
+    def update_many(self, filtro, actualizacion, upsert=False):
+        with self._lock:
+            encontrados = self._buscar(filtro)
+            for doc in encontrados:
+                doc.update(copy.deepcopy(actualizacion.get("$set", {})))
+            return _Resultado(matched_count=len(encontrados), modified_count=len(encontrados))
+
+    def delete_many(self, filtro):
+        with self._lock:
+            antes = len(self._docs)
+            self._docs = [d for d in self._docs if not coincide(d, filtro)]
+            return _Resultado(deleted_count=antes - len(self._docs))
+
+    def count_documents(self, filtro):
+        with self._lock:
+            return len(self._buscar(filtro))
+
+    def create_index(self, *args, **kwargs):
+        return kwargs.get("name", "indice")
+
+
+class DBMemoria:
+    """Base de datos en memoria con colecciones creadas bajo demanda"""
+
+    def __init__(self, nombre: str = "memoria"):
+        self.name = nombre
+        self._colecciones = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, nombre: str) -> ColeccionMemoria:
+        with self._lock:
+            if nombre not in self._colecciones:
+                self._colecciones[nombre] = ColeccionMemoria(nombre)
+            return self._colecciones[nombre]
+
+    def __getattr__(self, nombre: str) -> ColeccionMemoria:
+        if nombre.startswith("_"):
+            raise AttributeError(nombre)
+        return self[nombre]
+
+    def command(self, comando, *args, **kwargs):
+        return {"ok": 1.0}
+
+    def list_collection_names(self):
+        return list(self._colecciones)
@@ -0,0 +1,136 @@
+"""
+Perfil del arranque en frío del microservicio
+
+1. Imports: corre "python -X importtime -c 'import main_v4'" y lista los
+   paquetes (fastapi, pymongo, numpy...) que más tiempo suman al importar la app
+2. Time-to-ready: levanta main_v4 (uvicorn, un proceso) N veces, mide desde
+   el lanzamiento hasta el primer GET /health con status "healthy" y reporta
+   la mediana, junto con el perfil de fases que el servicio expone en /health
+
+Para comparar antes/después, correr el script en cada versión con --salida
+y comparar los JSON.
+
+Requiere MongoDB accesible con la configuración de .env (igual que el servicio).
+
+Uso:
+    python scripts/perfil_arranque.py --repeticiones 5
+    python scripts/perfil_arranque.py --top 15 --salida arranque.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def perfil_imports(top: int) -> list:
+    """Paquetes con mayor tiempo de import (ms), sumando el tiempo propio de sus módulos"""
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main_v4"],
+        cwd=RAIZ, env=dict(os.environ, LOG_LEVEL="WARNING"),
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True
+    )
+    paquetes = {}
+    for linea in proceso.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        propio, _, modulo = linea[len("import time:"):].split("|")
+        # Tiempo propio de cada módulo sumado por paquete raíz (sin contar dos veces las dependencias)
+        raiz = modulo.strip().split(".")[0]
+        paquetes[raiz] = paquetes.get(raiz, 0) + int(propio)
+
+    total = sum(paquetes.values())
+    ordenados = sorted(paquetes.items(), key=lambda p: p[1], reverse=True)[:top]
+    return [{"paquete": nombre, "ms": round(us / 1000, 1), "pct": round(us / total * 100, 1)}
+            for nombre, us in ordenados]
+
+
+def time_to_ready(puerto: int, timeout: float) -> dict:
+    """Segundos desde el lanzamiento del proceso hasta el primer /health "healthy\""""
+    url = f"http://127.0.0.1:{puerto}/health"
+    entorno = dict(os.environ, LOG_LEVEL="WARNING")
+    t0 = time.monotonic()
+    servidor = subprocess.Popen(
+        [sys.executable, "-c",
+         "import uvicorn, main_v4; "
+         f"uvicorn.run(main_v4.app, host='127.0.0.1', port={puerto}, log_config=None)"],
+        cwd=RAIZ, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.monotonic() - t0 < timeout:
+            if servidor.poll() is not None:
+                raise RuntimeError(f"El servicio terminó con código {servidor.returncode} antes de estar listo")
+            try:
+                with urllib.request.urlopen(url, timeout=2) as respuesta:
+                    cuerpo = json.loads(respuesta.read())
+                if cuerpo.get("status") == "healthy":
+                    listo = time.monotonic() - t0
+                    # Dar tiempo a la fase diferida para que el perfil quede completo
+                    time.sleep(1.0)
+                    with urllib.request.urlopen(url, timeout=2) as respuesta:
+                        fases = json.loads(respuesta.read()).get("arranque", {})
+                    return {"listo_s": round(listo, 3), "fases": fases}
+            except OSError:
+                pass
+            time.sleep(0.05)
+        raise RuntimeError(f"El servicio no respondió /health en {timeout:.0f} s")
+    finally:
+        servidor.terminate()
+        try:
+            servidor.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            servidor.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil del arranque en frío (imports y time-to-ready)")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Paquetes a listar en el perfil de imports")
+    parser.add_argument("--puerto", type=int, default=8102)
+    parser.add_argument("--timeout", type=float, default=90)
+    parser.add_argument("--salida", default=None)
+    args = parser.parse_args()
+
+    imports = perfil_imports(args.top)
+    print("📦 Tiempo de import por paquete:")
+    for p in imports:
+        print(f"   {p['paquete']:<20} {p['ms']:>8.1f} ms  ({p['pct']}%)")
+
+    corridas = []
+    for i in range(args.repeticiones):
+        corrida = time_to_ready(args.puerto, args.timeout)
+        corridas.append(corrida)
+        print(f"🚀 Corrida {i + 1}/{args.repeticiones}: listo en {corrida['listo_s']:.2f} s {corrida['fases']}")
+
+    tiempos = [c["listo_s"] for c in corridas]
+    fases = {}
+    for corrida in corridas:
+        for fase, segundos in corrida["fases"].items():
+            fases.setdefault(fase, []).append(segundos)
+
+    reporte = {
+        "imports": imports,
+        "time_to_ready": {
+            "repeticiones": args.repeticiones,
+            "mediana_s": round(statistics.median(tiempos), 3),
+            "min_s": min(tiempos),
+            "max_s": max(tiempos),
+        },
+        "fases_mediana_s": {fase: round(statistics.median(v), 3) for fase, v in fases.items()},
+    }
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Reporte guardado en: {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
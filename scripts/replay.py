@@ -0,0 +1,176 @@
+"""
+Reproduce tráfico capturado (app/services/captura.py) contra el servicio
+
+Lee los archivos captura-*.ndjson.gz de CAPTURA_DIR (también los de varios
+workers o el que se está escribiendo), los ordena por instante de llegada y
+vuelve a enviar cada body a su ruta manteniendo los tiempos relativos,
+comprimidos por --velocidad (1 = tiempo real, 10 = diez veces más rápido).
+
+El envío es de lazo abierto: cada request sale en su instante programado
+aunque los anteriores no hayan respondido, y la latencia se mide desde ese
+instante (una cola en el servidor no se oculta). Con una captura al 10%,
+reproducirla a 10x se acerca a la tasa de llegada completa de producción.
+
+Reporta por ventana de --ventana segundos (del tiempo de reproducción):
+requests, rps, p50/p95/p99, máximo y errores; y el total de cada velocidad.
+
+Uso:
+    python scripts/replay.py --capturas capturas --velocidad 1,5,10
+    python scripts/replay.py --en-proceso --velocidad 10 --ventana 5 --salida replay.json
+    python scripts/replay.py --url http://staging:8001 --desde 3600 --max-requests 20000
+"""
+
+import argparse
+import asyncio
+import glob
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_api import BASE_URL, ClienteASGI, ClienteHTTP, percentil, preparar_en_proceso
+
+
+def cargar_capturas(patron: str) -> list:
+    """[(t, ruta, body bytes)] de todos los archivos, ordenados por llegada"""
+    if os.path.isdir(patron):
+        patron = os.path.join(patron, "captura-*.ndjson.gz")
+    registros = []
+    for ruta_archivo in sorted(glob.glob(patron)):
+        try:
+            with gzip.open(ruta_archivo, "rt", encoding="utf-8") as archivo:
+                for linea in archivo:
+                    try:
+                        registro = json.loads(linea)
+                    except ValueError:
+                        continue  # última línea a medio escribir
+                    body = json.dumps(registro["body"], separators=(",", ":")).encode("utf-8")
+                    registros.append((registro["t"], registro["ruta"], body))
+        except (EOFError, OSError) as e:
+            # Archivo abierto por el servicio o truncado: se usa lo leído hasta ahí
+            print(f"⚠️  {ruta_archivo}: {e}", file=sys.stderr)
+    registros.sort(key=lambda r: r[0])
+    return registros
+
+
+def resumir_ventana(latencias: list, errores: int, duracion: float) -> dict:
+    ordenadas = sorted(latencias)
+    return {
+        "requests": len(ordenadas),
+        "rps": round(len(ordenadas) / duracion, 2) if duracion else 0.0,
+        "p50_ms": round(percentil(ordenadas, 50) * 1000, 3),
+        "p95_ms": round(percentil(ordenadas, 95) * 1000, 3),
+        "p99_ms": round(percentil(ordenadas, 99) * 1000, 3),
+        "max_ms": round(ordenadas[-1] * 1000, 3) if ordenadas else 0.0,
+        "errores": errores,
+    }
+
+
+async def reproducir(cliente, registros: list, velocidad: float, ventana: float) -> dict:
+    """Envía los registros en lazo abierto con los tiempos relativos / velocidad"""
+    t_captura0 = registros[0][0]
+    inicio = time.perf_counter()
+    # Por ventana: ([latencias], errores)
+    ventanas = {}
+    pendientes = set()
+
+    async def enviar(ruta: str, body: bytes, t_programado: float):
+        try:
+            ok = await cliente.enviar("POST", ruta, body) < 400
+        except Exception:
+            ok = False
+        latencias, errores = ventanas.setdefault(int((t_programado - inicio) // ventana), ([], [0]))
+        latencias.append(time.perf_counter() - t_programado)
+        if not ok:
+            errores[0] += 1
+
+    for t, ruta, body in registros:
+        t_programado = inicio + (t - t_captura0) / velocidad
+        espera = t_programado - time.perf_counter()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        tarea = asyncio.create_task(enviar(ruta, body, t_programado))
+        pendientes.add(tarea)
+        tarea.add_done_callback(pendientes.discard)
+
+    if pendientes:
+        await asyncio.gather(*pendientes)
+    duracion = time.perf_counter() - inicio
+
+    todas = [lat for latencias, _ in ventanas.values() for lat in latencias]
+    total = resumir_ventana(todas, sum(e[0] for _, e in ventanas.values()), duracion)
+    return {
+        "velocidad": velocidad,
+        "duracion_s": round(duracion, 3),
+        "total": total,
+        "ventanas": [
+            {"desde_s": i * ventana, **resumir_ventana(latencias, errores[0], ventana)}
+            for i, (latencias, errores) in sorted(ventanas.items())
+        ],
+    }
+
+
+async def _main(args) -> dict:
+    registros = cargar_capturas(args.capturas)
+    if not registros:
+        raise SystemExit(f"❌ No hay capturas en {args.capturas}")
+    if args.desde:
+        registros = [r for r in registros if r[0] - registros[0][0] >= args.desde]
+    if args.max_requests:
+        registros = registros[:args.max_requests]
+    duracion_captura = registros[-1][0] - registros[0][0]
+    print(f"📼 {len(registros)} requests capturados en {duracion_captura:.1f} s")
+
+    if args.en_proceso:
+        cliente = ClienteASGI(preparar_en_proceso())
+        destino = "en-proceso"
+    else:
+        cliente = ClienteHTTP(args.url, args.max_conexiones)
+        destino = args.url
+
+    resultados = []
+    for velocidad in (float(v) for v in args.velocidad.split(",")):
+        print(f"▶️  Reproduciendo a {velocidad:g}x (~{duracion_captura / velocidad:.1f} s)")
+        resultado = await reproducir(cliente, registros, velocidad, args.ventana)
+        t = resultado["total"]
+        print(f"   {t['rps']} rps, p50 {t['p50_ms']} ms, p99 {t['p99_ms']} ms, {t['errores']} errores")
+        resultados.append(resultado)
+    await cliente.cerrar()
+
+    return {
+        "destino": destino,
+        "capturas": args.capturas,
+        "requests": len(registros),
+        "duracion_captura_s": round(duracion_captura, 3),
+        "ventana_s": args.ventana,
+        "resultados": resultados,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay de tráfico capturado con tiempos relativos")
+    parser.add_argument("--capturas", default=os.getenv("CAPTURA_DIR", "capturas"),
+                        help="Directorio de capturas o patrón glob de archivos .ndjson.gz")
+    parser.add_argument("--url", default=BASE_URL, help="URL del servicio")
+    parser.add_argument("--en-proceso", action="store_true", help="Usar la app ASGI en este proceso (MongoDB en memoria)")
+    parser.add_argument("--velocidad", default="1", help="Factores de aceleración separados por coma (p. ej. 1,5,10)")
+    parser.add_argument("--ventana", type=float, default=10.0, help="Segundos por ventana del reporte")
+    parser.add_argument("--desde", type=float, default=0.0, help="Saltar los primeros N segundos de la captura")
+    parser.add_argument("--max-requests", type=int, default=0, help="Máximo de requests a reproducir (0 = todos)")
+    parser.add_argument("--max-conexiones", type=int, default=64, help="Conexiones HTTP simultáneas")
+    parser.add_argument("--salida", default=None)
+    args = parser.parse_args()
+
+    reporte = asyncio.run(_main(args))
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Reporte guardado en: {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Puntuación masiva offline (fuera del servicio HTTP) con un pool de procesos
+
+Lee la entrada por chunks (CSV o resultado de una consulta MongoDB), reparte
+los chunks entre procesos que cargan app/ml/modelo.pkl una sola vez (en el
+initializer del pool) y escribe un CSV con venta_id, probabilidad y
+recomendación. Opcionalmente inserta en bloque las filas de alto riesgo en
+predicciones_cancelacion con el mismo documento que
+PrediccionService.guardar_prediccion (sin duplicar venta_id).
+
+Cada worker usa n_jobs=1 en el modelo: un proceso por núcleo escala mejor
+que los hilos de joblib compitiendo dentro de cada proceso.
+
+Uso:
+    python scripts/score_batch.py --csv data/dataset_sintetico.csv --salida puntuaciones.csv
+    python scripts/score_batch.py --mongo-coleccion ventas --mongo-filtro '{"estado": "pendiente"}' --guardar-mongo
+    python scripts/score_batch.py --csv grande.csv --escalado 1,2,4,8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from app.schemas import PredictRequestFull
+from app.services.lote_service import filas_validas
+from app.services.predictor import FEATURE_NAMES, RECOMENDACIONES, PredictorService
+
+MODELO_POR_DEFECTO = os.path.join(RAIZ, "app", "ml", "modelo.pkl")
+
+# Features declaradas como int en PredictRequestFull (se guardan como enteros en MongoDB)
+COLUMNAS_ENTERAS = {n for n in FEATURE_NAMES if PredictRequestFull.model_fields[n].annotation is int}
+
+# Campos del cliente/venta que se copian al documento de MongoDB si vienen en la entrada
+CAMPOS_DOCUMENTO = ("venta_id", "cliente_id", "email_cliente", "nombre_cliente",
+                    "nombre_paquete", "destino", "fecha_venta")
+
+_predictor = None
+
+
+def _inicializar_worker(modelo_path: str):
+    """Carga el modelo una vez por proceso"""
+    global _predictor
+    _predictor = PredictorService(modelo_path=modelo_path, modo_decision=False)
+    _predictor.modelo.n_jobs = 1
+
+
+def _puntuar_chunk(X: np.ndarray):
+    """(probabilidades, máscara de filas válidas) de un chunk; NaN en las inválidas"""
+    validas = filas_validas(X)
+    probabilidades = np.full(len(X), np.nan)
+    if validas.any():
+        probabilidades[validas] = _predictor.predecir_lote(X[validas])
+    return probabilidades, validas
+
+
+def leer_csv(ruta: str, tamano_chunk: int):
+    """Chunks (DataFrame) de un CSV con la cabecera de data/dataset_sintetico.csv"""
+    fila = 0
+    for df in pd.read_csv(ruta, chunksize=tamano_chunk, dtype={"venta_id": str, "cliente_id": str}):
+        if "venta_id" not in df.columns:
+            df["venta_id"] = np.arange(fila, fila + len(df)).astype(str)
+        fila += len(df)
+        yield df
+
+
+def leer_mongo(coleccion: str, filtro: dict, tamano_chunk: int):
+    """Chunks (DataFrame) del resultado de una consulta MongoDB"""
+    from app.database import get_db
+
+    proyeccion = {c: 1 for c in FEATURE_NAMES + CAMPOS_DOCUMENTO}
+    proyeccion["_id"] = 0
+    cursor = get_db()[coleccion].find(filtro, proyeccion).batch_size(tamano_chunk)
+    docs = []
+    for doc in cursor:
+        docs.append(doc)
+        if len(docs) == tamano_chunk:
+            yield pd.DataFrame(docs)
+            docs = []
+    if docs:
+        yield pd.DataFrame(docs)
+
+
+def matriz_features(df: pd.DataFrame) -> np.ndarray:
+    """Matriz (n, 11) float64 en el orden del modelo (valores no numéricos -> NaN)"""
+    X = np.empty((len(df), len(FEATURE_NAMES)), dtype=np.float64)
+    for j, nombre in enumerate(FEATURE_NAMES):
+        if nombre in df.columns:
+            X[:, j] = pd.to_numeric(df[nombre], errors="coerce")
+        else:
+            X[:, j] = np.nan
+    return X
+
+
+def documentos_alto_riesgo(df: pd.DataFrame, X: np.ndarray, probabilidades: np.ndarray, umbral: float) -> list:
+    """Documentos de predicciones_cancelacion para las filas con probabilidad >= umbral"""
+    from app.services.prediccion_service import PrediccionService
+
+    recomendaciones = PredictorService.recomendaciones_lote(probabilidades)
+    documentos = []
+    for i in np.flatnonzero(probabilidades >= umbral):
+        features = {
+            nombre: int(valor) if nombre in COLUMNAS_ENTERAS else valor
+            for nombre, valor in zip(FEATURE_NAMES, X[i].tolist())
+        }
+        data = dict(features)
+        for campo in CAMPOS_DOCUMENTO:
+            if campo in df.columns:
+                valor = df[campo].iat[i]
+                data[campo] = None if pd.isna(valor) else valor
+        if data.get("fecha_venta") is not None:
+            data["fecha_venta"] = pd.to_datetime(data["fecha_venta"], errors="coerce").to_pydatetime()
+        data.setdefault("cliente_id", None)
+        resultado = {
+            "probabilidad_cancelacion": round(float(probabilidades[i]), 4),
+            "recomendacion": RECOMENDACIONES[recomendaciones[i]],
+            "factores_riesgo": PredictorService._identificar_factores_riesgo(features)
+        }
+        documentos.append(PrediccionService.construir_documento(data, resultado))
+    return documentos
+
+
+def escribir_resultados(archivo, df: pd.DataFrame, probabilidades: np.ndarray, validas: np.ndarray):
+    recomendaciones = np.array(RECOMENDACIONES)[PredictorService.recomendaciones_lote(probabilidades)]
+    salida = pd.DataFrame({
+        "venta_id": df["venta_id"].to_numpy(),
+        "probabilidad": np.round(probabilidades, 4),
+        "recomendacion": np.where(validas, recomendaciones, ""),
+        "error": np.where(validas, "", "valores fuera de rango")
+    })
+    salida.to_csv(archivo, header=archivo.tell() == 0, index=False)
+
+
+def puntuar(chunks, workers: int, modelo_path: str, salida: str = None,
+            guardar_mongo: bool = False, umbral: float = 0.70) -> dict:
+    """
+    Puntúa todos los chunks con un pool de 'workers' procesos
+
+    Mantiene como máximo 2 chunks en vuelo por worker (memoria acotada) y
+    escribe los resultados en el orden de la entrada.
+    """
+    from app.services.prediccion_service import PrediccionService
+
+    filas = invalidas = alto_riesgo = insertadas = 0
+    archivo = open(salida, "w", newline="", encoding="utf-8") if salida else None
+    t0 = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker,
+                             initargs=(modelo_path,)) as pool:
+        # Esperar a que todos los workers carguen el modelo antes de medir
+        list(pool.map(_puntuar_chunk, [np.zeros((0, len(FEATURE_NAMES)))] * workers))
+        t0 = time.perf_counter()
+
+        en_vuelo = deque()
+
+        def procesar(df, X, futuro):
+            nonlocal filas, invalidas, alto_riesgo, insertadas
+            probabilidades, validas = futuro.result()
+            filas += len(X)
+            invalidas += int((~validas).sum())
+            alto_riesgo += int((probabilidades >= umbral).sum())
+            if archivo:
+                escribir_resultados(archivo, df, probabilidades, validas)
+            if guardar_mongo:
+                insertadas += PrediccionService.guardar_lote(
+                    documentos_alto_riesgo(df, X, probabilidades, umbral)
+                )
+
+        for df in chunks:
+            X = matriz_features(df)
+            en_vuelo.append((df, X, pool.submit(_puntuar_chunk, X)))
+            if len(en_vuelo) >= 2 * workers:
+                procesar(*en_vuelo.popleft())
+        while en_vuelo:
+            procesar(*en_vuelo.popleft())
+
+    duracion = time.perf_counter() - t0
+    if archivo:
+        archivo.close()
+
+    return {
+        "workers": workers,
+        "filas": filas,
+        "filas_invalidas": invalidas,
+        "alto_riesgo": alto_riesgo,
+        "insertadas_mongo": insertadas if guardar_mongo else None,
+        "duracion_s": round(duracion, 3),
+        "filas_por_segundo": round(filas / duracion, 1) if duracion else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Puntuación masiva offline con pool de procesos")
+    origen = parser.add_mutually_exclusive_group(required=True)
+    origen.add_argument("--csv", help="CSV con la cabecera de data/dataset_sintetico.csv")
+    origen.add_argument("--mongo-coleccion", help="Colección MongoDB con las 11 features por documento")
+    parser.add_argument("--mongo-filtro", default="{}", help="Filtro JSON para la consulta MongoDB")
+    parser.add_argument("--salida", default=None, help="CSV de resultados")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--tamano-chunk", type=int, default=50000)
+    parser.add_argument("--modelo", default=MODELO_POR_DEFECTO)
+    parser.add_argument("--guardar-mongo", action="store_true",
+                        help="Insertar las filas de alto riesgo en predicciones_cancelacion")
+    parser.add_argument("--escalado", default=None,
+                        help="Medir filas/s con varios números de workers (ej. 1,2,4,8); requiere --csv")
+    args = parser.parse_args()
+
+    from app.services.prediccion_service import UMBRAL_RIESGO
+
+    def leer():
+        if args.csv:
+            return leer_csv(args.csv, args.tamano_chunk)
+        return leer_mongo(args.mongo_coleccion, json.loads(args.mongo_filtro), args.tamano_chunk)
+
+    if args.escalado:
+        if not args.csv:
+            parser.error("--escalado requiere --csv (la entrada se lee una vez por medición)")
+        mediciones = [puntuar(leer(), int(n), args.modelo) for n in args.escalado.split(",")]
+        base = mediciones[0]["filas_por_segundo"] / mediciones[0]["workers"]
+        for m in mediciones:
+            m["aceleracion"] = round(m["filas_por_segundo"] / mediciones[0]["filas_por_segundo"], 2)
+            m["eficiencia"] = round(m["filas_por_segundo"] / (base * m["workers"]), 2) if base else 0.0
+        print(json.dumps({"cpu_count": os.cpu_count(), "escalado": mediciones}, indent=2))
+        return
+
+    reporte = puntuar(leer(), args.workers, args.modelo, args.salida, args.guardar_mongo, UMBRAL_RIESGO)
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    if args.salida:
+        print(f"\n💾 Resultados guardados en: {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Servidor SMTP local (sink) para pruebas de carga del envío de recordatorios
+
+Acepta EHLO, STARTTLS, AUTH (PLAIN/LOGIN), MAIL, RCPT y DATA como lo haría
+Gmail, pero descarta los mensajes y solo los cuenta. Permite inyectar latencia
+y fallos para ver cómo se comporta EmailService ante un servidor lento o
+inestable.
+
+Uso standalone:
+    python scripts/smtp_sink.py --puerto 2525 --latencia-ms 20 --tasa-fallo 0.05
+
+Uso embebido (ver scripts/bench_email.py):
+    sink = SMTPSink(puerto=0)
+    await sink.iniciar()
+    ...
+    await sink.detener()
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import random
+import ssl
+import subprocess
+import tempfile
+import time
+
+MAX_TAMANO_MENSAJE = 10 * 1024 * 1024
+
+
+def generar_certificado_autofirmado(directorio: str):
+    """
+    Genera un certificado autofirmado para 'localhost' con openssl
+
+    Returns:
+        (ruta_certificado, ruta_clave)
+    """
+    certfile = os.path.join(directorio, "sink_cert.pem")
+    keyfile = os.path.join(directorio, "sink_key.pem")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", keyfile, "-out", certfile,
+            "-days", "1", "-subj", "/CN=localhost"
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    return certfile, keyfile
+
+
+class SMTPSink:
+    """Servidor SMTP mínimo que cuenta mensajes recibidos"""
+
+    def __init__(self, host="127.0.0.1", puerto=2525, latencia_ms=0.0, tasa_fallo=0.0,
+                 usuario=None, password=None, certfile=None, keyfile=None, semilla=None):
+        self.host = host
+        self.puerto = puerto
+        self.latencia_ms = latencia_ms
+        self.tasa_fallo = tasa_fallo
+        self.usuario = usuario
+        self.password = password
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self._random = random.Random(semilla)
+        self._server = None
+        self._tmpdir = None
+
+        # Contadores
+        self.conexiones = 0
+        self.autenticaciones = 0
+        self.mensajes_recibidos = 0
+        self.mensajes_rechazados = 0
+        self.bytes_recibidos = 0
+        self.tiempos_recepcion = []
+
+    async def iniciar(self):
+        """Arranca el servidor; si puerto=0 se asigna uno libre"""
+        if not self.certfile:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix="smtp_sink_")
+            self.certfile, self.keyfile = generar_certificado_autofirmado(self._tmpdir.name)
+
+        self._ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        self._ssl_context.load_cert_chain(self.certfile, self.keyfile)
+
+        self._server = await asyncio.start_server(self._atender, self.host, self.puerto)
+        self.puerto = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def detener(self):
+        """Detiene el servidor y limpia el certificado temporal"""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._tmpdir:
+            self._tmpdir.cleanup()
+            self._tmpdir = None
+
+    def estadisticas(self) -> dict:
+        """Contadores actuales del sink"""
+        return {
+            "conexiones": self.conexiones,
+            "autenticaciones": self.autenticaciones,
+            "mensajes_recibidos": self.mensajes_recibidos,
+            "mensajes_rechazados": self.mensajes_rechazados,
+            "bytes_recibidos": self.bytes_recibidos
+        }
+
+    def _credenciales_validas(self, usuario: str, password: str) -> bool:
+        if self.usuario is None:
+            return True
+        return usuario == self.usuario and password == self.password
+
+    async def _atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Sesión SMTP de un cliente"""
+        self.conexiones += 1
+        tls_activo = False
+
+        async def responder(linea: str):
+            writer.write(linea.encode("ascii") + b"\r\n")
+            await writer.drain()
+
+        try:
+            await responder("220 localhost ESMTP smtp_sink")
+
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+
+                linea = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                comando, _, argumento = linea.partition(" ")
+                comando = comando.upper()
+
+                if comando in ("EHLO", "HELO"):
+                    extensiones = ["localhost", "8BITMIME", "SMTPUTF8", f"SIZE {MAX_TAMANO_MENSAJE}"]
+                    if not tls_activo:
+                        extensiones.append("STARTTLS")
+                    extensiones.append("AUTH PLAIN LOGIN")
+                    for ext in extensiones[:-1]:
+                        await responder(f"250-{ext}")
+                    await responder(f"250 {extensiones[-1]}")
+
+                elif comando == "STARTTLS":
+                    await responder("220 Ready to start TLS")
+                    await writer.start_tls(self._ssl_context)
+                    tls_activo = True
+
+                elif comando == "AUTH":
+                    await self._autenticar(argumento, reader, responder)
+
+                elif comando in ("MAIL", "RCPT", "RSET", "NOOP"):
+                    await responder("250 OK")
+
+                elif comando == "DATA":
+                    await responder("354 End data with <CR><LF>.<CR><LF>")
+                    tamano = 0
+                    while True:
+                        chunk = await reader.readline()
+                        if not chunk or chunk == b".\r\n":
+                            break
+                        tamano += len(chunk)
+                    self.bytes_recibidos += tamano
+
+                    if self.latencia_ms > 0:
+                        await asyncio.sleep(self.latencia_ms / 1000)
+
+                    if self.tasa_fallo > 0 and self._random.random() < self.tasa_fallo:
+                        self.mensajes_rechazados += 1
+                        await responder("451 4.3.0 Fallo inyectado por smtp_sink")
+                    else:
+                        self.mensajes_recibidos += 1
+                        self.tiempos_recepcion.append(time.perf_counter())
+                        await responder("250 2.0.0 OK: queued")
+
+                elif comando == "QUIT":
+                    await responder("221 Bye")
+                    break
+
+                else:
+                    await responder("502 5.5.2 Command not implemented")
+
+        except (ConnectionError, ssl.SSLError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (Exception, asyncio.CancelledError):
+                pass
+
+    async def _autenticar(self, argumento: str, reader: asyncio.StreamReader, responder):
+        """AUTH PLAIN (con o sin respuesta inicial) y AUTH LOGIN"""
+        mecanismo, _, inicial = argumento.partition(" ")
+        mecanismo = mecanismo.upper()
+
+        async def leer_b64() -> str:
+            raw = await reader.readline()
+            return base64.b64decode(raw.strip()).decode("utf-8", errors="replace")
+
+        if mecanismo == "PLAIN":
+            if inicial:
+                datos = base64.b64decode(inicial).decode("utf-8", errors="replace")
+            else:
+                await responder("334 ")
+                datos = await leer_b64()
+            _, usuario, password = (datos.split("\0") + ["", ""])[:3]
+        elif mecanismo == "LOGIN":
+            await responder("334 VXNlcm5hbWU6")
+            usuario = await leer_b64()
+            await responder("334 UGFzc3dvcmQ6")
+            password = await leer_b64()
+        else:
+            await responder("504 5.5.4 Unrecognized authentication type")
+            return
+
+        if self._credenciales_validas(usuario, password):
+            self.autenticaciones += 1
+            await responder("235 2.7.0 Authentication successful")
+        else:
+            await responder("535 5.7.8 Authentication credentials invalid")
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Servidor SMTP local para pruebas de carga")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=2525)
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="Latencia inyectada al final de DATA")
+    parser.add_argument("--tasa-fallo", type=float, default=0.0, help="Probabilidad (0-1) de responder 451")
+    parser.add_argument("--usuario", default=None, help="Si se indica, solo acepta estas credenciales")
+    parser.add_argument("--password", default=None)
+    parser.add_argument("--certfile", default=None, help="Certificado TLS (por defecto autofirmado)")
+    parser.add_argument("--keyfile", default=None)
+    return parser.parse_args()
+
+
+async def _main(args):
+    sink = SMTPSink(
+        host=args.host, puerto=args.puerto, latencia_ms=args.latencia_ms,
+        tasa_fallo=args.tasa_fallo, usuario=args.usuario, password=args.password,
+        certfile=args.certfile, keyfile=args.keyfile
+    )
+    await sink.iniciar()
+    print(f"📭 smtp_sink escuchando en {sink.host}:{sink.puerto} (STARTTLS + AUTH)")
+    print(f"   Latencia: {args.latencia_ms} ms | Tasa de fallo: {args.tasa_fallo*100:.1f}%")
+    print("   Configura: EMAIL_MODE=real SMTP_HOST=127.0.0.1 "
+          f"SMTP_PORT={sink.puerto} SMTP_USER=x SMTP_PASSWORD=x SMTP_VALIDATE_CERTS=false")
+
+    try:
+        while True:
+            await asyncio.sleep(5)
+            print(f"📊 {sink.estadisticas()}")
+    finally:
+        await sink.detener()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        print("\n👋 smtp_sink detenido")
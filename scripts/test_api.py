@@ -1,189 +1,362 @@
 """
-Script para probar el endpoint /predict del microservicio
+Generador de carga para el microservicio de predicción
 
-VERSIÓN FINAL: Solo 11 features reales disponibles en MongoDB
-edad_cliente ELIMINADA: fechaNacimiento es OPCIONAL en MongoDB
-Este script simula una llamada desde Spring Boot al microservicio de IA
+Construye mezclas realistas de requests reutilizando las distribuciones de
+scripts/generar_datos_sinteticos.py y mide throughput y latencias de cola.
+
+Modos de carga:
+- cerrado: N clientes concurrentes, cada uno envía el siguiente request al
+           recibir la respuesta anterior (mide capacidad máxima)
+- abierto: llegadas a tasa fija (o Poisson) sin esperar respuestas; la
+           latencia se mide desde el instante programado, así una cola en el
+           servidor no se oculta (coordinated omission)
+
+Destinos:
+- --url http://host:8001  servicio en ejecución
+- --en-proceso            la app ASGI de main_v4.py dentro de este proceso,
+                          con una base MongoDB en memoria (scripts/mongo_memoria.py)
+
+Salida: JSON con RPS, p50/p95/p99 y tasa de errores por endpoint.
+
+Uso:
+    python scripts/test_api.py --modo cerrado --concurrencia 16 --duracion 30
+    python scripts/test_api.py --en-proceso --modo abierto --tasa 200 --duracion 20
+    python scripts/test_api.py --mezcla predict=0.9,health=0.05,estadisticas=0.05 --salida carga.json
 """
 
-import requests
+import argparse
+import asyncio
 import json
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from generar_datos_sinteticos import generar_features, construir_payload
 
 # URL del microservicio
 BASE_URL = "http://localhost:8001"
 
+# Endpoints disponibles en las mezclas: nombre -> (método, ruta)
+ENDPOINTS = {
+    "predict": ("POST", "/predict"),
+    "health": ("GET", "/health"),
+    "estadisticas": ("GET", "/recordatorios/estadisticas"),
+    "metrics": ("GET", "/metrics"),
+}
 
-def test_health():
-    """Prueba el endpoint /health"""
-    print("\n" + "="*60)
-    print("🏥 PROBANDO ENDPOINT /health")
-    print("="*60)
-    
-    response = requests.get(f"{BASE_URL}/health")
-    
-    print(f"Status Code: {response.status_code}")
-    print(f"Response:")
-    print(json.dumps(response.json(), indent=2))
-    
-    return response.status_code == 200
-
-
-def test_predict_alto_riesgo():
-    """Prueba con un caso de ALTO riesgo de cancelación"""
-    print("\n" + "="*60)
-    print("🔴 CASO 1: ALTO RIESGO DE CANCELACIÓN")
-    print("="*60)
-    
-    # Cliente nuevo, sin pago confirmado, monto alto (11 features - SIN edad_cliente)
-    data = {
-        "venta_id": "venta_test_001",
-        "cliente_id": "cli_test_001",
-        # Features de venta (7)
-        "monto_total": 2800.0,  # Monto alto
-        "es_temporada_alta": 1,
-        "dia_semana_reserva": 2,
-        "metodo_pago_tarjeta": 0,  # Sin pago confirmado
-        "tiene_paquete": 1,
-        "duracion_dias": 12,  # Viaje largo
-        "destino_categoria": 0,
-        # Features de cliente (4) - SIN edad_cliente
-        "total_compras_previas": 0,  # Cliente nuevo
-        "total_cancelaciones_previas": 0,
-        "tasa_cancelacion_historica": 0.0,
-        "monto_promedio_compras": 0.0
-    }
-    
-    response = requests.post(f"{BASE_URL}/predict", json=data)
-    
-    print(f"Status Code: {response.status_code}")
-    print(f"Response:")
-    result = response.json()
-    print(json.dumps(result, indent=2, ensure_ascii=False))
-    
-    print(f"\n💡 INTERPRETACIÓN:")
-    print(f"   Probabilidad: {result['probabilidad_cancelacion']*100:.1f}%")
-    print(f"   Recomendación: {result['recomendacion']}")
-    print(f"   Factores de riesgo: {len(result['factores_riesgo'])}")
-    
-    return response.status_code == 200
-
-
-def test_predict_bajo_riesgo():
-    """Prueba con un caso de BAJO riesgo de cancelación"""
-    print("\n" + "="*60)
-    print("🟢 CASO 2: BAJO RIESGO DE CANCELACIÓN")
-    print("="*60)
-    
-    # Cliente frecuente, con pago confirmado (11 features - SIN edad_cliente)
-    data = {
-        "venta_id": "venta_test_002",
-        "cliente_id": "cli_test_002",
-        # Features de venta (7)
-        "monto_total": 1200.0,  # Monto razonable
-        "es_temporada_alta": 0,
-        "dia_semana_reserva": 3,
-        "metodo_pago_tarjeta": 1,  # Pagó con tarjeta
-        "tiene_paquete": 1,
-        "duracion_dias": 5,
-        "destino_categoria": 1,
-        # Features de cliente (4) - SIN edad_cliente
-        "total_compras_previas": 8,  # Cliente frecuente
-        "total_cancelaciones_previas": 0,  # Sin cancelaciones
-        "tasa_cancelacion_historica": 0.0,
-        "monto_promedio_compras": 1100.0
-    }
-    
-    response = requests.post(f"{BASE_URL}/predict", json=data)
-    
-    print(f"Status Code: {response.status_code}")
-    print(f"Response:")
-    result = response.json()
-    print(json.dumps(result, indent=2, ensure_ascii=False))
-    
-    print(f"\n💡 INTERPRETACIÓN:")
-    print(f"   Probabilidad: {result['probabilidad_cancelacion']*100:.1f}%")
-    print(f"   Recomendación: {result['recomendacion']}")
-    print(f"   Factores de riesgo: {len(result['factores_riesgo'])}")
-    
-    return response.status_code == 200
-
-
-def test_predict_riesgo_medio():
-    """Prueba con un caso de RIESGO MEDIO de cancelación"""
-    print("\n" + "="*60)
-    print("🟡 CASO 3: RIESGO MEDIO DE CANCELACIÓN")
-    print("="*60)
-    
-    # Cliente con historial mixto (11 features - SIN edad_cliente)
-    data = {
-        "venta_id": "venta_test_003",
-        "cliente_id": "cli_test_003",
-        # Features de venta (7)
-        "monto_total": 1800.0,
-        "es_temporada_alta": 1,
-        "dia_semana_reserva": 5,
-        "metodo_pago_tarjeta": 1,
-        "tiene_paquete": 1,
-        "duracion_dias": 7,
-        "destino_categoria": 1,
-        # Features de cliente (4) - SIN edad_cliente
-        "total_compras_previas": 4,
-        "total_cancelaciones_previas": 2,  # Historial de cancelaciones
-        "tasa_cancelacion_historica": 0.5,
-        "monto_promedio_compras": 1500.0
+
+def percentil(valores, p):
+    """Percentil por rango más cercano (valores ya ordenados)"""
+    if not valores:
+        return 0.0
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+def parsear_mezcla(texto: str) -> dict:
+    """'predict=0.9,health=0.1' -> {'predict': 0.9, 'health': 0.1} normalizado"""
+    mezcla = {}
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition("=")
+        nombre = nombre.strip()
+        if nombre not in ENDPOINTS:
+            raise ValueError(f"Endpoint desconocido en la mezcla: {nombre}")
+        mezcla[nombre] = float(peso or 1)
+    total = sum(mezcla.values())
+    return {k: v / total for k, v in mezcla.items()}
+
+
+class GeneradorRequests:
+    """Secuencia reproducible de requests según la mezcla de endpoints"""
+
+    def __init__(self, mezcla: dict, semilla: int = 42, tamano_pool: int = 5000):
+        self.rng = np.random.RandomState(semilla)
+        self.nombres = list(mezcla)
+        self.pesos = [mezcla[n] for n in self.nombres]
+
+        # Pool de payloads pre-serializados con las distribuciones del dataset sintético
+        features = generar_features(tamano_pool, self.rng)
+        self.payloads = [
+            json.dumps(construir_payload({k: v[i] for k, v in features.items()}, i, self.rng)).encode("utf-8")
+            for i in range(tamano_pool)
+        ]
+        self._i = 0
+        self._lock = threading.Lock()
+
+    def siguiente(self):
+        """(nombre_endpoint, método, ruta, body)"""
+        with self._lock:
+            nombre = self.nombres[self.rng.choice(len(self.nombres), p=self.pesos)]
+            self._i += 1
+            i = self._i
+        metodo, ruta = ENDPOINTS[nombre]
+        body = self.payloads[i % len(self.payloads)] if metodo == "POST" else None
+        return nombre, metodo, ruta, body
+
+
+class ClienteASGI:
+    """Envía requests directamente a una app ASGI (sin red)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def enviar(self, metodo: str, ruta: str, body: bytes = None) -> int:
+        body = body or b""
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": metodo,
+            "scheme": "http",
+            "path": ruta,
+            "raw_path": ruta.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", b"carga"),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+            "client": ("127.0.0.1", 50000),
+            "server": ("carga", 80),
+        }
+        recibido = False
+        terminado = asyncio.Event()
+        estado = {"status": 500}
+
+        async def receive():
+            nonlocal recibido
+            if not recibido:
+                recibido = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await terminado.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                estado["status"] = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                terminado.set()
+
+        await self.app(scope, receive, send)
+        terminado.set()
+        return estado["status"]
+
+    async def cerrar(self):
+        pass
+
+
+class ClienteHTTP:
+    """Envía requests a un servicio real con requests.Session (una por hilo, keep-alive)"""
+
+    def __init__(self, base_url: str, max_conexiones: int):
+        import requests
+        self._requests = requests
+        self.base_url = base_url.rstrip("/")
+        self._pool = ThreadPoolExecutor(max_workers=max_conexiones)
+        self._local = threading.local()
+
+    def _sesion(self):
+        sesion = getattr(self._local, "sesion", None)
+        if sesion is None:
+            sesion = self._local.sesion = self._requests.Session()
+        return sesion
+
+    def _enviar_sync(self, metodo, ruta, body):
+        respuesta = self._sesion().request(
+            metodo, self.base_url + ruta, data=body,
+            headers={"Content-Type": "application/json"}, timeout=30
+        )
+        return respuesta.status_code
+
+    async def enviar(self, metodo: str, ruta: str, body: bytes = None) -> int:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, self._enviar_sync, metodo, ruta, body)
+
+    async def cerrar(self):
+        self._pool.shutdown(wait=False)
+
+
+class Resultados:
+    """Latencias y errores por endpoint"""
+
+    def __init__(self):
+        self.latencias = {}
+        self.errores = {}
+
+    def registrar(self, nombre: str, latencia: float, ok: bool):
+        self.latencias.setdefault(nombre, []).append(latencia)
+        if not ok:
+            self.errores[nombre] = self.errores.get(nombre, 0) + 1
+
+    def resumen(self, duracion: float) -> dict:
+        resumen = {}
+        for nombre, latencias in self.latencias.items():
+            ordenadas = sorted(latencias)
+            errores = self.errores.get(nombre, 0)
+            resumen[nombre] = {
+                "requests": len(ordenadas),
+                "rps": round(len(ordenadas) / duracion, 2) if duracion else 0.0,
+                "p50_ms": round(percentil(ordenadas, 50) * 1000, 3),
+                "p95_ms": round(percentil(ordenadas, 95) * 1000, 3),
+                "p99_ms": round(percentil(ordenadas, 99) * 1000, 3),
+                "max_ms": round(ordenadas[-1] * 1000, 3),
+                "errores": errores,
+                "tasa_error": round(errores / len(ordenadas), 4)
+            }
+        return resumen
+
+
+async def ejecutar_uno(cliente, generador: GeneradorRequests, resultados: Resultados, t_programado: float = None):
+    """Envía un request; la latencia se cuenta desde t_programado si se indica"""
+    nombre, metodo, ruta, body = generador.siguiente()
+    t0 = t_programado if t_programado is not None else time.perf_counter()
+    try:
+        status = await cliente.enviar(metodo, ruta, body)
+        ok = status < 400
+    except Exception:
+        ok = False
+    resultados.registrar(nombre, time.perf_counter() - t0, ok)
+
+
+async def carga_cerrada(cliente, generador, resultados, concurrencia: int, duracion: float, max_requests: int):
+    """N clientes en bucle hasta agotar la duración o el número de requests"""
+    fin = time.perf_counter() + duracion
+    enviados = 0
+
+    async def trabajador():
+        nonlocal enviados
+        while time.perf_counter() < fin and (not max_requests or enviados < max_requests):
+            enviados += 1
+            await ejecutar_uno(cliente, generador, resultados)
+
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+
+
+async def carga_abierta(cliente, generador, resultados, tasa: float, duracion: float, poisson: bool, semilla: int):
+    """Llegadas a tasa fija (o exponenciales) durante 'duracion' segundos"""
+    rng = np.random.RandomState(semilla + 1)
+    inicio = time.perf_counter()
+    t_siguiente = inicio
+    pendientes = set()
+
+    while t_siguiente < inicio + duracion:
+        espera = t_siguiente - time.perf_counter()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        tarea = asyncio.create_task(ejecutar_uno(cliente, generador, resultados, t_programado=t_siguiente))
+        pendientes.add(tarea)
+        tarea.add_done_callback(pendientes.discard)
+        t_siguiente += rng.exponential(1 / tasa) if poisson else 1 / tasa
+
+    if pendientes:
+        await asyncio.gather(*pendientes)
+
+
+def preparar_en_proceso():
+    """Importa main_v4 con MongoDB en memoria y devuelve la app ASGI"""
+    from mongo_memoria import DBMemoria
+    import app.database as database
+
+    os.chdir(RAIZ)  # el modelo se carga con ruta relativa (app/ml/modelo.pkl)
+    database.db = DBMemoria("agencia_viajes")
+
+    import main_v4
+    from app.services.predictor import get_predictor
+    get_predictor()  # cargar el modelo antes de medir
+    return main_v4.app
+
+
+async def _main(args) -> dict:
+    mezcla = parsear_mezcla(args.mezcla)
+    generador = GeneradorRequests(mezcla, semilla=args.semilla)
+
+    if args.en_proceso:
+        cliente = ClienteASGI(preparar_en_proceso())
+        destino = "en-proceso"
+    else:
+        max_conexiones = args.concurrencia if args.modo == "cerrado" else args.max_conexiones
+        cliente = ClienteHTTP(args.url, max_conexiones)
+        destino = args.url
+
+    # Calentamiento (no se mide)
+    if args.calentamiento > 0:
+        descartar = Resultados()
+        await carga_cerrada(cliente, generador, descartar, min(args.concurrencia, 4), args.calentamiento, 0)
+
+    resultados = Resultados()
+    t0 = time.perf_counter()
+    if args.modo == "cerrado":
+        await carga_cerrada(cliente, generador, resultados, args.concurrencia, args.duracion, args.requests)
+    else:
+        await carga_abierta(cliente, generador, resultados, args.tasa, args.duracion, args.poisson, args.semilla)
+    duracion = time.perf_counter() - t0
+    await cliente.cerrar()
+
+    total = sum(len(v) for v in resultados.latencias.values())
+    errores = sum(resultados.errores.values())
+    return {
+        "destino": destino,
+        "modo": args.modo,
+        "concurrencia": args.concurrencia if args.modo == "cerrado" else None,
+        "tasa_objetivo": args.tasa if args.modo == "abierto" else None,
+        "mezcla": mezcla,
+        "duracion_s": round(duracion, 3),
+        "total": {
+            "requests": total,
+            "rps": round(total / duracion, 2) if duracion else 0.0,
+            "errores": errores,
+            "tasa_error": round(errores / total, 4) if total else 0.0
+        },
+        "endpoints": resultados.resumen(duracion)
     }
-    
-    response = requests.post(f"{BASE_URL}/predict", json=data)
-    
-    print(f"Status Code: {response.status_code}")
-    print(f"Response:")
-    result = response.json()
-    print(json.dumps(result, indent=2, ensure_ascii=False))
-    
-    print(f"\n💡 INTERPRETACIÓN:")
-    print(f"   Probabilidad: {result['probabilidad_cancelacion']*100:.1f}%")
-    print(f"   Recomendación: {result['recomendacion']}")
-    print(f"   Factores de riesgo: {len(result['factores_riesgo'])}")
-    
-    return response.status_code == 200
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Generador de carga del microservicio de predicción")
+    parser.add_argument("--url", default=BASE_URL, help="URL del servicio")
+    parser.add_argument("--en-proceso", action="store_true", help="Usar la app ASGI en este proceso (MongoDB en memoria)")
+    parser.add_argument("--modo", choices=["cerrado", "abierto"], default="cerrado")
+    parser.add_argument("--concurrencia", type=int, default=8, help="Clientes concurrentes (modo cerrado)")
+    parser.add_argument("--tasa", type=float, default=50.0, help="Requests por segundo (modo abierto)")
+    parser.add_argument("--poisson", action="store_true", help="Llegadas exponenciales en modo abierto")
+    parser.add_argument("--max-conexiones", type=int, default=64, help="Conexiones HTTP simultáneas (modo abierto)")
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos de medición")
+    parser.add_argument("--requests", type=int, default=0, help="Máximo de requests (modo cerrado, 0 = sin límite)")
+    parser.add_argument("--calentamiento", type=float, default=2.0, help="Segundos de calentamiento sin medir")
+    parser.add_argument("--mezcla", default="predict=0.95,health=0.05", help="Pesos por endpoint")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", default=None, help="Guardar el reporte JSON en este archivo")
+    return parser.parse_args()
 
 
 def main():
     """Función principal"""
-    print("\n" + "="*60)
-    print("🧪 PROBANDO MICROSERVICIO DE PREDICCIÓN DE CANCELACIONES")
-    print("="*60)
-    
+    args = _parse_args()
+
     try:
-        # Test 1: Health check
-        health_ok = test_health()
-        
-        if not health_ok:
-            print("\n❌ El servicio no está saludable. Abortando pruebas.")
-            return
-        
-        # Test 2: Predicción alto riesgo
-        test_predict_alto_riesgo()
-        
-        # Test 3: Predicción bajo riesgo
-        test_predict_bajo_riesgo()
-        
-        # Test 4: Predicción riesgo medio
-        test_predict_riesgo_medio()
-        
-        print("\n" + "="*60)
-        print("✅ TODAS LAS PRUEBAS COMPLETADAS")
-        print("="*60)
-        print("\n📌 El microservicio está funcionando correctamente")
-        print("📌 Spring Boot puede consumir el endpoint: POST http://localhost:8001/predict")
-        print("📌 Documentación interactiva: http://localhost:8001/docs")
-        
-    except requests.exceptions.ConnectionError:
-        print("\n❌ ERROR: No se pudo conectar al microservicio")
-        print("   Asegúrate de que el servidor esté corriendo:")
-        print("   python main.py")
-    except Exception as e:
-        print(f"\n❌ ERROR: {e}")
+        reporte = asyncio.run(_main(args))
+    except ImportError as e:
+        print(f"\n❌ ERROR: dependencia faltante ({e}). Ejecuta: pip install -r requirements.txt")
+        sys.exit(1)
+
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Reporte guardado en: {args.salida}")
+
+    if reporte["total"]["requests"] and reporte["total"]["tasa_error"] == 1.0 and not args.en_proceso:
+        print("\n❌ Todos los requests fallaron. ¿Está corriendo el servicio?")
+        print("   python main_v4.py")
 
 
 if __name__ == "__main__":
@@ -13,12 +13,24 @@ Este script:
 
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split, StratifiedKFold, RandomizedSearchCV
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.base import clone
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix, classification_report
+from scipy.stats import randint
 import joblib
 from datetime import datetime
+import argparse
+import copy
+import json
+import math
 import os
+import pickle
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Crear directorio para modelos si no existe
 os.makedirs('app/ml', exist_ok=True)
@@ -101,6 +113,191 @@ def entrenar_modelo(X_train, y_train):
     return modelo
 
 
+# Espacio de búsqueda de hiperparámetros
+ESPACIO_BUSQUEDA = {
+    'n_estimators': randint(20, 301),
+    'max_depth': [4, 6, 8, 10, 12, 16, 20, None],
+    'min_samples_split': randint(2, 21),
+    'min_samples_leaf': randint(1, 21),
+    'max_features': ['sqrt', 'log2', 0.5, None],
+    'class_weight': ['balanced', 'balanced_subsample'],
+}
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano (valores ya ordenados)"""
+    if not valores:
+        return 0.0
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+def medir_latencia(modelo, X_muestra, repeticiones=300):
+    """
+    Latencia de inferencia de una fila (como en /predict) en milisegundos
+    
+    Mide predict_proba sobre un arreglo NumPy float64 de 1 fila, recorriendo
+    filas de X_muestra, sin feature_names_in_ (igual que PredictorService, que
+    se los quita al cargar) y con el modelo en n_jobs=1 (sin hilos de joblib
+    por request).
+    
+    Returns:
+        dict con p50_ms, p99_ms
+    """
+    X = np.asarray(X_muestra, dtype=np.float64)
+    filas = [X[i % len(X):i % len(X) + 1] for i in range(repeticiones)]
+    # Se quitan solo durante la medición: el modelo se guarda con sus nombres
+    nombres = getattr(modelo, 'feature_names_in_', None)
+    if nombres is not None:
+        del modelo.feature_names_in_
+    try:
+        modelo.predict_proba(filas[0])  # calentamiento
+        tiempos = []
+        for fila in filas:
+            t0 = time.perf_counter()
+            modelo.predict_proba(fila)
+            tiempos.append((time.perf_counter() - t0) * 1000)
+    finally:
+        if nombres is not None:
+            modelo.feature_names_in_ = nombres
+    tiempos.sort()
+    return {'p50_ms': percentil(tiempos, 50), 'p99_ms': percentil(tiempos, 99)}
+
+
+def _entrenar_candidato(params, X_train, y_train):
+    modelo = RandomForestClassifier(random_state=42, n_jobs=1, **params)
+    modelo.fit(X_train, y_train)
+    return modelo
+
+
+def buscar_hiperparametros(X_train, y_train, modo='random', n_iter=40, cv=5,
+                           presupuesto_p99_ms=5.0, finalistas=8,
+                           peso_latencia=0.01, peso_tamano=0.005):
+    """
+    Búsqueda de hiperparámetros con objetivo de calidad, latencia y tamaño
+    
+    1. Búsqueda aleatoria (random) o por reducción sucesiva (halving) con
+       validación cruzada estratificada, en paralelo en todos los cores
+    2. Los 'finalistas' con mejor F1 se reentrenan en todo el train set y se
+       les mide la latencia p99 de una fila y el tamaño serializado. En
+       halving (min_resources='exhaust': la última iteración usa casi todo el
+       train set) cada candidato entra con su resultado en la última
+       iteración que alcanzó, y se ordenan primero por esa iteración y luego
+       por F1: a la última solo llegan unos pocos y los demás finalistas son
+       los mejores de las iteraciones anteriores
+    3. objetivo = F1_cv - peso_latencia * p99_ms - peso_tamano * tamaño_MB;
+       gana el mejor objetivo entre los que cumplen el presupuesto de p99
+    
+    Args:
+        X_train, y_train: Datos de entrenamiento
+        modo: 'random' o 'halving'
+        n_iter: Candidatos a evaluar
+        cv: Folds de validación cruzada
+        presupuesto_p99_ms: Latencia p99 máxima permitida por fila
+        finalistas: Candidatos a los que se mide latencia y tamaño
+        peso_latencia: Penalización del objetivo por ms de p99
+        peso_tamano: Penalización del objetivo por MB de modelo
+    
+    Returns:
+        (modelo elegido, dict con el registro completo de la búsqueda)
+    """
+    print(f"\n🔎 Búsqueda de hiperparámetros ({modo}, {n_iter} candidatos, cv={cv})...")
+    t0 = time.perf_counter()
+    
+    base = RandomForestClassifier(random_state=42, n_jobs=1)
+    folds = StratifiedKFold(n_splits=cv, shuffle=True, random_state=42)
+    
+    if modo == 'halving':
+        from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+        from sklearn.model_selection import HalvingRandomSearchCV
+        busqueda = HalvingRandomSearchCV(
+            base, ESPACIO_BUSQUEDA, n_candidates=n_iter, factor=3, min_resources='exhaust',
+            scoring='f1', cv=folds, random_state=42, n_jobs=-1, refit=False
+        )
+    else:
+        busqueda = RandomizedSearchCV(
+            base, ESPACIO_BUSQUEDA, n_iter=n_iter, scoring='f1',
+            cv=folds, random_state=42, n_jobs=-1, refit=False
+        )
+    busqueda.fit(X_train, y_train)
+    resultados = busqueda.cv_results_
+    
+    candidatos = []
+    for i, params in enumerate(resultados['params']):
+        candidato = {
+            'params': {k: (v if not isinstance(v, np.generic) else v.item()) for k, v in params.items()},
+            'f1_cv': float(resultados['mean_test_score'][i]),
+            'f1_cv_std': float(resultados['std_test_score'][i]),
+            'fit_s': float(resultados['mean_fit_time'][i]),
+        }
+        if 'iter' in resultados:
+            candidato['iteracion_halving'] = int(resultados['iter'][i])
+            candidato['n_muestras'] = int(resultados['n_resources'][i])
+        candidatos.append(candidato)
+    
+    elegibles = [c for c in candidatos if not np.isnan(c['f1_cv'])]
+    if 'iter' in resultados:
+        # Un candidato aparece una vez por iteración: vale la más avanzada (más muestras)
+        por_params = {}
+        for c in elegibles:
+            clave = json.dumps(c['params'], sort_keys=True)
+            if clave not in por_params or c['iteracion_halving'] > por_params[clave]['iteracion_halving']:
+                por_params[clave] = c
+        elegibles = sorted(por_params.values(), key=lambda c: (c['iteracion_halving'], c['f1_cv']), reverse=True)
+    else:
+        elegibles = sorted(elegibles, key=lambda c: c['f1_cv'], reverse=True)
+    elegibles = elegibles[:finalistas]
+    
+    # Reentrenar finalistas en paralelo; medir latencia de forma secuencial
+    modelos = joblib.Parallel(n_jobs=-1)(
+        joblib.delayed(_entrenar_candidato)(c['params'], X_train, y_train) for c in elegibles
+    )
+    muestra = X_train.sample(n=min(len(X_train), 200), random_state=42)
+    for candidato, modelo in zip(elegibles, modelos):
+        latencia = medir_latencia(modelo, muestra)
+        tamano_mb = len(pickle.dumps(modelo, protocol=pickle.HIGHEST_PROTOCOL)) / (1024 * 1024)
+        candidato.update({
+            'p50_ms': round(latencia['p50_ms'], 4),
+            'p99_ms': round(latencia['p99_ms'], 4),
+            'tamano_mb': round(tamano_mb, 3),
+            'objetivo': round(candidato['f1_cv'] - peso_latencia * latencia['p99_ms'] - peso_tamano * tamano_mb, 5),
+            'cumple_presupuesto': latencia['p99_ms'] <= presupuesto_p99_ms,
+        })
+        print(f"   • F1={candidato['f1_cv']:.4f}  p99={candidato['p99_ms']:.2f}ms  "
+              f"{candidato['tamano_mb']:.2f}MB  objetivo={candidato['objetivo']:.4f}  {candidato['params']}")
+    
+    dentro = [(c, m) for c, m in zip(elegibles, modelos) if c['cumple_presupuesto']]
+    if dentro:
+        elegido, modelo = max(dentro, key=lambda cm: cm[0]['objetivo'])
+    else:
+        print(f"⚠️  Ningún finalista cumple p99 <= {presupuesto_p99_ms} ms: se elige el más rápido")
+        elegido, modelo = min(zip(elegibles, modelos), key=lambda cm: cm[0]['p99_ms'])
+    elegido['elegido'] = True
+    
+    duracion = time.perf_counter() - t0
+    print(f"✅ Modelo elegido: {elegido['params']} (F1 cv {elegido['f1_cv']:.4f}, p99 {elegido['p99_ms']:.2f} ms)")
+    print(f"   Búsqueda completada en {duracion:.1f} s")
+    
+    registro = {
+        'modo': modo,
+        'n_iter': n_iter,
+        'cv': cv,
+        'presupuesto_p99_ms': presupuesto_p99_ms,
+        'peso_latencia': peso_latencia,
+        'peso_tamano': peso_tamano,
+        'duracion_s': round(duracion, 2),
+        'cores': os.cpu_count(),
+        'elegido': elegido,
+        'finalistas': elegibles,
+        'candidatos': candidatos,
+    }
+    if modo == 'halving':
+        registro['n_resources'] = [int(n) for n in busqueda.n_resources_]
+        registro['n_candidates'] = [int(n) for n in busqueda.n_candidates_]
+        print(f"   Halving: muestras por iteración {registro['n_resources']}, "
+              f"candidatos {registro['n_candidates']}")
+    return modelo, registro
+
+
 def evaluar_modelo(modelo, X_train, X_test, y_train, y_test):
     """
     Evalúa el modelo en train y test sets
@@ -193,6 +390,157 @@ def evaluar_modelo(modelo, X_train, X_test, y_train, y_test):
     return metricas
 
 
+def metricas_holdout(modelo, X, y):
+    """Métricas de clasificación sobre un holdout (sin imprimir el detalle)"""
+    y_pred = modelo.predict(X)
+    return {
+        'accuracy': accuracy_score(y, y_pred),
+        'precision': precision_score(y, y_pred, zero_division=0),
+        'recall': recall_score(y, y_pred, zero_division=0),
+        'f1_score': f1_score(y, y_pred, zero_division=0),
+        'confusion_matrix': confusion_matrix(y, y_pred, labels=[0, 1]).tolist()
+    }
+
+
+def entrenar_incremental(modelo_base, X_nuevo, y_nuevo, arboles_nuevos=20, max_arboles=None):
+    """
+    Agrega árboles entrenados solo con la ventana nueva (warm_start)
+    
+    Args:
+        modelo_base: RandomForestClassifier ya entrenado (no se modifica)
+        X_nuevo, y_nuevo: Ventana de datos recién etiquetados
+        arboles_nuevos: Árboles a agregar
+        max_arboles: Tamaño fijo del ensamble; se retiran los árboles más antiguos
+    
+    Returns:
+        modelo actualizado
+    """
+    if len(np.unique(y_nuevo)) < 2:
+        raise ValueError("La ventana nueva debe tener ejemplos de ambas clases")
+    
+    modelo = copy.deepcopy(modelo_base)
+    n_actual = len(modelo.estimators_)
+    print(f"\n🌱 Entrenamiento incremental: {n_actual} árboles + {arboles_nuevos} nuevos "
+          f"con {len(X_nuevo)} registros...")
+    
+    modelo.set_params(warm_start=True, n_estimators=n_actual + arboles_nuevos)
+    modelo.fit(X_nuevo, y_nuevo)
+    
+    if max_arboles and len(modelo.estimators_) > max_arboles:
+        retirados = len(modelo.estimators_) - max_arboles
+        modelo.estimators_ = modelo.estimators_[retirados:]
+        print(f"   • {retirados} árboles más antiguos retirados (ensamble fijo de {max_arboles})")
+    
+    modelo.set_params(warm_start=False, n_estimators=len(modelo.estimators_))
+    print(f"✅ Modelo incremental: {len(modelo.estimators_)} árboles")
+    return modelo
+
+
+def guardar_version(modelo, metadatos, directorio='app/ml/versiones'):
+    """
+    Guarda un artefacto versionado (modelo_<fecha>.pkl + .json con metadatos)
+    
+    Returns:
+        ruta del .pkl
+    """
+    os.makedirs(directorio, exist_ok=True)
+    version = datetime.now().strftime("%Y%m%d_%H%M%S")
+    ruta = os.path.join(directorio, f"modelo_{version}.pkl")
+    joblib.dump(modelo, ruta)
+    with open(os.path.join(directorio, f"modelo_{version}.json"), 'w', encoding='utf-8') as f:
+        json.dump({'version': version, **metadatos}, f, indent=2, ensure_ascii=False, default=str)
+    print(f"\n💾 Versión guardada en: {ruta}")
+    return ruta
+
+
+def main_incremental(args):
+    """
+    Reentrenamiento incremental con comparación contra un reentrenamiento completo
+    
+    - Ventana nueva: --nuevos (CSV, filas en orden cronológico) o documentos
+      etiquetados desde --desde (campo_marca, por defecto fecha_etiqueta, MongoDB)
+    - Holdout: el 20% más reciente de la ventana nueva (las últimas filas; el
+      cargador de MongoDB las devuelve en orden de campo_marca)
+    - Incremental: modelo base + árboles entrenados con el resto de la ventana
+    - Completo: mismos hiperparámetros, desde cero sobre histórico + ventana
+    - Con --promover, el perfil de drift se arma con histórico + ventana
+    """
+    modelo_base = joblib.load(args.modelo_base)
+    print(f"📦 Modelo base: {args.modelo_base} ({len(modelo_base.estimators_)} árboles)")
+    
+    if args.fuente == 'mongo':
+        if not args.desde:
+            raise SystemExit("❌ --incremental con --fuente mongo requiere --desde")
+        desde = pd.Timestamp(args.desde).to_pydatetime()
+        df_historico = _cargar_dataset(args, {args.campo_marca: {"$lt": desde}})
+        df_nuevo = _cargar_dataset(args, {args.campo_marca: {"$gte": desde}})
+    else:
+        if not args.nuevos:
+            raise SystemExit("❌ --incremental con --fuente csv requiere --nuevos")
+        df_historico = cargar_dataset(args.csv)
+        df_nuevo = cargar_dataset(args.nuevos)
+    
+    columnas = list(getattr(modelo_base, 'feature_names_in_', df_nuevo.drop('fue_cancelada', axis=1).columns))
+    X_nuevo = df_nuevo.drop('fue_cancelada', axis=1)[columnas]
+    y_nuevo = df_nuevo['fue_cancelada']
+    # Sin mezclar: el holdout son las filas más recientes (se evalúa sobre el futuro)
+    X_ventana, X_holdout, y_ventana, y_holdout = train_test_split(
+        X_nuevo, y_nuevo, test_size=0.2, shuffle=False
+    )
+    if y_holdout.nunique() < 2:
+        print("⚠️  El holdout reciente tiene una sola clase: precision/recall no son comparables")
+    X_historico = df_historico.drop('fue_cancelada', axis=1)[columnas]
+    y_historico = df_historico['fue_cancelada']
+    print(f"   • Histórico: {len(X_historico)} | Ventana nueva: {len(X_ventana)} | Holdout: {len(X_holdout)}")
+    
+    # Incremental
+    t0 = time.perf_counter()
+    modelo = entrenar_incremental(modelo_base, X_ventana, y_ventana,
+                                  arboles_nuevos=args.arboles_nuevos, max_arboles=args.max_arboles)
+    t_incremental = time.perf_counter() - t0
+    
+    # Completo con los mismos hiperparámetros y el mismo número final de árboles
+    print(f"\n🔁 Reentrenamiento completo de referencia ({len(modelo.estimators_)} árboles)...")
+    completo = clone(modelo_base).set_params(warm_start=False, n_estimators=len(modelo.estimators_))
+    t0 = time.perf_counter()
+    completo.fit(pd.concat([X_historico, X_ventana]), pd.concat([y_historico, y_ventana]))
+    t_completo = time.perf_counter() - t0
+    
+    comparacion = {
+        'base': metricas_holdout(modelo_base, X_holdout, y_holdout),
+        'incremental': {**metricas_holdout(modelo, X_holdout, y_holdout), 'segundos': round(t_incremental, 3)},
+        'completo': {**metricas_holdout(completo, X_holdout, y_holdout), 'segundos': round(t_completo, 3)},
+    }
+    
+    print("\n" + "="*60)
+    print("📈 HOLDOUT (20% MÁS RECIENTE)")
+    print("="*60)
+    for nombre, m in comparacion.items():
+        tiempo = f"  {m['segundos']:.2f} s" if 'segundos' in m else ""
+        print(f"{nombre:12s} F1={m['f1_score']:.4f}  Acc={m['accuracy']:.4f}  "
+              f"Prec={m['precision']:.4f}  Rec={m['recall']:.4f}{tiempo}")
+    print(f"\n⏱️  Incremental {t_incremental:.2f} s vs completo {t_completo:.2f} s "
+          f"({t_completo / t_incremental if t_incremental else 0:.1f}x)")
+    
+    ruta = guardar_version(modelo, {
+        'modo': 'incremental',
+        'modelo_base': args.modelo_base,
+        'arboles_base': len(modelo_base.estimators_),
+        'arboles_nuevos': args.arboles_nuevos,
+        'max_arboles': args.max_arboles,
+        'arboles_final': len(modelo.estimators_),
+        'registros': {'historico': len(X_historico), 'ventana': len(X_ventana), 'holdout': len(X_holdout)},
+        'holdout': comparacion,
+    })
+    
+    if args.promover:
+        guardar_modelo(modelo)
+        # El modelo promovido conoce histórico + ventana: esa es la distribución normal
+        guardar_perfil_referencia(modelo, pd.concat([X_historico, X_ventana]), X_holdout)
+    else:
+        print(f"   Para usarla en el servicio: copiar {ruta} a app/ml/modelo.pkl (o usar --promover)")
+
+
 def mostrar_feature_importance(modelo, feature_names):
     """Muestra las features más importantes del modelo"""
     print("\n" + "="*60)
@@ -214,8 +562,25 @@ def guardar_modelo(modelo, ruta='app/ml/modelo.pkl'):
     print(f"\n💾 Modelo guardado en: {ruta}")
 
 
-def guardar_reporte(metricas, ruta='app/ml/reporte_entrenamiento.txt'):
-    """Guarda un reporte del entrenamiento"""
+def guardar_perfil_referencia(modelo, X_referencia, X_no_visto, ruta='app/ml/perfil_referencia.json'):
+    """
+    Guarda el perfil de referencia del monitor de drift (app/services/drift.py)
+    
+    Args:
+        modelo: Modelo entrenado
+        X_referencia: Features cuya distribución se considera normal (train)
+        X_no_visto: Features no vistas en el entrenamiento, para el histograma de probabilidad
+    """
+    from app.services.drift import construir_perfil
+    
+    perfil = construir_perfil(X_referencia, modelo.predict_proba(X_no_visto)[:, 1])
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(perfil, f, indent=2, ensure_ascii=False)
+    print(f"📄 Perfil de referencia (drift) guardado en: {ruta}")
+
+
+def guardar_reporte(metricas, ruta='app/ml/reporte_entrenamiento.txt', busqueda=None):
+    """Guarda un reporte del entrenamiento (y el registro de la búsqueda, si hubo)"""
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
     with open(ruta, 'w', encoding='utf-8') as f:
@@ -231,24 +596,120 @@ def guardar_reporte(metricas, ruta='app/ml/reporte_entrenamiento.txt'):
         f.write(f"  • F1-Score:  {metricas['f1_score']:.4f}\n\n")
         f.write("Matriz de Confusión:\n")
         f.write(f"  {metricas['confusion_matrix']}\n")
+        
+        if busqueda:
+            elegido = busqueda['elegido']
+            f.write("\n" + "="*60 + "\n")
+            f.write(f"BÚSQUEDA DE HIPERPARÁMETROS ({busqueda['modo']})\n")
+            f.write("="*60 + "\n\n")
+            f.write(f"Candidatos: {len(busqueda['candidatos'])} | CV: {busqueda['cv']} folds | "
+                    f"Cores: {busqueda['cores']} | Duración: {busqueda['duracion_s']} s\n")
+            f.write(f"Presupuesto p99: {busqueda['presupuesto_p99_ms']} ms | "
+                    f"Objetivo: F1 - {busqueda['peso_latencia']}*p99_ms - {busqueda['peso_tamano']}*MB\n\n")
+            f.write(f"Elegido: {elegido['params']}\n")
+            f.write(f"  • F1 cv:  {elegido['f1_cv']:.4f} (±{elegido['f1_cv_std']:.4f})\n")
+            f.write(f"  • p50/p99: {elegido['p50_ms']:.3f} / {elegido['p99_ms']:.3f} ms\n")
+            f.write(f"  • Tamaño: {elegido['tamano_mb']:.3f} MB\n\n")
+            f.write("Finalistas (latencia medida con n_jobs=1, una fila):\n")
+            for c in busqueda['finalistas']:
+                f.write(f"  F1={c['f1_cv']:.4f} p99={c['p99_ms']:.3f}ms {c['tamano_mb']:.3f}MB "
+                        f"obj={c['objetivo']:.4f} {'✓' if c['cumple_presupuesto'] else '✗'} {c['params']}\n")
+            f.write("\nTodos los candidatos:\n")
+            for c in sorted(busqueda['candidatos'], key=lambda c: c['f1_cv'], reverse=True):
+                f.write(f"  F1={c['f1_cv']:.4f}±{c['f1_cv_std']:.4f} fit={c['fit_s']:.2f}s {c['params']}\n")
     
     print(f"📄 Reporte guardado en: {ruta}")
+    
+    if busqueda:
+        ruta_json = os.path.splitext(ruta)[0] + '_busqueda.json'
+        with open(ruta_json, 'w', encoding='utf-8') as f:
+            json.dump(busqueda, f, indent=2, ensure_ascii=False, default=str)
+        print(f"📄 Registro de la búsqueda guardado en: {ruta_json}")
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Entrenamiento del modelo de predicción de cancelaciones")
+    parser.add_argument('--buscar', choices=['random', 'halving'], default=None,
+                        help="Búsqueda de hiperparámetros en lugar de la configuración fija")
+    parser.add_argument('--iteraciones', type=int, default=40, help="Candidatos de la búsqueda")
+    parser.add_argument('--cv', type=int, default=5, help="Folds de validación cruzada")
+    parser.add_argument('--presupuesto-p99-ms', type=float, default=5.0,
+                        help="Latencia p99 máxima por fila para elegir el modelo")
+    parser.add_argument('--finalistas', type=int, default=8,
+                        help="Mejores candidatos por F1 a los que se mide latencia y tamaño")
+    parser.add_argument('--peso-latencia', type=float, default=0.01, help="Penalización por ms de p99")
+    parser.add_argument('--peso-tamano', type=float, default=0.005, help="Penalización por MB de modelo")
+    parser.add_argument('--fuente', choices=['csv', 'mongo'], default='csv', help="Origen de los datos")
+    parser.add_argument('--csv', default='data/dataset_sintetico.csv', help="Ruta del CSV (fuente csv)")
+    parser.add_argument('--mongo-coleccion', default='predicciones_cancelacion')
+    parser.add_argument('--mongo-filtro', default='{}', help="Filtro JSON adicional")
+    parser.add_argument('--campo-etiqueta', default='fue_cancelada', help="Campo con el resultado real")
+    parser.add_argument('--campo-marca', default='fecha_etiqueta',
+                        help="Fecha en que se escribió la etiqueta (marca de agua de la caché; "
+                             "debe actualizarse junto con --campo-etiqueta)")
+    parser.add_argument('--prefijo-features', default='features.',
+                        help="Prefijo de las features en el documento ('' si están en la raíz)")
+    parser.add_argument('--sin-cache', action='store_true', help="No usar la caché local de MongoDB")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Agregar árboles al modelo actual con la ventana nueva (warm_start)")
+    parser.add_argument('--modelo-base', default='app/ml/modelo.pkl', help="Modelo a extender")
+    parser.add_argument('--nuevos', default=None, help="CSV con la ventana nueva (fuente csv)")
+    parser.add_argument('--desde', default=None,
+                        help="Inicio de la ventana nueva en campo-marca (etiquetados desde), ISO 8601 (fuente mongo)")
+    parser.add_argument('--arboles-nuevos', type=int, default=20, help="Árboles a agregar")
+    parser.add_argument('--max-arboles', type=int, default=None,
+                        help="Tamaño fijo del ensamble (retira los árboles más antiguos)")
+    parser.add_argument('--promover', action='store_true',
+                        help="Además de la versión, reemplazar app/ml/modelo.pkl")
+    return parser.parse_args()
+
+
+def _cargar_dataset(args, filtro_extra=None):
+    """Dataset según --fuente (filtro_extra solo aplica a MongoDB)"""
+    if args.fuente == 'mongo':
+        from cargador_mongo import cargar_dataset_mongo
+        print(f"📂 Cargando dataset desde MongoDB: {args.mongo_coleccion}")
+        filtro = json.loads(args.mongo_filtro)
+        if filtro_extra:
+            filtro = {"$and": [filtro, filtro_extra]}
+        df = cargar_dataset_mongo(
+            coleccion=args.mongo_coleccion, filtro=filtro,
+            campo_etiqueta=args.campo_etiqueta, campo_marca=args.campo_marca,
+            prefijo_features=args.prefijo_features, usar_cache=not args.sin_cache
+        )
+        print(f"✅ Dataset cargado: {len(df)} registros, {len(df.columns)} columnas")
+        return df
+    return cargar_dataset(args.csv)
 
 
 def main():
     """Función principal"""
+    args = _parse_args()
+    
     print("\n" + "="*60)
     print("🚀 ENTRENAMIENTO DEL MODELO DE PREDICCIÓN DE CANCELACIONES")
     print("="*60 + "\n")
     
+    if args.incremental:
+        main_incremental(args)
+        return
+    
     # 1. Cargar dataset
-    df = cargar_dataset()
+    df = _cargar_dataset(args)
     
     # 2. Preparar datos
     X_train, X_test, y_train, y_test = preparar_datos(df, test_size=0.2)
     
-    # 3. Entrenar modelo
-    modelo = entrenar_modelo(X_train, y_train)
+    # 3. Entrenar modelo (configuración fija o búsqueda de hiperparámetros)
+    busqueda = None
+    if args.buscar:
+        modelo, busqueda = buscar_hiperparametros(
+            X_train, y_train, modo=args.buscar, n_iter=args.iteraciones, cv=args.cv,
+            presupuesto_p99_ms=args.presupuesto_p99_ms, finalistas=args.finalistas,
+            peso_latencia=args.peso_latencia, peso_tamano=args.peso_tamano
+        )
+    else:
+        modelo = entrenar_modelo(X_train, y_train)
     
     # 4. Evaluar modelo
     metricas = evaluar_modelo(modelo, X_train, X_test, y_train, y_test)
@@ -256,11 +717,12 @@ def main():
     # 5. Feature importance
     mostrar_feature_importance(modelo, X_train.columns.tolist())
     
-    # 6. Guardar modelo
+    # 6. Guardar modelo (y el perfil de referencia para el monitor de drift)
     guardar_modelo(modelo)
+    guardar_perfil_referencia(modelo, X_train, X_test)
     
     # 7. Guardar reporte
-    guardar_reporte(metricas)
+    guardar_reporte(metricas, busqueda=busqueda)
     
     print("\n" + "="*60)
     print("✅ ENTRENAMIENTO COMPLETADO EXITOSAMENTE")
@@ -0,0 +1,304 @@
+"""
+Verificación del codec rápido de /predict (app/codec.py)
+
+1. Contrato: envía los mismos requests a /predict con el codec normal de
+   FastAPI y con RutaCodecRapido (app en proceso, MongoDB en memoria) y
+   exige respuestas idénticas byte a byte (status + body JSON), tanto para
+   payloads válidos del dataset sintético como para casos límite e inválidos
+   (422 de pydantic).
+2. Validador: para cada payload, el validador compilado debe producir los
+   mismos valores que PredictRequestFull.model_validate, o delegar (None);
+   nunca aceptar algo que pydantic rechaza.
+3. CPU: tiempo de CPU por request (time.process_time) de cada camino, y
+   desglose decodificación+validación / serialización de la respuesta.
+
+Termina con código 1 si hay alguna diferencia.
+
+Uso:
+    python scripts/verificar_codec.py --payloads 2000 --requests-cpu 3000
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from generar_datos_sinteticos import generar_features, construir_payload
+from mongo_memoria import DBMemoria
+
+
+def casos_limite(base: dict) -> list:
+    """Payloads con coerciones, bordes de Field y errores de validación"""
+    casos = []
+
+    def variante(**cambios):
+        payload = copy.deepcopy(base)
+        for clave, valor in cambios.items():
+            if valor is _QUITAR:
+                payload.pop(clave, None)
+            else:
+                payload[clave] = valor
+        casos.append(payload)
+
+    # Coerciones que pydantic acepta
+    variante(monto_total=1850)                       # int -> float
+    variante(es_temporada_alta=1.0)                  # float entero -> int
+    variante(es_temporada_alta=True)                 # bool -> int
+    variante(duracion_dias="7")                      # str -> int
+    variante(email_cliente="Maria@EJEMPLO.COM")      # normalización del dominio
+    variante(fecha_venta="2025-12-15T08:30:00")      # sin zona horaria
+    variante(fecha_venta="2025-12-15T08:30:00.123+02:00")
+    variante(fecha_venta="2025-12-15 08:30:00")      # separador espacio
+    variante(fecha_venta="2025-12-15")               # solo fecha
+    variante(fecha_venta=1765756800)                 # timestamp
+    variante(nombre_paquete=None, destino=None)
+    variante(nombre_paquete=_QUITAR, destino=_QUITAR)
+    variante(campo_extra="ignorado")
+    variante(nombre_cliente="José Ñúñez 🌴")
+
+    # Bordes de Field
+    variante(tasa_cancelacion_historica=0)
+    variante(tasa_cancelacion_historica=1)
+    variante(dia_semana_reserva=6)
+    variante(duracion_dias=1)
+    variante(monto_promedio_compras=0.0)
+
+    # Inválidos (422)
+    variante(monto_total=0)
+    variante(monto_total=-5.0)
+    variante(dia_semana_reserva=7)
+    variante(duracion_dias=0)
+    variante(destino_categoria=3)
+    variante(tasa_cancelacion_historica=1.5)
+    variante(es_temporada_alta=0.5)
+    variante(email_cliente="no-es-email")
+    variante(fecha_venta="2025-02-30T00:00:00")
+    variante(fecha_venta="ayer")
+    variante(venta_id=123)
+    variante(venta_id=None)
+    variante(venta_id=_QUITAR)
+    variante(total_compras_previas=-1)
+    variante(monto_total="mucho")
+    return casos
+
+
+_QUITAR = object()
+
+
+async def llamar(app, cuerpo: bytes, content_type: bytes = b"application/json"):
+    """(status, body) de un POST /predict a una app ASGI"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/predict", "raw_path": b"/predict",
+        "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"verificacion"), (b"content-type", content_type),
+                    (b"content-length", str(len(cuerpo)).encode())],
+        "client": ("127.0.0.1", 50000), "server": ("verificacion", 80),
+    }
+    enviado = False
+    respuesta = {"status": None, "body": b""}
+
+    async def receive():
+        nonlocal enviado
+        if not enviado:
+            enviado = True
+            return {"type": "http.request", "body": cuerpo, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            respuesta["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            respuesta["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return respuesta["status"], respuesta["body"]
+
+
+def construir_apps():
+    """(app_normal, app_rapida) con el endpoint real de /predict"""
+    from fastapi import FastAPI
+    from fastapi.routing import APIRoute
+    import app.codec as codec
+    from app.routers import prediccion
+    from app.schemas import PredictResponse
+
+    codec.CODEC_RAPIDO = True
+    apps = []
+    for clase in (APIRoute, codec.RutaCodecRapido):
+        aplicacion = FastAPI()
+        aplicacion.router.add_api_route(
+            "/predict", prediccion.predecir, methods=["POST"],
+            response_model=PredictResponse, route_class_override=clase
+        )
+        apps.append(aplicacion)
+    return apps
+
+
+def verificar_validador(payloads: list) -> list:
+    """Diferencias entre el validador compilado y PredictRequestFull"""
+    from pydantic import ValidationError
+    from app.codec import compilar_validador
+    from app.schemas import PredictRequestFull
+
+    validar = compilar_validador(PredictRequestFull)
+    diferencias = []
+    for payload in payloads:
+        try:
+            esperado = PredictRequestFull.model_validate(payload).model_dump()
+        except ValidationError:
+            esperado = None
+        try:
+            obtenido = validar(payload)
+        except Exception:
+            obtenido = None
+        if obtenido is None:
+            continue  # delega a pydantic: siempre correcto
+        if esperado is None or obtenido != esperado:
+            diferencias.append({"payload": payload, "pydantic": repr(esperado), "compilado": repr(obtenido)})
+    return diferencias
+
+
+async def llamar_o_excepcion(app, cuerpo: bytes):
+    """
+    (status, body) o ("excepcion", tipo) si la app no llega a responder
+
+    El handler de 422 de FastAPI lanza UnicodeEncodeError con un surrogate
+    suelto en el body (p. ej. "\\ud800"): el codec rápido debe fallar igual,
+    no esconderlo ni cambiarlo por otra respuesta.
+    """
+    try:
+        return await llamar(app, cuerpo)
+    except Exception as e:
+        return "excepcion", type(e).__name__.encode("utf-8")
+
+
+async def verificar_contrato(app_normal, app_rapida, cuerpos: list) -> list:
+    diferencias = []
+    for cuerpo in cuerpos:
+        normal = await llamar_o_excepcion(app_normal, cuerpo)
+        rapida = await llamar_o_excepcion(app_rapida, cuerpo)
+        if normal != rapida:
+            diferencias.append({
+                "request": cuerpo.decode("utf-8", "replace"),
+                "normal": [normal[0], normal[1].decode("utf-8", "replace")],
+                "rapido": [rapida[0], rapida[1].decode("utf-8", "replace")]
+            })
+    # Content-Type distinto de JSON: ambos caminos deben responder igual
+    cuerpo = cuerpos[0]
+    if await llamar(app_normal, cuerpo, b"text/plain") != await llamar(app_rapida, cuerpo, b"text/plain"):
+        diferencias.append({"request": "content-type text/plain"})
+    return diferencias
+
+
+def es_valido(cuerpo: bytes) -> bool:
+    from pydantic import ValidationError
+    from app.schemas import PredictRequestFull
+
+    try:
+        PredictRequestFull.model_validate_json(cuerpo)
+    except ValidationError:
+        return False
+    return True
+
+
+async def medir_cpu(app, cuerpos: list, n: int) -> float:
+    """Microsegundos de CPU por request (proceso completo, incluye el threadpool)"""
+    for cuerpo in cuerpos[:50]:
+        await llamar(app, cuerpo)
+    t0 = time.process_time()
+    for i in range(n):
+        await llamar(app, cuerpos[i % len(cuerpos)])
+    return (time.process_time() - t0) / n * 1_000_000
+
+
+def medir_codec(cuerpos: list, n: int) -> dict:
+    """CPU por request solo de decodificación+validación y serialización"""
+    import orjson
+    from starlette.responses import JSONResponse
+    from app.codec import compilar_validador, RespuestaJSONRapida
+    from app.schemas import PredictRequestFull, PredictResponse
+
+    validar = compilar_validador(PredictRequestFull)
+    respuesta = {
+        "success": True, "venta_id": "venta_000001", "cliente_id": "cli_000001",
+        "probabilidad_cancelacion": 0.7812, "recomendacion": "enviar_recordatorio",
+        "factores_riesgo": ["Método de pago no confirmado", "Cliente nuevo (sin historial)"],
+        "probabilidad_estimada": False
+    }
+
+    def tiempo(funcion):
+        t0 = time.process_time()
+        for i in range(n):
+            funcion(cuerpos[i % len(cuerpos)])
+        return round((time.process_time() - t0) / n * 1_000_000, 2)
+
+    return {
+        "entrada_pydantic_us": tiempo(lambda c: PredictRequestFull.model_validate(json.loads(c))),
+        "entrada_compilado_us": tiempo(lambda c: PredictRequestFull.model_construct(**validar(orjson.loads(c)))),
+        "salida_pydantic_us": tiempo(lambda c: JSONResponse(PredictResponse(**respuesta).model_dump(mode="json"))),
+        "salida_orjson_us": tiempo(lambda c: RespuestaJSONRapida(respuesta)),
+    }
+
+
+async def _main(args) -> int:
+    import app.database as database
+    os.chdir(RAIZ)
+    database.db = DBMemoria("agencia_viajes")
+
+    rng = np.random.RandomState(7)
+    features = generar_features(args.payloads, rng)
+    payloads = [construir_payload({k: v[i] for k, v in features.items()}, i, rng) for i in range(args.payloads)]
+    payloads += casos_limite(payloads[0])
+    cuerpos = [json.dumps(p, ensure_ascii=False).encode("utf-8") for p in payloads]
+    cuerpos += [b"", b"{", b"[]", b"null", b'{"venta_id": "\\ud800"}']
+
+    app_normal, app_rapida = construir_apps()
+
+    dif_validador = verificar_validador(payloads)
+    dif_contrato = await verificar_contrato(app_normal, app_rapida, cuerpos)
+
+    # CPU solo con bodies que pasan la validación (un 422 no mide el camino de /predict)
+    validos = [cuerpo for cuerpo in cuerpos[:args.payloads] if es_valido(cuerpo)]
+    if not validos:
+        print("❌ Ningún payload válido para medir CPU")
+        return 1
+    reporte = {
+        "payloads": len(cuerpos),
+        "validos_cpu": len(validos),
+        "diferencias_validador": dif_validador[:10],
+        "diferencias_contrato": dif_contrato[:10],
+        "cpu_por_request_us": {
+            "normal": round(await medir_cpu(app_normal, validos, args.requests_cpu), 2),
+            "rapido": round(await medir_cpu(app_rapida, validos, args.requests_cpu), 2),
+        },
+        "codec_por_request_us": medir_codec(validos, args.requests_cpu)
+    }
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+
+    if dif_validador or dif_contrato:
+        print(f"\n❌ Diferencias: validador={len(dif_validador)} contrato={len(dif_contrato)}")
+        return 1
+    print("\n✅ Codec rápido equivalente al de FastAPI")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verificación de contrato y CPU del codec rápido")
+    parser.add_argument("--payloads", type=int, default=1000)
+    parser.add_argument("--requests-cpu", type=int, default=2000)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Lanzador de producción multi-worker (pre-fork)
+
+- El proceso maestro carga el modelo (y las librerías pesadas) una sola
+  vez, congela el heap con gc.freeze() y luego hace fork de N workers: los
+  arreglos de los árboles quedan compartidos copy-on-write entre procesos
+- Todos los workers aceptan conexiones del mismo socket, abierto por el
+  maestro antes del fork
+- El scheduler de recordatorios corre solo en el worker 0
+  (SCHEDULER_ACTIVO=true en ese worker, false en los demás)
+- /metrics y /drift agregan los contadores de todos los workers mediante
+  instantáneas en un directorio compartido (MULTIPROCESO_DIR, creado por el
+  maestro; ver app/services/multiproceso.py). El resto del estado en memoria
+  es por worker: el límite AIMD de admisión (cada worker ajusta el suyo; en
+  /metrics se ve la suma) y la deduplicación single-flight (solo coalesce
+  requests iguales que llegan al mismo worker)
+- Si un worker muere se relanza con el mismo índice (con espera creciente si
+  muere apenas arranca)
+- SIGTERM/SIGINT: apagado ordenado (cada worker termina sus requests en
+  curso), SIGKILL a los que sigan vivos tras SERVIDOR_TIMEOUT_APAGADO
+
+Uso:
+    python servidor.py                    # workers = CPUs disponibles (cgroup)
+    python servidor.py --workers 4 --port 8001
+"""
+
+import argparse
+import gc
+import logging
+import math
+import os
+import random
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+import traceback
+
+logger = logging.getLogger("servidor")
+
+WORKERS = int(os.getenv("SERVIDOR_WORKERS", 0))
+TIMEOUT_APAGADO = float(os.getenv("SERVIDOR_TIMEOUT_APAGADO", 30))
+
+# Un worker que muere antes de esto cuenta como fallo de arranque
+VIDA_MINIMA = 5.0
+ESPERA_MAXIMA_REINICIO = 30.0
+
+
+def cpus_disponibles() -> int:
+    """CPUs utilizables por el proceso (afinidad y cuota de cgroup v2 en Kubernetes)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            cuota, periodo = f.read().split()
+        if cuota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(cuota) / int(periodo))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def crear_socket(host: str, port: int) -> socket.socket:
+    """Socket de escucha compartido por todos los workers"""
+    familia = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(familia, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preparar_multiproceso(workers: int):
+    """
+    Directorio de instantáneas de métricas y drift compartido por los workers
+
+    Se define antes de importar la app (los módulos leen MULTIPROCESO_DIR al
+    importarse) y en memoria (/dev/shm) si está disponible.
+    """
+    if workers <= 1 or os.getenv("MULTIPROCESO_DIR"):
+        return None
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    directorio = tempfile.mkdtemp(prefix="ia-cancelaciones-", dir=base)
+    os.environ["MULTIPROCESO_DIR"] = directorio
+    return directorio
+
+
+def precargar():
+    """
+    Carga en el maestro lo que comparten todos los workers
+
+    No importa main_v4: eso configura el logging (hilo escritor) y no debe
+    haber hilos ni conexiones a MongoDB antes del fork.
+    """
+    t0 = time.perf_counter()
+    import fastapi  # noqa: F401
+    import pymongo  # noqa: F401
+    from app.services.predictor import get_predictor
+
+    predictor = get_predictor()
+    # Un proceso por núcleo: sin hilos de joblib compitiendo dentro de cada worker
+    predictor.modelo.n_jobs = 1
+    logger.info("📦 Modelo precargado en el maestro (%.2f s)", time.perf_counter() - t0)
+
+
+def ejecutar_worker(indice: int, sock: socket.socket, args):
+    """Cuerpo del proceso hijo: importa la app y sirve el socket compartido"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    random.seed()
+
+    os.environ["WORKER_INDICE"] = str(indice)
+    os.environ["SCHEDULER_ACTIVO"] = "true" if indice == 0 else "false"
+
+    import uvicorn
+    import main_v4
+    from app.logging_config import detener_logging
+
+    config = uvicorn.Config(
+        main_v4.app,
+        log_config=None,
+        timeout_graceful_shutdown=int(args.timeout_apagado),
+    )
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+    finally:
+        # os._exit no ejecuta atexit: vaciar aquí la cola de logs
+        detener_logging()
+
+
+class Maestro:
+    """Lanza, vigila y detiene los workers"""
+
+    def __init__(self, sock: socket.socket, args):
+        self.sock = sock
+        self.args = args
+        self.workers = {}       # pid -> índice
+        self.inicios = {}       # índice -> instante del último arranque
+        self.fallos = {}        # índice -> fallos de arranque seguidos
+        self.pendientes = {}    # índice -> instante del próximo intento
+        self.apagando = False
+
+    def lanzar(self, indice: int):
+        pid = os.fork()
+        if pid == 0:
+            codigo = 0
+            try:
+                ejecutar_worker(indice, self.sock, self.args)
+            except BaseException:
+                traceback.print_exc()
+                codigo = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(codigo)
+        self.workers[pid] = indice
+        self.inicios[indice] = time.monotonic()
+        logger.info("👷 Worker %d iniciado (pid %d)%s", indice, pid, " [scheduler]" if indice == 0 else "")
+
+    def _pedir_apagado(self, signum, frame):
+        if not self.apagando:
+            logger.info("🔌 Señal %s recibida: apagando workers...", signal.Signals(signum).name)
+        self.apagando = True
+
+    def _recoger(self):
+        """Procesa los workers terminados"""
+        while self.workers:
+            try:
+                pid, estado = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            indice = self.workers.pop(pid, None)
+            if indice is None or self.apagando:
+                continue
+
+            vivio = time.monotonic() - self.inicios[indice]
+            self.fallos[indice] = self.fallos.get(indice, 0) + 1 if vivio < VIDA_MINIMA else 0
+            espera = min(2 ** self.fallos[indice] - 1, ESPERA_MAXIMA_REINICIO)
+            logger.warning("⚠️  Worker %d (pid %d) terminó con estado %d tras %.1f s - reinicio en %.0f s",
+                           indice, pid, os.waitstatus_to_exitcode(estado), vivio, espera)
+            self.pendientes[indice] = time.monotonic() + espera
+
+    def ejecutar(self) -> int:
+        signal.signal(signal.SIGTERM, self._pedir_apagado)
+        signal.signal(signal.SIGINT, self._pedir_apagado)
+
+        for indice in range(self.args.workers):
+            self.lanzar(indice)
+
+        while not self.apagando:
+            time.sleep(0.2)
+            self._recoger()
+            ahora = time.monotonic()
+            for indice, instante in list(self.pendientes.items()):
+                if instante <= ahora and not self.apagando:
+                    del self.pendientes[indice]
+                    self.lanzar(indice)
+
+        return self.detener()
+
+    def detener(self) -> int:
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        limite = time.monotonic() + self.args.timeout_apagado + 5
+        while self.workers and time.monotonic() < limite:
+            self._recoger()
+            time.sleep(0.1)
+
+        for pid, indice in list(self.workers.items()):
+            logger.warning("⚠️  Worker %d (pid %d) no terminó a tiempo: SIGKILL", indice, pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.sock.close()
+        logger.info("👋 Servidor detenido")
+        return 0
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Servidor de producción pre-fork (N workers uvicorn)")
+    parser.add_argument("--host", default=os.getenv("SERVIDOR_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVIDOR_PUERTO", 8001)))
+    parser.add_argument("--workers", type=int, default=WORKERS or cpus_disponibles(),
+                        help="Procesos worker (por defecto, CPUs disponibles)")
+    parser.add_argument("--timeout-apagado", type=float, default=TIMEOUT_APAGADO,
+                        help="Segundos para terminar los requests en curso al apagar")
+    return parser.parse_args()
+
+
+def main():
+    # Logging mínimo del maestro (cada worker configura el suyo al importar main_v4)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)-8s | %(message)s",
+                        datefmt="%Y-%m-%d %H:%M:%S")
+    args = _parse_args()
+
+    sock = crear_socket(args.host, args.port)
+    logger.info("🚀 Escuchando en %s:%d con %d workers", args.host, args.port, args.workers)
+
+    directorio = preparar_multiproceso(args.workers)
+    precargar()
+
+    # Lo cargado hasta aquí pasa a la generación permanente: el recolector de
+    # los workers no lo recorre ni escribe en sus páginas compartidas
+    gc.collect()
+    gc.freeze()
+
+    try:
+        codigo = Maestro(sock, args).ejecutar()
+    finally:
+        if directorio:
+            shutil.rmtree(directorio, ignore_errors=True)
+    sys.exit(codigo)
+
+
+if __name__ == "__main__":
+    main()